@@ -0,0 +1,104 @@
+"""Нагрузочный тест: HTTP-сервер `passgen serve` против запуска CLI на каждый вызов.
+
+Примеры:
+    python main.py serve --port 8080 --workers 8 &
+    python benchmarks/loadtest_server.py --url http://127.0.0.1:8080 --requests 5000 --concurrency 32
+    python benchmarks/loadtest_server.py --url http://127.0.0.1:8080 --concurrency 4 --idle-connections 16
+    python benchmarks/loadtest_server.py --cli-calls 20
+
+Каждый поток нагрузки держит одно keep-alive соединение и отправляет запросы подряд.
+Параллельных соединений стоит брать больше, чем --workers сервера: соединение
+не должно занимать поток обработки, пока клиент не присылает запросов. Для
+проверки этого --idle-connections открывает соединения, которые после одного
+запроса простаивают до конца теста.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.client import HTTPConnection
+from urllib.parse import urlsplit
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def run_http(url, endpoint, payload, total_requests, concurrency, idle_connections=0):
+    """Отправляет total_requests запросов в concurrency потоков.
+
+    Returns:
+        tuple: (запросов/с, ошибок, максимальная задержка запроса в секундах)
+    """
+    parts = urlsplit(url)
+    body = json.dumps(payload)
+    per_thread = total_requests // concurrency
+    errors = []
+    latencies = []
+
+    idle = []
+    for _ in range(idle_connections):
+        conn = HTTPConnection(parts.hostname, parts.port, timeout=60)
+        conn.request("POST", endpoint, body=body, headers={"Content-Type": "application/json"})
+        conn.getresponse().read()
+        idle.append(conn)
+
+    def worker():
+        conn = HTTPConnection(parts.hostname, parts.port, timeout=10)
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            conn.request("POST", endpoint, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - started)
+            if response.status != 200:
+                errors.append(response.status)
+        conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    for conn in idle:
+        conn.close()
+    return per_thread * concurrency / elapsed, len(errors), max(latencies, default=0.0)
+
+
+def run_cli(calls):
+    """Запускает `python main.py generate` calls раз подряд, возвращает вызовов/с."""
+    command = [sys.executable, os.path.join(PROJECT_ROOT, "main.py"), "generate", "-l", "16", "-d", "-s", "-u"]
+    started = time.perf_counter()
+    for _ in range(calls):
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return calls / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера PassGen")
+    parser.add_argument("--url", help="Адрес запущенного сервера, например http://127.0.0.1:8080")
+    parser.add_argument("--endpoint", default="/generate", help="Эндпоинт для нагрузки (по умолчанию /generate)")
+    parser.add_argument("--payload", default='{"length": 16}', help="JSON-тело запроса")
+    parser.add_argument("--requests", type=int, default=5000, help="Всего запросов к серверу")
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="Количество параллельных соединений (больше, чем --workers сервера)")
+    parser.add_argument("--idle-connections", type=int, default=0,
+                        help="Сколько keep-alive соединений открыть и оставить простаивать")
+    parser.add_argument("--cli-calls", type=int, default=0, help="Сколько раз запустить CLI для сравнения")
+    args = parser.parse_args()
+
+    if args.url:
+        rps, errors, max_latency = run_http(args.url, args.endpoint, json.loads(args.payload), args.requests,
+                                            args.concurrency, args.idle_connections)
+        print(f"serve {args.endpoint}: {rps:.0f} запросов/с (ошибок: {errors}, "
+              f"максимальная задержка: {max_latency * 1000:.1f} мс)")
+    if args.cli_calls:
+        print(f"CLI (процесс на вызов): {run_cli(args.cli_calls):.1f} вызовов/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Сравнение размера и попадания в кэш для старой и компактной схемы паролей.
+
+Пример:
+    python benchmarks/schema_size.py --rows 10000000 --lookups 100000
+
+Создает две временные таблицы с одинаковыми данными:
+- legacy: id SERIAL PRIMARY KEY, service TEXT, password_hash TEXT (hex) + индекс на service
+- compact: service TEXT PRIMARY KEY, password_hash BYTEA
+и выводит размер кучи, размер индексов и долю попаданий в shared buffers
+при случайных поисках по service (по приращению pg_statio_user_tables).
+Таблицы удаляются после замера.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from passgen.database_postgres import PasswordDB  # noqa: E402
+
+SCHEMAS = {
+    "bench_legacy": '''
+        CREATE TABLE bench_legacy (
+            id SERIAL PRIMARY KEY,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            service TEXT NOT NULL,
+            password_hash TEXT NOT NULL
+        );
+        INSERT INTO bench_legacy (service, password_hash)
+        SELECT 'service' || i, encode(sha256(('password' || i)::bytea), 'hex')
+        FROM generate_series(1, %(rows)s) AS i;
+        CREATE INDEX bench_legacy_service_idx ON bench_legacy (service);
+    ''',
+    "bench_compact": '''
+        CREATE TABLE bench_compact (
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            service TEXT PRIMARY KEY,
+            password_hash BYTEA NOT NULL
+        );
+        INSERT INTO bench_compact (service, password_hash)
+        SELECT 'service' || i, sha256(('password' || i)::bytea)
+        FROM generate_series(1, %(rows)s) AS i;
+    ''',
+}
+
+
+def buffer_stats(cursor, table):
+    """Счетчики чтений кучи и индексов таблицы: (попадания, чтения с диска)."""
+    cursor.execute('''
+        SELECT COALESCE(heap_blks_hit, 0) + COALESCE(idx_blks_hit, 0),
+               COALESCE(heap_blks_read, 0) + COALESCE(idx_blks_read, 0)
+        FROM pg_statio_user_tables WHERE relname = %s
+    ''', (table,))
+    return cursor.fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Размер схемы паролей PassGen")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Количество записей")
+    parser.add_argument("--lookups", type=int, default=100_000, help="Количество случайных поисков")
+    args = parser.parse_args()
+
+    db = PasswordDB()
+    if db.init_error:
+        sys.exit(f"База данных недоступна: {db.init_error}")
+
+    with db.connection() as conn:
+        conn.autocommit = True
+        cursor = conn.cursor()
+        try:
+            for table, ddl in SCHEMAS.items():
+                cursor.execute(f'DROP TABLE IF EXISTS {table}')
+                started = time.perf_counter()
+                cursor.execute(ddl, {"rows": args.rows})
+                cursor.execute(f'ANALYZE {table}')
+                print(f"{table}: заполнение {args.rows} строк за {time.perf_counter() - started:.1f} с")
+
+            keys = [f"service{random.randint(1, args.rows)}" for _ in range(args.lookups)]
+            for table in SCHEMAS:
+                cursor.execute('SELECT pg_relation_size(%s), pg_indexes_size(%s)', (table, table))
+                heap_size, index_size = cursor.fetchone()
+
+                # Статистика обновляется с задержкой - ждем, пока счетчики перестанут меняться
+                time.sleep(1)
+                hit_before, read_before = buffer_stats(cursor, table)
+                started = time.perf_counter()
+                for key in keys:
+                    cursor.execute(f'SELECT password_hash FROM {table} WHERE service = %s', (key,))
+                    cursor.fetchone()
+                elapsed = time.perf_counter() - started
+                time.sleep(1)
+                hit_after, read_after = buffer_stats(cursor, table)
+
+                hits, reads = hit_after - hit_before, read_after - read_before
+                hit_rate = hits / (hits + reads) if hits + reads else 0.0
+                print(f"{table}: куча {heap_size / 2 ** 20:,.1f} МБ, индексы {index_size / 2 ** 20:,.1f} МБ, "
+                      f"попадания в кэш {hit_rate:.1%}, {args.lookups / elapsed:,.0f} поисков/с")
+        finally:
+            for table in SCHEMAS:
+                cursor.execute(f'DROP TABLE IF EXISTS {table}')
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
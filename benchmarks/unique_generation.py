@@ -0,0 +1,62 @@
+"""Замер генерации уникальных паролей с фильтром Блума.
+
+Пример:
+    python benchmarks/unique_generation.py --count 10000000 --error-rate 0.001
+    python benchmarks/unique_generation.py --count 1000000 --preload
+
+Выводит скорость генерации, память фильтра и долю ложных срабатываний
+(оценку по заполнению фильтра и долю отброшенных паролей). Для сравнения
+печатается оценка памяти точного множества тех же хэшей (set из bytes).
+С --preload фильтр предварительно заполняется хэшами из базы данных.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from passgen.bloom import ScalableBloomFilter  # noqa: E402
+from passgen.generator import generate_passwords  # noqa: E402
+from passgen.utils import password_digest  # noqa: E402
+
+
+def exact_set_bytes(count):
+    """Оценка памяти set из count хэшей по 32 байта (объекты bytes + таблица множества)."""
+    sample = {password_digest(str(i)) for i in range(10000)}
+    per_item = sys.getsizeof(next(iter(sample))) + sys.getsizeof(sample) / len(sample)
+    return count * per_item
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация уникальных паролей PassGen")
+    parser.add_argument("--count", type=int, default=10_000_000, help="Количество паролей")
+    parser.add_argument("--length", type=int, default=12, help="Длина пароля")
+    parser.add_argument("--error-rate", type=float, default=0.001, help="Допустимая доля ложных срабатываний")
+    parser.add_argument("--preload", action="store_true", help="Заполнить фильтр хэшами из базы данных")
+    args = parser.parse_args()
+
+    seen = ScalableBloomFilter(initial_capacity=100_000, error_rate=args.error_rate)
+    if args.preload:
+        from passgen import storage
+
+        started = time.perf_counter()
+        loaded = storage.load_password_hashes(seen)
+        print(f"Загружено хэшей из базы: {loaded} за {time.perf_counter() - started:.2f} с")
+
+    started = time.perf_counter()
+    generate_passwords(args.count, length=args.length, unique=True, seen=seen)
+    elapsed = time.perf_counter() - started
+
+    stats = seen.stats()
+    print(f"Сгенерировано {args.count} паролей за {elapsed:.1f} с ({args.count / elapsed:,.0f} паролей/с)")
+    print(f"Фильтр: {stats['filters']} внутр. фильтров, {stats['memory_bytes'] / 2 ** 20:,.1f} МБ, "
+          f"{stats['bits_per_item']} бит на пароль")
+    print(f"Точное множество тех же хэшей: ~{exact_set_bytes(stats['items']) / 2 ** 20:,.0f} МБ")
+    print(f"Ложные срабатывания: оценка {stats['false_positive_rate']:.5f}, "
+          f"отброшено паролей {stats['hits']} ({stats['hits'] / (args.count + stats['hits']):.5f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Замер скорости шифрования и расшифровки сейфа.
+
+Пример:
+    python benchmarks/vault_throughput.py --entries 1000000 --workers 1 4 8
+
+Вывод ключа (scrypt) выполняется один раз и в замер не входит.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from passgen.vault import Vault, new_salt  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость шифрования сейфа PassGen")
+    parser.add_argument("--entries", type=int, default=1_000_000, help="Количество записей")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count()],
+                        help="Варианты количества потоков для расшифровки")
+    args = parser.parse_args()
+
+    vault = Vault(new_salt())
+    started = time.perf_counter()
+    vault.unlock("benchmark-master-password")
+    print(f"Вывод ключа (scrypt): {time.perf_counter() - started:.3f} с")
+
+    services = [f"service{i}" for i in range(args.entries)]
+    started = time.perf_counter()
+    items = [(service, vault.encrypt(service, "Pa$$w0rd-" + service)) for service in services]
+    elapsed = time.perf_counter() - started
+    print(f"Шифрование: {args.entries} записей за {elapsed:.2f} с ({args.entries / elapsed:,.0f} записей/с)")
+
+    for workers in args.workers:
+        started = time.perf_counter()
+        vault.decrypt_many(items, workers=workers)
+        elapsed = time.perf_counter() - started
+        print(f"Расшифровка, потоков {workers}: {elapsed:.2f} с ({args.entries / elapsed:,.0f} записей/с)")
+
+
+if __name__ == "__main__":
+    main()
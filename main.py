@@ -5,13 +5,40 @@
 """
 
 import argparse   # обработка аргументов командной строки
-from passgen.commands import handle_generate, handle_find, handle_list, handle_delete, interactive_mode
+import sys
+
+from passgen import profiling
+
+if __name__ == "__main__":
+    # Профилирование запускаем до импорта остальных модулей: при импорте storage
+    # создается PasswordDB и открывается соединение с базой - это тоже должно попасть в профиль
+    sys.argv[1:] = profiling.normalize_profile_args(sys.argv[1:])
+    profiling.start_from_args(sys.argv[1:])
+
+# flake8 сообщает E402 о первой строке многострочного импорта - noqa должен стоять на ней
+from passgen.commands import (handle_generate, handle_find, handle_history, handle_search,  # noqa: E402
+                              handle_reveal, handle_export, handle_list, handle_delete, handle_serve,
+                              handle_batch, handle_doctor, handle_migrate, handle_prune, interactive_mode,
+                              unlock_vault)
+from passgen.database_postgres import SchemaOutdatedError  # noqa: E402
+from passgen.doctor import DEFAULT_THRESHOLDS  # noqa: E402
+from passgen.storage import (start_history_pruning, start_change_listener, enable_write_behind,  # noqa: E402
+                             shutdown, take_write_errors, HISTORY_LIMIT)
 
 
 def main():
     """Точка входа в программу - обработка аргументов командной строки."""
 
     parser = argparse.ArgumentParser(description="Генератор безопасных паролей")
+    parser.add_argument("--write-behind", action="store_true",
+                        help="Отложенная запись: сохранения пишутся в базу пачками в фоне")
+    parser.add_argument("--profile", nargs="?", const=profiling.DEFAULT_MODE, choices=profiling.MODES,
+                        help="Профилировать запуск: --profile или --profile=cprofile|trace")
+    parser.add_argument("--profile-output", type=str, default=profiling.DEFAULT_OUTPUT,
+                        help="Префикс файлов профиля .pstats и .collapsed "
+                             f"(по умолчанию: {profiling.DEFAULT_OUTPUT})")
+    parser.add_argument("--profile-top", type=int, default=profiling.DEFAULT_TOP,
+                        help=f"Сколько функций показать в сводке профиля (по умолчанию: {profiling.DEFAULT_TOP})")
     subparsers = parser.add_subparsers(dest="command", help="Доступные команды")
 
     # Парсер для команды generate
@@ -26,36 +53,160 @@ def main():
                                  help="Включать заглавные буквы")
     parser_generate.add_argument("--service", type=str,
                                  help="Название сервиса для сохранения пароля")
+    parser_generate.add_argument("--vault", action="store_true",
+                                 help="Сохранить пароль также в зашифрованном сейфе")
 
     # Парсер для команды find
     parser_find = subparsers.add_parser("find", help="Найти пароль по имени сервиса")
     parser_find.add_argument("service", type=str, help="Название сервиса")
+    parser_find.add_argument("--history", action="store_true",
+                             help="Показать последние пароли сервиса")
+    parser_find.add_argument("--reveal", action="store_true",
+                             help="Показать пароль из зашифрованного сейфа")
+
+    # Парсер для команды search
+    parser_search = subparsers.add_parser("search", help="Найти сервисы по части названия (с учетом опечаток)")
+    parser_search.add_argument("term", type=str, help="Поисковый запрос")
+    parser_search.add_argument("--limit", type=int, default=20,
+                               help="Сколько результатов показать (по умолчанию: 20)")
+    parser_search.add_argument("--offset", type=int, default=0,
+                               help="Сколько результатов пропустить (по умолчанию: 0)")
 
     # Парсер для команды list (НОВАЯ КОМАНДА)
     subparsers.add_parser("list", help="Показать все сохраненные пароли")
 
+    # Парсер для команды export
+    parser_export = subparsers.add_parser("export", help="Выгрузить все пароли из сейфа в JSON")
+    parser_export.add_argument("-o", "--output", type=str,
+                               help="Файл для выгрузки (по умолчанию - вывод на экран)")
+    parser_export.add_argument("--workers", type=int, default=None,
+                               help="Количество потоков расшифровки (по умолчанию: число ядер)")
+
     # Парсер для команды delete (НОВАЯ КОМАНДА)
     parser_delete = subparsers.add_parser("delete", help="Удалить пароль по имени сервиса")
     parser_delete.add_argument("service", type=str, help="Название сервиса")
 
+    # Парсер для режима HTTP/JSON сервера
+    parser_serve = subparsers.add_parser("serve", help="Запустить локальный HTTP/JSON сервер")
+    parser_serve.add_argument("--host", type=str, default="127.0.0.1",
+                              help="Адрес для прослушивания (по умолчанию: 127.0.0.1)")
+    parser_serve.add_argument("--port", type=int, default=8080,
+                              help="Порт (по умолчанию: 8080)")
+    parser_serve.add_argument("--workers", type=int, default=8,
+                              help="Сколько запросов обрабатывать одновременно (по умолчанию: 8)")
+
+    # Парсер для пакетного режима
+    parser_batch = subparsers.add_parser("batch", help="Выполнить JSON-команды из stdin (по одной на строку)")
+    parser_batch.add_argument("--chunk-size", type=int, default=100,
+                              help="Размер группы команд и пачки вывода (по умолчанию: 100)")
+
+    # Парсер для команды самопроверки
+    parser_doctor = subparsers.add_parser("doctor", help="Проверить здоровье и задержки (JSON-отчет)")
+    parser_doctor.add_argument("--max-connect-ms", type=float, default=DEFAULT_THRESHOLDS["max_connect_ms"],
+                               help="Допустимое время подключения к базе, мс")
+    parser_doctor.add_argument("--max-query-ms", type=float, default=DEFAULT_THRESHOLDS["max_query_ms"],
+                               help="Допустимое время простого запроса, мс")
+    parser_doctor.add_argument("--min-generate-per-sec", type=float,
+                               default=DEFAULT_THRESHOLDS["min_generate_per_sec"],
+                               help="Минимальная скорость генерации паролей в секунду")
+    parser_doctor.add_argument("--min-hash-per-sec", type=float, default=DEFAULT_THRESHOLDS["min_hash_per_sec"],
+                               help="Минимальная скорость хэширования в секунду")
+
+    # Парсер для команды миграции схемы
+    subparsers.add_parser("migrate", help="Перевести таблицы базы на текущую схему (в окно обслуживания)")
+
+    # Парсер для команды очистки истории
+    parser_prune = subparsers.add_parser("prune", help="Удалить старые записи истории паролей (например, из cron)")
+    parser_prune.add_argument("--keep", type=int, default=HISTORY_LIMIT,
+                              help=f"Сколько последних паролей оставить для сервиса (по умолчанию: {HISTORY_LIMIT})")
+
     # Парсер для интерактивного режима
     subparsers.add_parser("interactive", help="Интерактивный режим (удобный)")
 
-    args = parser.parse_args()
-
+    args = parser.parse_args(profiling.normalize_profile_args(sys.argv[1:]))
+
+    profiler = profiling.active
+    if args.profile and profiler is None:
+        # main() вызван без предварительного запуска - профилируем с этого момента
+        profiler = profiling.Profiler(args.profile)
+        profiler.start()
+
+    if args.write_behind:
+        enable_write_behind()
+
+    try:
+        if profiler is not None:
+            profiler.mark("команда")
+        run_command(args)
+    except SchemaOutdatedError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        # Дописываем отложенные операции и закрываем соединения перед выходом
+        if profiler is not None:
+            profiler.mark("завершение")
+        shutdown()
+        write_errors = take_write_errors()
+        if profiler is not None:
+            report_profile(profiler, args)
+
+    if write_errors:
+        # Отказы отложенной записи (например, повтор недавнего пароля) случились
+        # уже после того, как команда сообщила об успехе
+        print(f"❌ Отложенная запись не сохранила паролей: {len(write_errors)}", file=sys.stderr)
+        for service, error in write_errors[:10]:
+            print(f"   - {service}: {error}", file=sys.stderr)
+        if len(write_errors) > 10:
+            print("   ...", file=sys.stderr)
+        sys.exit(1)
+
+
+def report_profile(profiler, args):
+    """Останавливает профилировщик, сохраняет файлы профиля и печатает сводку в stderr."""
+    profiler.stop()
+    pstats_path, collapsed_path = profiler.write(args.profile_output)
+    profiler.report(sys.stderr, top=args.profile_top)
+    print(f"\n   Профиль: {pstats_path} (python -m pstats), стеки: {collapsed_path} (flamegraph.pl)",
+          file=sys.stderr)
+
+
+def run_command(args):
+    """Вызывает обработчик команды, выбранной в аргументах командной строки."""
     # Вызов соответствующей функции в зависимости от команды
     if args.command == "generate":
+        if args.vault and args.service and not unlock_vault():
+            return
         handle_generate(args)
     elif args.command == "find":
-        handle_find(args)
+        if args.history:
+            handle_history(args)
+        elif args.reveal:
+            handle_reveal(args)
+        else:
+            handle_find(args)
+    elif args.command == "search":
+        handle_search(args)
+    elif args.command == "export":
+        handle_export(args)
     elif args.command == "list":
         handle_list(args)
     elif args.command == "delete":
         handle_delete(args)
-    elif args.command == "interactive":
-        interactive_mode()
+    elif args.command == "doctor":
+        handle_doctor(args)
+    elif args.command == "batch":
+        handle_batch(args)
+    elif args.command == "migrate":
+        handle_migrate(args)
+    elif args.command == "prune":
+        handle_prune(args)
+    elif args.command == "serve":
+        start_history_pruning()
+        start_change_listener()  # кэш сервера сбрасывается при записи из других процессов
+        handle_serve(args)
     else:
-        # Если не указана команда - запускаем интерактивный режим
+        # Интерактивный режим (и режим по умолчанию) работает долго - чистим историю в фоне
+        start_history_pruning()
         interactive_mode()
 
 
@@ -0,0 +1,196 @@
+"""Модуль пакетного режима CLI (одна программа - много команд).
+
+Команды читаются из входного потока построчно в формате JSON, например:
+    {"op": "generate", "length": 16, "service": "gmail", "id": 1}
+    {"op": "find", "service": "gmail"}
+    {"op": "save", "service": "yandex", "password": "secret"}
+    {"op": "delete", "service": "yandex"}
+
+На каждую команду в выходной поток пишется одна строка JSON с полем "ok"
+(и "id", если он был указан в команде). Подряд идущие команды одного типа
+выполняются одним обращением к хранилищу.
+
+В режиме отложенной записи (--write-behind) сохранения только ставятся в
+очередь ("queued": true), а повтор недавнего пароля обнаруживается при
+записи. Такие отказы выводятся в конце отдельными строками с "deferred": true.
+"""
+
+import json
+
+from . import storage
+from .generator import generate_password
+from .utils import format_hash, validate_password_length
+
+OPERATIONS = ("generate", "find", "save", "delete")
+
+
+def run_batch(input_stream, output_stream, chunk_size=100):
+    """Выполняет команды из input_stream и пишет результаты в output_stream.
+
+    Подряд идущие команды одного типа собираются в группу (не больше chunk_size),
+    результаты выводятся пачками по chunk_size строк. chunk_size=1 дает ответ
+    на каждую команду сразу (удобно, если вызывающая программа ждет ответа).
+
+    Args:
+        input_stream: Источник строк с JSON-командами (например, sys.stdin)
+        output_stream: Приемник результатов (например, sys.stdout)
+        chunk_size: Размер группы команд и пачки вывода
+
+    Returns:
+        int: Количество обработанных команд
+    """
+    pending_output = []
+    group = []
+    processed = 0
+
+    def write(results):
+        pending_output.extend(json.dumps(result, ensure_ascii=False) for result in results)
+        if len(pending_output) >= chunk_size:
+            flush()
+
+    def flush():
+        if pending_output:
+            output_stream.write("\n".join(pending_output) + "\n")
+            output_stream.flush()
+            pending_output.clear()
+
+    for line in input_stream:
+        line = line.strip()
+        if not line:
+            continue
+        processed += 1
+
+        command = None
+        try:
+            command = _parse_command(line)
+            _validate_command(command)
+        except ValueError as e:
+            write(_execute_group(group))
+            group = []
+            error = {"ok": False, "error": str(e)}
+            if isinstance(command, dict) and "id" in command:
+                error["id"] = command["id"]
+            write([error])
+            continue
+
+        if group and (group[0]["op"] != command["op"] or len(group) >= chunk_size):
+            write(_execute_group(group))
+            group = []
+        group.append(command)
+
+    write(_execute_group(group))
+    if storage.write_queue is not None:
+        storage.flush()
+        write([{"ok": False, "service": service, "error": error, "deferred": True}
+               for service, error in storage.take_write_errors()])
+    flush()
+    return processed
+
+
+def _parse_command(line):
+    """Разбирает строку JSON (результат может оказаться не объектом - см. _validate_command)."""
+    try:
+        return json.loads(line)
+    except ValueError:
+        raise ValueError("Команда должна быть JSON-объектом")
+
+
+def _validate_command(command):
+    """Проверяет, что команда - JSON-объект с обязательными полями."""
+    if not isinstance(command, dict):
+        raise ValueError("Команда должна быть JSON-объектом")
+
+    op = command.get("op")
+    if op not in OPERATIONS:
+        raise ValueError(f"Неизвестная операция: {op!r}")
+    if op != "generate" and not isinstance(command.get("service"), str):
+        raise ValueError(f"Для операции {op} нужно указать service")
+    if op == "save" and not isinstance(command.get("password"), str):
+        raise ValueError("Для операции save нужно указать password")
+
+
+def _execute_group(group):
+    """Выполняет группу однотипных команд и возвращает список результатов."""
+    if not group:
+        return []
+    executors = {
+        "generate": _execute_generate,
+        "find": _execute_find,
+        "save": _execute_save,
+        "delete": _execute_delete,
+    }
+    try:
+        results = executors[group[0]["op"]](group)
+    except Exception as e:
+        # Ошибка хранилища (например, нет соединения) относится ко всей группе
+        results = [{"ok": False, "error": str(e)} for _ in group]
+
+    for command, result in zip(group, results):
+        if "id" in command:
+            result["id"] = command["id"]
+    return results
+
+
+def _execute_generate(group):
+    results = []
+    to_save = []  # (индекс результата, сервис, пароль)
+    for command in group:
+        length = command.get("length", 12)
+        try:
+            if isinstance(length, bool) or not isinstance(length, int):
+                raise ValueError("length должен быть целым числом")
+            validate_password_length(length)
+        except ValueError as e:
+            results.append({"ok": False, "error": str(e)})
+            continue
+
+        password = generate_password(
+            length=length,
+            use_digits=bool(command.get("digits", True)),
+            use_special_chars=bool(command.get("special", True)),
+            use_uppercase=bool(command.get("uppercase", True))
+        )
+        service = command.get("service")
+        results.append({"ok": True, "password": password, "saved": bool(service)})
+        if service:
+            to_save.append((len(results) - 1, service, password))
+
+    if to_save:
+        errors = storage.save_passwords([(service, password) for _, service, password in to_save])
+        queued = storage.write_queue is not None
+        for (index, _, _), error in zip(to_save, errors):
+            if error:
+                results[index].update(ok=False, saved=False, error=error)
+            elif queued:
+                results[index].update(saved=False, queued=True)
+    return results
+
+
+def _execute_find(group):
+    found = storage.find_passwords([command["service"] for command in group])
+    return [
+        {"ok": True, "service": command["service"], "password_hash": format_hash(found.get(command["service"]))}
+        for command in group
+    ]
+
+
+def _execute_save(group):
+    errors = storage.save_passwords([(command["service"], command["password"]) for command in group])
+    queued = storage.write_queue is not None
+    results = []
+    for command, error in zip(group, errors):
+        if error:
+            results.append({"ok": False, "service": command["service"], "error": error})
+        elif queued:
+            results.append({"ok": True, "service": command["service"], "queued": True})
+        else:
+            results.append({"ok": True, "service": command["service"]})
+    return results
+
+
+def _execute_delete(group):
+    deleted = storage.delete_passwords([command["service"] for command in group])
+    return [
+        {"ok": True, "service": command["service"], "deleted": command["service"] in deleted}
+        for command in group
+    ]
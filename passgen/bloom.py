@@ -0,0 +1,177 @@
+"""Модуль фильтров Блума для проверки уникальности паролей.
+
+Фильтр Блума отвечает на вопрос "встречался ли ключ" с ограниченной памятью
+(около 1.44 * log2(1 / error_rate) бит на ключ вместо самого ключа). Ответ
+"нет" всегда точен, ответ "да" бывает ложным с вероятностью error_rate.
+Для уникальности паролей это безопасно: пароль с ответом "да" просто
+генерируется заново, а повтор не может пройти незамеченным.
+
+Ключи - SHA-256 хэши паролей (utils.password_digest): они уже равномерно
+распределены, поэтому позиции битов берутся прямо из байтов хэша без
+дополнительного хэширования.
+"""
+
+import math
+
+_LN2 = math.log(2)
+
+
+class BloomFilter:
+    """Фильтр Блума фиксированного размера."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        """Создает пустой фильтр.
+
+        Args:
+            capacity: На сколько ключей рассчитан фильтр
+            error_rate: Допустимая доля ложных срабатываний при заполнении до capacity
+
+        Raises:
+            ValueError: Если capacity не положительное или error_rate вне (0, 1)
+        """
+        if capacity <= 0:
+            raise ValueError("Емкость фильтра должна быть положительной")
+        if not 0 < error_rate < 1:
+            raise ValueError("Доля ложных срабатываний должна быть между 0 и 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / _LN2 ** 2))  # бит
+        self.hash_count = max(1, round(self.size / capacity * _LN2))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, digest):
+        """Добавляет ключ.
+
+        Returns:
+            bool: True если ключа в фильтре не было, False если он (вероятно) уже есть
+        """
+        added = False
+        bits = self._bits
+        size = self.size
+        # Двойное хэширование: позиция i = h1 + i * h2 (h2 нечетное, чтобы позиции не совпадали)
+        position = int.from_bytes(digest[:8], "little") % size
+        step = (int.from_bytes(digest[8:16], "little") | 1) % size
+        for _ in range(self.hash_count):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+            position += step
+            if position >= size:
+                position -= size
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, digest):
+        bits = self._bits
+        size = self.size
+        position = int.from_bytes(digest[:8], "little") % size
+        step = (int.from_bytes(digest[8:16], "little") | 1) % size
+        for _ in range(self.hash_count):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+            position += step
+            if position >= size:
+                position -= size
+        return True
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def memory_bytes(self):
+        """Размер битового массива в байтах."""
+        return len(self._bits)
+
+    @property
+    def false_positive_rate(self):
+        """Оценка доли ложных срабатываний при текущем заполнении."""
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+
+class ScalableBloomFilter:
+    """Фильтр Блума, который растет по мере добавления ключей.
+
+    Когда текущий фильтр заполнен, добавляется следующий: в growth раз больше
+    и с долей ложных срабатываний в tightening раз меньше. Сумма долей всех
+    фильтров не превышает error_rate, сколько бы ключей ни было добавлено.
+    """
+
+    def __init__(self, initial_capacity=100000, error_rate=0.001, growth=2, tightening=0.5):
+        """Создает фильтр с одним пустым внутренним фильтром.
+
+        Args:
+            initial_capacity: Емкость первого внутреннего фильтра
+            error_rate: Итоговая допустимая доля ложных срабатываний
+            growth: Во сколько раз каждый следующий фильтр больше предыдущего
+            tightening: Во сколько раз уменьшается доля ложных срабатываний следующего фильтра
+        """
+        if not 0 < tightening < 1:
+            raise ValueError("tightening должен быть между 0 и 1")
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.hits = 0  # сколько раз add() нашел ключ: повтор или ложное срабатывание
+        self.filters = [BloomFilter(initial_capacity, error_rate * (1 - tightening))]
+
+    def add(self, digest):
+        """Добавляет ключ, если его (вероятно) еще нет.
+
+        Returns:
+            bool: True если ключ добавлен, False если он (вероятно) уже есть
+        """
+        current = self.filters[-1]
+        if any(digest in bloom for bloom in self.filters[:-1]):
+            self.hits += 1
+            return False
+        if current.count >= current.capacity:
+            if digest in current:
+                self.hits += 1
+                return False
+            current = BloomFilter(current.capacity * self.growth, current.error_rate * self.tightening)
+            self.filters.append(current)
+        # Для текущего фильтра проверка и добавление - один проход по битам
+        if not current.add(digest):
+            self.hits += 1
+            return False
+        return True
+
+    def update(self, digests):
+        """Добавляет много ключей (например, хэши из базы данных).
+
+        Returns:
+            int: Сколько ключей добавлено
+        """
+        return sum(1 for digest in digests if self.add(digest))
+
+    def __contains__(self, digest):
+        return any(digest in bloom for bloom in reversed(self.filters))
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    @property
+    def memory_bytes(self):
+        """Размер битовых массивов всех внутренних фильтров в байтах."""
+        return sum(bloom.memory_bytes for bloom in self.filters)
+
+    @property
+    def false_positive_rate(self):
+        """Оценка доли ложных срабатываний при текущем заполнении."""
+        miss = 1.0
+        for bloom in self.filters:
+            miss *= 1 - bloom.false_positive_rate
+        return 1 - miss
+
+    def stats(self):
+        """Сводка для отчета: ключи, память, оценка ложных срабатываний."""
+        return {
+            "items": len(self),
+            "filters": len(self.filters),
+            "memory_bytes": self.memory_bytes,
+            "bits_per_item": round(self.memory_bytes * 8 / max(len(self), 1), 2),
+            "false_positive_rate": self.false_positive_rate,
+            "hits": self.hits,
+        }
@@ -0,0 +1,96 @@
+"""Модуль локального кэша результатов поиска паролей."""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Маркер отсутствия записи в кэше (None - допустимое закэшированное значение "не найдено")
+MISSING = object()
+
+
+class LookupCache:
+    """Потокобезопасный LRU-кэш с ограниченным временем жизни записей.
+
+    Хранит результаты find_password по имени сервиса, включая отрицательные
+    (None - пароль не найден). После save/delete запись нужно сбросить через invalidate().
+
+    Чтение из базы и запись в кэш не атомарны: пока читатель ждет ответа базы,
+    писатель может сохранить новый пароль и вызвать invalidate(). Чтобы
+    читатель не вернул в кэш старое значение, перед чтением из базы берется
+    generation(), и put() с этим номером ничего не делает, если запись
+    сервиса сбрасывалась после него.
+    """
+
+    def __init__(self, max_size=10000, ttl=30.0):
+        """Создает пустой кэш.
+
+        Args:
+            max_size: Максимальное количество записей
+            ttl: Время жизни записи в секундах
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # сервис -> (значение, момент устаревания)
+        self._lock = threading.Lock()
+        self._generation = 0  # увеличивается при каждом сбросе
+        self._invalidated = OrderedDict()  # сервис -> номер последнего сброса (не больше max_size записей)
+        self._floor = 0  # номер сброса, после которого забыты номера отдельных сервисов
+
+    def get(self, service):
+        """Возвращает закэшированное значение или MISSING, если записи нет или она устарела."""
+        with self._lock:
+            entry = self._entries.get(service)
+            if entry is None:
+                return MISSING
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[service]
+                return MISSING
+            self._entries.move_to_end(service)
+            return value
+
+    def generation(self):
+        """Номер, который нужно взять перед чтением из базы и передать в put()."""
+        with self._lock:
+            return self._generation
+
+    def put(self, service, value, generation=None):
+        """Сохраняет значение для сервиса, вытесняя самые старые записи при переполнении.
+
+        Args:
+            service: Название сервиса
+            value: Значение (None - пароль не найден)
+            generation: Результат generation(), взятый перед чтением value из базы.
+                Если запись сервиса сбрасывалась после него, value могло устареть
+                и не сохраняется.
+        """
+        with self._lock:
+            if generation is not None and max(self._floor, self._invalidated.get(service, 0)) > generation:
+                return
+            self._entries[service] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(service)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, service):
+        """Удаляет запись для сервиса."""
+        with self._lock:
+            self._entries.pop(service, None)
+            self._generation += 1
+            self._invalidated[service] = self._generation
+            self._invalidated.move_to_end(service)
+            while len(self._invalidated) > self.max_size:
+                _, forgotten = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, forgotten)
+
+    def clear(self):
+        """Удаляет все записи."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._invalidated.clear()
+            self._floor = self._generation
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
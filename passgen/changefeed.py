@@ -0,0 +1,120 @@
+"""Модуль подписки на изменения паролей в других процессах (LISTEN/NOTIFY).
+
+Триггер на таблице passwords (см. PasswordDB.init_change_feed) отправляет
+уведомление на каждую запись. Слушатель держит отдельное соединение с базой,
+выполняет LISTEN и передает уведомления в обработчики, чтобы процесс мог
+сбросить устаревшие записи своих локальных кэшей.
+
+Уведомления, отправленные, пока соединение было разорвано, теряются, поэтому
+после каждого (пере)подключения вызывается полная пересинхронизация (on_resync).
+"""
+
+import json
+import select
+import socket
+import sys
+import threading
+
+
+class ChangeListener:
+    """Фоновый поток, получающий уведомления об изменениях паролей."""
+
+    def __init__(self, connect, channel, on_change, on_resync,
+                 poll_interval=5.0, reconnect_delay=0.5, max_reconnect_delay=30.0):
+        """Создает слушателя (поток запускается методом start).
+
+        Args:
+            connect: Функция без аргументов, открывающая новое соединение psycopg2
+            channel: Имя канала LISTEN
+            on_change: Обработчик изменения: (операция "save"/"delete", сервис)
+            on_resync: Обработчик без аргументов: сбросить все локальные данные
+            poll_interval: Через сколько секунд тишины проверять, что соединение живо
+            reconnect_delay: Начальная пауза перед переподключением, с (удваивается до max_reconnect_delay)
+            max_reconnect_delay: Максимальная пауза перед переподключением, с
+        """
+        self._connect = connect
+        self.channel = channel
+        self._on_change = on_change
+        self._on_resync = on_resync
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.connected = threading.Event()  # установлено, пока выполняется LISTEN
+        self.resyncs = 0  # сколько раз выполнялась полная пересинхронизация
+        self._stop = threading.Event()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()  # будит select() при остановке
+        self._thread = threading.Thread(target=self._run, name="passgen-change-listener", daemon=True)
+
+    def start(self):
+        """Запускает фоновый поток."""
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Останавливает поток и закрывает соединение."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wakeup_w.send(b"\0")
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self._listen()
+                delay = self.reconnect_delay
+                self._resync()  # уведомления, отправленные до LISTEN, не придут
+                while not self._stop.is_set():
+                    self._poll(conn)
+            except Exception as e:
+                if not self._stop.is_set():
+                    print(f"❌ Потеряна подписка на изменения паролей, переподключение через {delay} с: {e}",
+                          file=sys.stderr)
+            finally:
+                self.connected.clear()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stop.wait(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _listen(self):
+        conn = self._connect()
+        conn.autocommit = True  # иначе уведомления не доставляются до конца транзакции
+        conn.cursor().execute(f'LISTEN "{self.channel}"')
+        self.connected.set()
+        return conn
+
+    def _poll(self, conn):
+        """Ждет уведомления не дольше poll_interval и передает их обработчикам."""
+        ready, _, _ = select.select([conn, self._wakeup_r], [], [], self.poll_interval)
+        if self._stop.is_set():
+            return
+        if conn in ready:
+            conn.poll()
+        else:
+            # Тишина: разорванное TCP-соединение select не покажет, проверяем запросом
+            conn.cursor().execute('SELECT 1')
+        while conn.notifies:
+            self._dispatch(conn.notifies.pop(0).payload)
+
+    def _dispatch(self, payload):
+        try:
+            message = json.loads(payload)
+            op, service = message["op"], message.get("service")
+        except (ValueError, TypeError, KeyError):
+            op, service = "resync", None
+        if op in ("save", "delete") and isinstance(service, str):
+            self._on_change(op, service)
+        else:
+            self._resync()
+
+    def _resync(self):
+        self.resyncs += 1
+        self._on_resync()
@@ -2,7 +2,7 @@
 
 from .generator import generate_password
 from .storage import save_password, find_password
-from .utils import validate_password_length
+from .utils import format_hash, validate_password_length
 
 
 def handle_generate(args):
@@ -36,7 +36,11 @@ def handle_generate(args):
 
     # Если указан сервис, сохраняем пароль
     if args.service:
-        save_password(args.service, password)
+        try:
+            save_password(args.service, password)
+        except ValueError as e:
+            print(f"Ошибка: {e}")
+            return
         print(f"Пароль для сервиса '{args.service}' сохранён (в хэшированном виде).")
 
 
@@ -52,12 +56,144 @@ def handle_find(args):
     """
     hashed_pw = find_password(args.service)
     if hashed_pw:
-        print(f"Найден хэш пароля для сервиса '{args.service}': {hashed_pw}")
+        print(f"Найден хэш пароля для сервиса '{args.service}': {format_hash(hashed_pw)}")
         print("ВНИМАНИЕ: Пароль хранится в хэшированном виде и не может быть восстановлен!")
     else:
         print(f"Пароль для сервиса '{args.service}' не найден.")
 
 
+def handle_search(args):
+    """Обрабатывает команду поиска сервисов по части названия (с учетом опечаток).
+
+    Args:
+        args: Объект с аргументами командной строки, содержащий:
+            - term (str): Поисковый запрос
+            - limit (int): Сколько результатов показать
+            - offset (int): Сколько лучших результатов пропустить
+    """
+    from .storage import search_services
+
+    results = search_services(args.term, limit=args.limit, offset=args.offset)
+
+    if not results:
+        print(f"Сервисы по запросу '{args.term}' не найдены.")
+        return
+
+    print(f"\n🔎 Результаты поиска '{args.term}' ({args.offset + 1}-{args.offset + len(results)}):")
+    print("=" * 50)
+    for service, score in results:
+        print(f"📱 {service}  (релевантность: {score:.2f})")
+
+
+def handle_history(args):
+    """Обрабатывает команду просмотра истории паролей сервиса (find --history).
+
+    Args:
+        args: Объект с аргументами командной строки, содержащий:
+            - service (str): Название сервиса
+    """
+    from .storage import get_password_history
+
+    history = get_password_history(args.service)
+
+    if not history:
+        print(f"История паролей для сервиса '{args.service}' пуста.")
+        return
+
+    print(f"\n🕑 Последние пароли сервиса '{args.service}' ({len(history)}):")
+    print("=" * 50)
+    for password_hash, created_at in history:
+        print(f"{created_at:%Y-%m-%d %H:%M:%S}  🔒 {format_hash(password_hash)}")
+
+
+def unlock_vault():
+    """Запрашивает мастер-пароль и разблокирует сейф.
+
+    Мастер-пароль берется из переменной окружения PASSGEN_MASTER_PASSWORD,
+    а если ее нет - запрашивается без отображения на экране.
+
+    Returns:
+        bool: True если сейф разблокирован
+    """
+    import getpass
+    import os
+    from .storage import unlock_vault as storage_unlock_vault
+
+    master_password = os.environ.get("PASSGEN_MASTER_PASSWORD") or getpass.getpass("Мастер-пароль сейфа: ")
+    if not master_password:
+        print("Ошибка: мастер-пароль не может быть пустым")
+        return False
+    try:
+        if storage_unlock_vault(master_password):
+            print("🔐 Создан новый сейф. Запомните мастер-пароль - без него пароли не восстановить!")
+    except (ValueError, RuntimeError) as e:
+        print(f"Ошибка: {e}")
+        return False
+    return True
+
+
+def handle_reveal(args):
+    """Обрабатывает команду показа пароля из сейфа (find --reveal).
+
+    Args:
+        args: Объект с аргументами командной строки, содержащий:
+            - service (str): Название сервиса
+    """
+    from .storage import reveal_password
+
+    if not unlock_vault():
+        return
+
+    try:
+        password = reveal_password(args.service)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        return
+
+    if password is None:
+        print(f"В сейфе нет пароля для сервиса '{args.service}'.")
+    else:
+        print(f"🔓 Пароль для сервиса '{args.service}': {password}")
+
+
+def handle_export(args):
+    """Обрабатывает команду выгрузки всех паролей из сейфа в JSON.
+
+    Args:
+        args: Объект с аргументами командной строки, содержащий:
+            - output (str): Файл для выгрузки (None - вывод на экран)
+            - workers (int): Количество потоков расшифровки
+    """
+    import json
+    import os
+    from .storage import export_passwords
+
+    if not unlock_vault():
+        return
+
+    try:
+        passwords = export_passwords(workers=args.workers)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        return
+
+    data = json.dumps(
+        [{"service": service, "password": password} for service, password in passwords],
+        ensure_ascii=False, indent=2
+    )
+    if args.output:
+        # Файл с открытыми паролями доступен только владельцу (0600), в том числе
+        # уже существующий: права меняются до записи
+        fd = os.open(args.output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        if hasattr(os, "fchmod"):
+            os.fchmod(fd, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        print(f"✅ Выгружено {len(passwords)} паролей в файл {args.output}")
+    else:
+        print(data)
+
+
 # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
 def handle_list(args):
     """Обрабатывает команду вывода всех сохраненных паролей."""
@@ -73,7 +209,7 @@ def handle_list(args):
     print("=" * 50)
     for service, password_hash in passwords:
         print(f"📱 Сервис: {service}")
-        print(f"🔒 Хэш пароля: {password_hash}")
+        print(f"🔒 Хэш пароля: {format_hash(password_hash)}")
         print("-" * 50)
 
 
@@ -92,6 +228,100 @@ def handle_delete(args):
         print(f"❌ Пароль для сервиса '{args.service}' не найден.")
 
 
+def handle_serve(args):
+    """Обрабатывает команду запуска HTTP/JSON сервера.
+
+    Args:
+        args: Объект с аргументами командной строки, содержащий:
+            - host (str): Адрес для прослушивания
+            - port (int): Порт
+            - workers (int): Сколько запросов обрабатывать одновременно
+    """
+    from .server import serve
+
+    serve(host=args.host, port=args.port, workers=args.workers)
+
+
+def handle_batch(args):
+    """Обрабатывает команду пакетного режима: JSON-команды из stdin, результаты в stdout.
+
+    Args:
+        args: Объект с аргументами командной строки, содержащий:
+            - chunk_size (int): Размер группы команд и пачки вывода
+    """
+    import sys
+    from .batch import run_batch
+
+    run_batch(sys.stdin, sys.stdout, chunk_size=args.chunk_size)
+
+
+def handle_doctor(args):
+    """Обрабатывает команду самопроверки: печатает JSON-отчет и завершает программу.
+
+    Код возврата 0 - все проверки пройдены, 1 - есть проваленные проверки.
+
+    Args:
+        args: Объект с аргументами командной строки, содержащий пороги:
+            - max_connect_ms (float), max_query_ms (float)
+            - min_generate_per_sec (float), min_hash_per_sec (float)
+    """
+    import json
+    import sys
+    from .doctor import run_checks
+    from .storage import db
+
+    report = run_checks(db, thresholds={
+        "max_connect_ms": args.max_connect_ms,
+        "max_query_ms": args.max_query_ms,
+        "min_generate_per_sec": args.min_generate_per_sec,
+        "min_hash_per_sec": args.min_hash_per_sec,
+    })
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+def handle_migrate(args):
+    """Обрабатывает команду миграции схемы базы данных на текущий формат.
+
+    Миграция переписывает таблицы под эксклюзивной блокировкой, поэтому
+    выполняется только по этой команде (в окно обслуживания), а не при запуске.
+    Код возврата 1 - миграция не удалась.
+    """
+    import sys
+    from .storage import db
+
+    try:
+        applied = db.migrate_schema()
+    except Exception as e:
+        print(f"❌ Ошибка миграции схемы: {e}")
+        sys.exit(1)
+
+    if not applied:
+        print("✅ Схема базы данных уже в актуальном формате.")
+        return
+    print("✅ Схема базы данных обновлена:")
+    for step in applied:
+        print(f"   - {step}")
+
+
+def handle_prune(args):
+    """Обрабатывает команду очистки истории паролей.
+
+    Для установок без долгоживущих режимов (serve, интерактивный режим), где
+    фоновая очистка не запускается: команду можно выполнять по расписанию (cron).
+    Код возврата 1 - очистка не удалась.
+    """
+    import sys
+    from .storage import db
+
+    try:
+        removed = db.prune_history(keep=args.keep)
+    except Exception as e:
+        print(f"❌ Ошибка при очистке истории паролей: {e}")
+        sys.exit(1)
+    print(f"✅ Удалено старых записей истории: {removed}")
+
+
 # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
 def interactive_mode():
     """Запускает интерактивный режим работы с генератором паролей.
@@ -181,7 +411,11 @@ def create_password_interactive():
     if save == 'д':
         service = input("Для какого сервиса сохраняем пароль? (например: gmail, yandex): ").strip()
         if service:
-            save_password(service, password)
+            try:
+                save_password(service, password)
+            except ValueError as e:
+                print(f" {e}")
+                return
             print(f"✅ Пароль для '{service}' сохранён (в хэшированном виде)")
         else:
             print("Название сервиса не может быть пустым")
@@ -199,7 +433,7 @@ def find_password_interactive():
 
     hashed_pw = find_password(service)
     if hashed_pw:
-        print(f"✅ Найден хэш пароля для '{service}': {hashed_pw}")
+        print(f"✅ Найден хэш пароля для '{service}': {format_hash(hashed_pw)}")
         print("ВНИМАНИЕ: Пароль хранится в хэшированном виде и не может быть восстановлен!")
     else:
         print(f"Пароль для сервиса '{service}' не найден")
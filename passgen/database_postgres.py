@@ -1,36 +1,179 @@
 """Модуль для работы с PostgreSQL базой данных паролей."""
+import itertools
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
-from .utils import hash_password
+from psycopg2.extras import execute_values
+from .replicas import CONNECTION_ERRORS, load_cluster_config, parse_lsn
+from .utils import password_digest
+
+# Параметры подключения к PostgreSQL
+DB_CONFIG = {
+    "dbname": "passwords_db",
+    "user": "anna",
+    "password": "12345",
+    "host": "localhost",  # хост (ищем программу на этом же компьютере)
+    "port": "5432",  # порт (по умолчанию для PostgreSQL)
+}
+
+# Размеры пула соединений каждого сервера (используется всеми потоками процесса)
+POOL_MIN_SIZE = 1
+POOL_MAX_SIZE = 10
+
+# Повторы при ошибке соединения: пауза RETRY_BACKOFF, 2 * RETRY_BACKOFF, ...
+CONNECT_RETRIES = 2
+RETRY_BACKOFF = 0.05
+
+# Сколько последних паролей сервиса хранится в истории и не может быть использовано повторно
+HISTORY_LIMIT = 5
+
+# Канал LISTEN/NOTIFY, в который триггер на passwords сообщает об изменениях
+CHANGE_CHANNEL = "passgen_changes"
+
+# Ключ pg_advisory_xact_lock, по очереди пропускающий init_database одновременно запущенных процессов
+SCHEMA_LOCK_KEY = 0x70617373  # "pass"
+
+
+class SchemaOutdatedError(RuntimeError):
+    """Таблицы базы еще в старом формате: чтение и запись невозможны до команды migrate."""
 
 
 class PasswordDB:
     """Класс для работы с PostgreSQL базой данных паролей."""
 
     def __init__(self):
-        """Инициализация подключения к PostgreSQL базе данных."""
-        self.init_database()  # Инициализация базы данных
+        """Инициализация подключения к PostgreSQL базе данных.
 
-    def get_connection(self, dbname="passwords_db"):
-        """Создает и возвращает соединение с PostgreSQL базой данных."""
-        return psycopg2.connect(
-            dbname=dbname,
-            user="anna",
-            password="12345",
-            host="localhost",  # хост (ищем программу на этом же компьютере)
-            port="5432"  # порт (по умолчанию для PostgreSQL)
+        Адреса основного сервера и реплик берутся из переменных окружения
+        (см. модуль replicas); без них используется DB_CONFIG.
+        """
+        # Запись - на основной сервер, чтение - на реплики (если они настроены)
+        self.primary, self.replicas, self.max_replica_lag = load_cluster_config(
+            DB_CONFIG, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE
         )
+        self._replica_counter = itertools.count()  # для перебора реплик по кругу
+        self._write_lsn = 0  # позиция WAL после последней записи этого процесса (см. _commit_write)
+        self._write_lsn_lock = threading.Lock()
+        self.init_error = None  # текст ошибки инициализации (None - база готова к работе)
+        self.pending_schema_steps = []  # невыполненные шаги миграции (см. migrate_schema)
+        self.trigram_search = False  # доступно ли расширение pg_trgm для нечеткого поиска
+        self.init_database()  # Инициализация базы данных
+
+    def get_connection(self, dbname=None):
+        """Создает и возвращает новое соединение с основным сервером (вне пула).
+
+        Args:
+            dbname: Имя базы данных (по умолчанию - из настроек подключения)
+        """
+        return self.primary.connect(**({"dbname": dbname} if dbname else {}))
+
+    @contextmanager
+    def connection(self):
+        """Выдает соединение с основным сервером из пула и возвращает его обратно после работы.
+
+        При выходе из блока без ошибок транзакция подтверждается, при исключении - откатывается.
+        Пул потокобезопасен, поэтому одним объектом PasswordDB могут пользоваться несколько потоков.
+        Если соединение не удалось получить, попытка повторяется CONNECT_RETRIES раз с паузой.
+
+        Raises:
+            SchemaOutdatedError: Если таблицы еще в старом формате (нужна команда migrate)
+        """
+        self._check_schema()
+        with self.primary.connection(retries=CONNECT_RETRIES, backoff=RETRY_BACKOFF) as conn:
+            yield conn
+
+    def _check_schema(self):
+        """Не дает читать и писать таблицы старого формата (хэши в них - hex-строки)."""
+        if self.pending_schema_steps:
+            raise SchemaOutdatedError("Схема базы данных устарела: выполните 'python main.py migrate'")
+
+    def _commit_write(self, conn):
+        """Подтверждает транзакцию записи и запоминает позицию WAL после нее.
+
+        Реплика, еще не применившая эту позицию, не используется для чтения,
+        поэтому процесс сразу видит свои записи (например, list после save).
+        """
+        conn.commit()
+        if self.replicas:
+            cursor = conn.cursor()
+            cursor.execute('SELECT pg_current_wal_lsn()')
+            lsn = parse_lsn(cursor.fetchone()[0])
+            with self._write_lsn_lock:
+                self._write_lsn = max(self._write_lsn, lsn)
+
+    def _read(self, query):
+        """Выполняет запрос на чтение на реплике (или на основном сервере).
+
+        Реплики перебираются по кругу; пропускаются отключенные автоматом,
+        отстающие больше чем на max_replica_lag секунд и еще не применившие
+        последнюю запись этого процесса. Если подходящих реплик нет, чтение
+        идет на основной сервер. При ошибке соединения запрос
+        повторяется на следующем узле с нарастающей паузой.
+
+        Args:
+            query: Функция (курсор) -> результат; может быть вызвана повторно
+
+        Returns:
+            Результат query
+
+        Raises:
+            SchemaOutdatedError: Если таблицы еще в старом формате (нужна команда migrate)
+        """
+        self._check_schema()
+        tried = set()
+        last_error = None
+        for attempt in range(CONNECT_RETRIES + 1):
+            node = self._choose_read_node(tried)
+            if node is None:
+                break
+            try:
+                with node.connection() as conn:
+                    return query(conn.cursor())
+            except CONNECTION_ERRORS as e:
+                last_error = e
+                tried.add(node.name)
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        raise last_error or psycopg2.OperationalError("Нет доступных серверов базы данных")
+
+    def _choose_read_node(self, tried):
+        """Выбирает узел для чтения: сначала еще не опробованные, затем любые доступные."""
+        count = len(self.replicas)
+        start = next(self._replica_counter)
+        ordered = [self.replicas[(start + i) % count] for i in range(count)] + [self.primary]
+        for candidates in ([node for node in ordered if node.name not in tried], ordered):
+            for node in candidates:
+                if not node.breaker.available:
+                    continue
+                if node is not self.primary:
+                    try:
+                        if self.max_replica_lag is not None and node.replication_lag() > self.max_replica_lag:
+                            continue
+                        if self._write_lsn and not node.has_replayed(self._write_lsn):
+                            continue
+                    except CONNECTION_ERRORS:
+                        continue
+                return node
+        return None
+
+    def close(self):
+        """Закрывает все соединения пулов."""
+        for node in [self.primary, *self.replicas]:
+            node.close()
 
     def init_database(self):
-        """Создает базу данных и таблицу, если они не существуют."""
+        """Создает базу данных и таблицу, если они не существуют.
+
+        Ошибка не прерывает запуск программы, но сохраняется в init_error
+        (ее показывает команда doctor).
+        """
+        self.init_error = None
+        self.pending_schema_steps = []
         try:
             # Сначала подключаемся к стандартной базе postgres
-            conn = psycopg2.connect(
-                dbname="postgres",
-                user="anna",
-                password="12345",
-                host="localhost",
-                port="5432"
-            )
+            conn = self.get_connection("postgres")
             conn.autocommit = True  # Для создания базы данных (автоматическое подтверждение изменений)
 
             cursor = conn.cursor()  # создаем объект курсора(выполняет SQL-запросы к базе данных)
@@ -41,63 +184,447 @@ class PasswordDB:
 
             if not exists:
                 cursor.execute('CREATE DATABASE passwords_db')
-                print("✅ База данных passwords_db создана")
+                print("✅ База данных passwords_db создана", file=sys.stderr)
 
             cursor.close()
             conn.close()
         except Exception as e:
-            print(f"❌ Ошибка при создании базы данных: {e}")
+            print(f"❌ Ошибка при создании базы данных: {e}", file=sys.stderr)
+            self.init_error = f"Ошибка при создании базы данных: {str(e).strip()}"
             return
 
         # Теперь подключаемся к нашей базе и создаем таблицу
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                # Одновременные запуски иначе падают на CREATE ... в каталоге
+                # ("tuple concurrently updated", "already exists")
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', (SCHEMA_LOCK_KEY,))
+                cursor.execute("SELECT to_regclass('passwords') IS NULL")
+                new_table = cursor.fetchone()[0]
+                # Компактная схема: сервис - первичный ключ, SHA-256 хранится как 32 байта BYTEA.
+                # Колонки фиксированной длины идут первыми, чтобы не тратить байты на выравнивание
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS passwords (
-                        id SERIAL PRIMARY KEY,                       
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        service TEXT PRIMARY KEY,
+                        password_hash BYTEA NOT NULL
+                    )
+                ''')
+                # История паролей: порядок записей задает id, а не created_at - несколько
+                # сохранений одного сервиса в одной транзакции получают разные id
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS password_history (
+                        id BIGINT GENERATED ALWAYS AS IDENTITY,
+                        created_at TIMESTAMP DEFAULT clock_timestamp(),
                         service TEXT NOT NULL,
-                        password_hash TEXT NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        password_hash BYTEA NOT NULL
+                    )
+                ''')
+                # Таблицы старого формата не мигрируем при запуске: миграция переписывает
+                # таблицы под эксклюзивной блокировкой и запускается командой migrate
+                pending = self.pending_migrations(cursor)
+                self.pending_schema_steps = pending
+                if pending:
+                    self.init_error = ("Схема базы данных устарела, выполните 'python main.py migrate' "
+                                       f"в окно обслуживания: {'; '.join(pending)}")
+                    print(f"⚠️ {self.init_error}", file=sys.stderr)
+                # Индекс (service, id DESC) отдает последние N хэшей сервиса одним сканом
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS password_history_service_id_idx
+                    ON password_history (service, id DESC)
+                ''')
+                self.init_change_feed(cursor)
+                # Режим сейфа: зашифрованный пароль и параметры ключа (одна строка)
+                cursor.execute('ALTER TABLE passwords ADD COLUMN IF NOT EXISTS encrypted_password BYTEA')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS vault_meta (
+                        id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                        salt BYTEA NOT NULL,
+                        check_blob BYTEA NOT NULL
                     )
-                ''')    # Автоматически увеличивающееся целое число (первичный ключ)
+                ''')
+                if new_table:
+                    # Индексы пустой таблицы строятся мгновенно - новой базе не нужен migrate
+                    cursor.execute('SAVEPOINT search_indexes')
+                    try:
+                        self.create_search_indexes(cursor, concurrently=False)
+                    except psycopg2.Error:
+                        cursor.execute('ROLLBACK TO SAVEPOINT search_indexes')  # без pg_trgm
                 conn.commit()
-                print("✅ Таблица passwords создана в PostgreSQL")
+                print("✅ Таблица passwords создана в PostgreSQL", file=sys.stderr)
+        except Exception as e:
+            print(f"❌ Ошибка при создании таблицы: {e}", file=sys.stderr)
+            self.init_error = f"Ошибка при создании таблицы: {str(e).strip()}"
+            return
+
+        self.detect_search_indexes()
+
+    def pending_migrations(self, cursor):
+        """Проверяет, остались ли таблицы старого формата.
+
+        Args:
+            cursor: Курсор открытой транзакции
+
+        Returns:
+            list: Описания нужных шагов миграции (пустой, если схема актуальна)
+        """
+        return [description for description, _ in self._migration_steps(cursor)]
+
+    def migrate_schema(self):
+        """Переводит таблицы старого формата на текущую схему (команда migrate).
+
+        Обе таблицы блокируются до конца миграции, поэтому одновременно
+        запущенные миграции выполняются по очереди: следующая видит, что
+        делать уже нечего. Затем без блокировки записи строятся недостающие
+        индексы поиска и повторно выполняется init_database.
+
+        Returns:
+            list: Описания выполненных шагов (пустой, если схема уже актуальна)
+        """
+        # Не через connection(): она закрыта для таблиц старого формата
+        with self.primary.connection(retries=CONNECT_RETRIES, backoff=RETRY_BACKOFF) as conn:
+            cursor = conn.cursor()
+            cursor.execute('LOCK TABLE passwords, password_history IN ACCESS EXCLUSIVE MODE')
+            applied = self.migrate_compact_schema(cursor)
+            conn.commit()
+
+        conn = self.get_connection()
+        try:
+            conn.autocommit = True  # CREATE INDEX CONCURRENTLY не выполняется в транзакции
+            applied += self.create_search_indexes(conn.cursor())
+        except psycopg2.Error as e:
+            print(f"⚠️ Индексы нечеткого поиска не созданы, поиск будет выполняться в памяти: {e}",
+                  file=sys.stderr)
+        finally:
+            conn.close()
+
+        self.init_database()
+        return applied
+
+    def migrate_compact_schema(self, cursor):
+        """Переводит таблицы старого формата на компактную схему.
+
+        Старый формат: суррогатный id SERIAL и хэш в виде hex-строки TEXT
+        (64 символа + заголовок varlena вместо 32 байт). Миграция:
+        - hex-хэши переводятся в BYTEA (decode(..., 'hex'))
+        - из passwords удаляются дубликаты сервиса (остается запись с большим id),
+          колонка id удаляется, первичным ключом становится service
+
+        ALTER COLUMN TYPE переписывает таблицу и держит эксклюзивную блокировку,
+        поэтому на большой базе миграцию стоит запускать в окно обслуживания.
+        Выполняется в транзакции вызывающего кода.
+
+        Args:
+            cursor: Курсор открытой транзакции
+
+        Returns:
+            list: Описания выполненных шагов (пустой, если схема не изменилась)
+        """
+        applied = []
+        for description, statements in self._migration_steps(cursor):
+            for statement in statements:
+                cursor.execute(statement)
+            applied.append(description)
+        return applied
+
+    def _migration_steps(self, cursor):
+        """Список (описание, SQL-команды) для таблиц, которые еще в старом формате."""
+        cursor.execute('''
+            SELECT table_name, column_name, data_type FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = 'passwords' AND column_name IN ('id', 'password_hash')
+        ''')
+        columns = {(table, column): data_type for table, column, data_type in cursor.fetchall()}
+        steps = []
+
+        if ('passwords', 'id') in columns:
+            steps.append(("passwords: первичный ключ service вместо id", [
+                'DELETE FROM passwords AS old USING passwords AS newer '
+                'WHERE old.service = newer.service AND old.id < newer.id',
+                'ALTER TABLE passwords DROP COLUMN id',  # вместе с ограничением PRIMARY KEY
+                'ALTER TABLE passwords ADD PRIMARY KEY (service)',
+            ]))
+
+        if columns.get(('passwords', 'password_hash')) == 'text':
+            steps.append(("passwords: хэш BYTEA вместо hex-строки", [
+                "ALTER TABLE passwords ALTER COLUMN password_hash TYPE BYTEA "
+                "USING decode(password_hash, 'hex')",
+            ]))
+        return steps
+
+    def init_change_feed(self, cursor):
+        """Создает триггер, сообщающий об изменениях passwords через NOTIFY.
+
+        Триггер срабатывает на любую запись в таблицу (в том числе не из passgen)
+        и отправляет в канал CHANGE_CHANNEL JSON {"op": "save"|"delete", "service": ...}.
+        Уведомления доставляются только после подтверждения транзакции, а одинаковые
+        уведомления одной транзакции PostgreSQL объединяет. После TRUNCATE и для
+        слишком длинных названий (предел NOTIFY - 8000 байт) отправляется
+        {"op": "resync"} - слушатель сбрасывает все локальные данные.
+
+        Args:
+            cursor: Курсор открытой транзакции (под блокировкой SCHEMA_LOCK_KEY)
+        """
+        # Функция и триггеры создаются, только если их нет: изменение каталога при
+        # каждом запуске блокирует таблицу и мешает одновременно запущенным процессам
+        cursor.execute('''
+            SELECT to_regprocedure('passgen_notify_change()') IS NOT NULL,
+                   EXISTS (SELECT 1 FROM pg_trigger WHERE tgrelid = 'passwords'::regclass
+                                                      AND tgname = 'passwords_notify_change')
+        ''')
+        has_function, has_trigger = cursor.fetchone()
+        if not has_function:
+            cursor.execute(f'''
+                CREATE FUNCTION passgen_notify_change() RETURNS trigger AS $$
+                DECLARE
+                    payload TEXT;
+                BEGIN
+                    IF TG_OP = 'TRUNCATE' THEN
+                        payload := '{{"op": "resync"}}';
+                    ELSIF TG_OP = 'DELETE' THEN
+                        payload := json_build_object('op', 'delete', 'service', OLD.service)::TEXT;
+                    ELSE
+                        payload := json_build_object('op', 'save', 'service', NEW.service)::TEXT;
+                    END IF;
+                    IF octet_length(payload) > 7900 THEN
+                        payload := '{{"op": "resync"}}';
+                    END IF;
+                    PERFORM pg_notify('{CHANGE_CHANNEL}', payload);
+                    RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql
+            ''')
+        if not has_trigger:
+            cursor.execute('''
+                CREATE TRIGGER passwords_notify_change
+                AFTER INSERT OR UPDATE OR DELETE ON passwords
+                FOR EACH ROW EXECUTE FUNCTION passgen_notify_change()
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER passwords_notify_truncate
+                AFTER TRUNCATE ON passwords
+                FOR EACH STATEMENT EXECUTE FUNCTION passgen_notify_change()
+            ''')
+
+    def create_search_indexes(self, cursor, concurrently=True):
+        """Создает индексы для поиска по названию сервиса.
+
+        Триграммный GiST-индекс (pg_trgm) ускоряет поиск подстроки и опечаток
+        и, в отличие от GIN, отдает строки в порядке сходства (service <-> запрос),
+        поэтому поиск с LIMIT не сортирует все совпадения. Индекс по
+        lower(service) - поиск по префиксу.
+
+        Построение индекса большой таблицы - долгое, поэтому выполняется
+        командой migrate, а не при запуске. CONCURRENTLY не блокирует запись,
+        но работает только вне транзакции (соединение в режиме autocommit).
+        Индекс, оставшийся невалидным после прерванного построения, пересоздается.
+
+        Args:
+            cursor: Курсор соединения (в режиме autocommit, если concurrently)
+            concurrently: Строить индексы без блокировки записи в passwords
+
+        Returns:
+            list: Описания выполненных шагов (пустой, если индексы уже есть)
+
+        Raises:
+            psycopg2.Error: Если расширение pg_trgm недоступно
+        """
+        mode = 'CONCURRENTLY ' if concurrently else ''
+        applied = []
+        if self._create_index(cursor, 'passwords_service_prefix_idx',
+                              'ON passwords (lower(service) text_pattern_ops)', mode):
+            applied.append("passwords: индекс для поиска по префиксу")
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        if self._create_index(cursor, 'passwords_service_trgm_gist_idx',
+                              'ON passwords USING gist (service gist_trgm_ops)', mode):
+            applied.append("passwords: триграммный GiST-индекс для нечеткого поиска")
+        # GIN-индекс прежних версий не умеет упорядочивать по сходству
+        cursor.execute("SELECT to_regclass('passwords_service_trgm_idx') IS NOT NULL")
+        if cursor.fetchone()[0]:
+            cursor.execute(f'DROP INDEX {mode}passwords_service_trgm_idx')
+            applied.append("passwords: удален триграммный GIN-индекс")
+        return applied
+
+    def _create_index(self, cursor, name, definition, mode):
+        """Создает индекс, если его нет или он невалиден. Возвращает True, если индекс создан."""
+        cursor.execute('SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)', (name,))
+        row = cursor.fetchone()
+        if row and row[0]:
+            return False
+        if row:
+            cursor.execute(f'DROP INDEX {mode}{name}')
+        cursor.execute(f'CREATE INDEX {mode}{name} {definition}')
+        return True
+
+    def detect_search_indexes(self):
+        """Проверяет, есть ли расширение pg_trgm и триграммный индекс для поиска.
+
+        При запуске индексы не строятся (см. create_search_indexes): без
+        готового индекса нечеткий поиск выполняется в памяти (см. модуль search).
+        """
+        try:
+            conn = self.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')
+                       AND EXISTS (SELECT 1 FROM pg_index
+                                   WHERE indexrelid = to_regclass('passwords_service_trgm_gist_idx')
+                                     AND indisvalid)
+                ''')
+                self.trigram_search = bool(cursor.fetchone()[0])
+            finally:
+                conn.close()
         except Exception as e:
-            print(f"❌ Ошибка при создании таблицы: {e}")
+            print(f"⚠️ Нечеткий поиск будет выполняться в памяти: {e}", file=sys.stderr)
+            return
+        if not self.trigram_search:
+            print("⚠️ Нечеткий поиск будет выполняться в памяти: нет индекса pg_trgm "
+                  "(создается командой 'python main.py migrate')", file=sys.stderr)
 
-    def save_password(self, service, password):
+    def save_password(self, service, password, encrypted_password=None):
         """Сохраняет хэш пароля в PostgreSQL базу данных.
 
         Args:
             service: Название сервиса
             password: Пароль в открытом виде
+            encrypted_password: Зашифрованный пароль для режима сейфа (bytes) или None
+
+        Raises:
+            ValueError: Если пароль совпадает с одним из последних HISTORY_LIMIT паролей сервиса
         """
-        hashed_pw = hash_password(password)
+        hashed_pw = password_digest(password)
 
-        with self.get_connection() as conn:
+        with self.connection() as conn:
             cursor = conn.cursor()
-
-            # Проверяем, существует ли уже запись для этого сервиса
-            cursor.execute('SELECT id FROM passwords WHERE service = %s', (service,))
-            existing = cursor.fetchone()
-
-            if existing:
-                # Обновляем существующую запись
-                cursor.execute(
-                    'UPDATE passwords SET password_hash = %s WHERE service = %s',
-                    (hashed_pw, service)
-                )
+            if self._write_password(cursor, service, hashed_pw, encrypted_password):
                 print(f"✅ Пароль для '{service}' обновлен в PostgreSQL")
             else:
-                # Создаем новую запись (указываем таблицу для вставки)
-                cursor.execute(
-                    'INSERT INTO passwords (service, password_hash) VALUES (%s, %s)',
-                    (service, hashed_pw)
-                )
                 print(f"✅ Пароль для '{service}' сохранен в PostgreSQL")
+            self._commit_write(conn)
 
-            conn.commit()
+    def save_passwords(self, items, encrypted_passwords=None):
+        """Сохраняет пароли для нескольких сервисов в одной транзакции.
+
+        Текущие хэши и последние HISTORY_LIMIT хэшей истории всех сервисов
+        группы читаются одним запросом, проверка повтора идет в памяти, а
+        запись в passwords (upsert) и в историю - двумя командами execute_values.
+        Повторно использованный пароль не прерывает пакет: ошибка возвращается
+        для соответствующего элемента, остальные пароли сохраняются.
+
+        Args:
+            items: Список пар (сервис, пароль в открытом виде)
+            encrypted_passwords: Список зашифрованных паролей в том же порядке (режим сейфа) или None
+
+        Returns:
+            list: Для каждого элемента None при успехе или текст ошибки
+        """
+        items = list(items)
+        if not items:
+            return []
+        if encrypted_passwords is None:
+            encrypted_passwords = [None] * len(items)
+        services = list(dict.fromkeys(service for service, _ in items))
+
+        errors = []
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT requested.service, current.password_hash, recent.hashes
+                FROM unnest(%s::text[]) AS requested(service)
+                LEFT JOIN passwords AS current ON current.service = requested.service
+                LEFT JOIN LATERAL (
+                    SELECT array_agg(password_hash ORDER BY id DESC) AS hashes FROM (
+                        SELECT id, password_hash FROM password_history
+                        WHERE service = requested.service
+                        ORDER BY id DESC
+                        LIMIT %s
+                    ) AS latest
+                ) AS recent ON TRUE
+            ''', (services, HISTORY_LIMIT))
+            # сервис -> (текущий хэш или None, последние хэши истории от новых к старым)
+            known = {
+                service: (bytes(current) if current is not None else None, [bytes(h) for h in hashes or []])
+                for service, current, hashes in cursor.fetchall()
+            }
+
+            rows = {}  # сервис -> строка passwords (при повторе сервиса в группе остается последняя)
+            history = []
+            for (service, password), encrypted in zip(items, encrypted_passwords):
+                hashed_pw = password_digest(password)
+                current_hash, recent = known.get(service, (None, []))
+                if hashed_pw == current_hash or hashed_pw in recent:
+                    errors.append(f"Пароль для '{service}' совпадает с одним из последних {HISTORY_LIMIT} паролей")
+                    continue
+                # Следующий элемент того же сервиса проверяется с учетом этого сохранения
+                known[service] = (hashed_pw, [hashed_pw, *recent][:HISTORY_LIMIT])
+                rows[service] = (service, hashed_pw, encrypted)
+                history.append((service, hashed_pw))
+                errors.append(None)
+
+            if rows:
+                execute_values(cursor, '''
+                    INSERT INTO passwords (service, password_hash, encrypted_password) VALUES %s
+                    ON CONFLICT (service) DO UPDATE
+                    SET password_hash = EXCLUDED.password_hash, encrypted_password = EXCLUDED.encrypted_password
+                ''', list(rows.values()), page_size=len(rows))
+                # Порядок строк задает id истории: сохранения одного сервиса идут в порядке элементов
+                execute_values(cursor, 'INSERT INTO password_history (service, password_hash) VALUES %s',
+                               history, page_size=len(history))
+            self._commit_write(conn)
+        return errors
+
+    def _write_password(self, cursor, service, hashed_pw, encrypted_password=None):
+        """Записывает хэш пароля в таблицу и историю в рамках текущей транзакции.
+
+        Зашифрованный пароль перезаписывается всегда: при сохранении без сейфа
+        старая зашифрованная копия удаляется, чтобы не вернуть устаревший пароль.
+
+        Returns:
+            bool: True если запись обновлена, False если создана новая
+
+        Raises:
+            ValueError: Если пароль совпадает с одним из последних HISTORY_LIMIT паролей сервиса
+        """
+        # Одним запросом получаем текущий хэш и проверяем повтор среди последних паролей
+        cursor.execute('''
+            SELECT
+                (SELECT password_hash FROM passwords WHERE service = %s LIMIT 1),
+                EXISTS (
+                    SELECT 1 FROM (
+                        SELECT password_hash FROM password_history
+                        WHERE service = %s
+                        ORDER BY id DESC
+                        LIMIT %s
+                    ) AS recent
+                    WHERE recent.password_hash = %s
+                )
+        ''', (service, service, HISTORY_LIMIT, hashed_pw))
+        current_hash, reused = cursor.fetchone()
+
+        if reused or (current_hash is not None and bytes(current_hash) == hashed_pw):
+            raise ValueError(
+                f"Пароль для '{service}' совпадает с одним из последних {HISTORY_LIMIT} паролей"
+            )
+
+        # Запись в основную таблицу и в историю уходит на сервер одной командой
+        if current_hash is not None:
+            # Обновляем существующую запись
+            cursor.execute(
+                'UPDATE passwords SET password_hash = %s, encrypted_password = %s WHERE service = %s; '
+                'INSERT INTO password_history (service, password_hash) VALUES (%s, %s)',
+                (hashed_pw, encrypted_password, service, service, hashed_pw)
+            )
+            return True
+
+        # Создаем новую запись (указываем таблицу для вставки)
+        cursor.execute(
+            'INSERT INTO passwords (service, password_hash, encrypted_password) VALUES (%s, %s, %s); '
+            'INSERT INTO password_history (service, password_hash) VALUES (%s, %s)',
+            (service, hashed_pw, encrypted_password, service, hashed_pw)
+        )
+        return False
 
     def find_password(self, service):
         """Находит хэш пароля по названию сервиса в PostgreSQL.
@@ -106,27 +633,197 @@ class PasswordDB:
             service: Название сервиса
 
         Returns:
-            str or None: Хэш пароля или None если не найден
+            bytes or None: SHA-256 хэш пароля (32 байта) или None если не найден
         """
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        def query(cursor):
             cursor.execute(
                 'SELECT password_hash FROM passwords WHERE service = %s',
                 (service,)
             )
             result = cursor.fetchone()
-            return result[0] if result else None
+            return bytes(result[0]) if result else None
+
+        return self._read(query)
+
+    def find_passwords(self, services):
+        """Находит хэши паролей сразу для нескольких сервисов одним запросом.
+
+        Args:
+            services: Список названий сервисов
+
+        Returns:
+            dict: Словарь {сервис: хэш_пароля (bytes) или None если не найден}
+        """
+        services = list(services)
+        found = dict.fromkeys(services)
+        if not services:
+            return found
+
+        def query(cursor):
+            cursor.execute(
+                'SELECT service, password_hash FROM passwords WHERE service = ANY(%s)',
+                (services,)
+            )
+            found.update((service, bytes(password_hash)) for service, password_hash in cursor.fetchall())
+
+        self._read(query)
+        return found
+
+    def find_encrypted_password(self, service):
+        """Находит зашифрованный пароль сервиса (режим сейфа).
+
+        Args:
+            service: Название сервиса
+
+        Returns:
+            bytes or None: Зашифрованный пароль или None если не найден
+        """
+        def query(cursor):
+            cursor.execute(
+                'SELECT encrypted_password FROM passwords WHERE service = %s',
+                (service,)
+            )
+            result = cursor.fetchone()
+            return bytes(result[0]) if result and result[0] is not None else None
+
+        return self._read(query)
+
+    def get_all_encrypted_passwords(self):
+        """Возвращает все зашифрованные пароли (режим сейфа).
+
+        Returns:
+            list: Список кортежей (сервис, зашифрованный_пароль)
+        """
+        def query(cursor):
+            cursor.execute(
+                'SELECT service, encrypted_password FROM passwords '
+                'WHERE encrypted_password IS NOT NULL ORDER BY service'
+            )
+            return [(service, bytes(blob)) for service, blob in cursor.fetchall()]
+
+        return self._read(query)
+
+    def get_vault_meta(self):
+        """Возвращает параметры сейфа: (соль, контрольная_запись) или None, если сейф не создан."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT salt, check_blob FROM vault_meta')
+            result = cursor.fetchone()
+            return (bytes(result[0]), bytes(result[1])) if result else None
+
+    def create_vault_meta(self, salt, check_blob):
+        """Сохраняет параметры нового сейфа.
+
+        Returns:
+            bool: True если сейф создан, False если другой процесс успел создать его раньше
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'INSERT INTO vault_meta (salt, check_blob) VALUES (%s, %s) ON CONFLICT DO NOTHING',
+                (salt, check_blob)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def search_services(self, term, limit=20, offset=0):
+        """Ищет сервисы по префиксу, подстроке и с учетом опечаток (требует pg_trgm).
+
+        Ранжирование: точное совпадение - 3, префикс - 2 + сходство,
+        подстрока - 1 + сходство, похожее название - сходство по триграммам.
+        Запросы короче трех символов ищутся только по префиксу.
+
+        Каждый уровень (префикс, подстрока, похожие) - отдельный запрос с
+        ORDER BY service <-> запрос и LIMIT: GiST-индекс отдает строки сразу
+        в порядке сходства, и база не оценивает все совпадения. Следующий
+        уровень запрашивается, только если предыдущих не хватило на страницу.
+
+        Args:
+            term: Поисковый запрос
+            limit: Сколько результатов вернуть
+            offset: Сколько лучших результатов пропустить
+
+        Returns:
+            list: Список кортежей (сервис, оценка), от лучших к худшим
+        """
+        # Экранируем спецсимволы LIKE, чтобы запрос искался буквально
+        pattern = term.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params = {
+            "term": term,
+            "prefix": pattern + '%',
+            "substring": '%' + pattern + '%',
+        }
+        # (оценка уровня, условие); условия не пересекаются, поэтому сервис встречается один раз
+        tiers = [(2.0, 'lower(service) LIKE %(prefix)s')]
+        if len(term) >= 3:  # для коротких запросов триграммы не работают
+            tiers += [
+                (1.0, 'service ILIKE %(substring)s AND lower(service) NOT LIKE %(prefix)s'),
+                (0.0, 'service %% %(term)s AND service NOT ILIKE %(substring)s'),
+            ]
+        wanted = offset + limit
+
+        def query(cursor):
+            results = []
+            for tier_score, condition in tiers:
+                if len(results) >= wanted:
+                    break
+                cursor.execute(f'''
+                    SELECT service, similarity(service, %(term)s) FROM passwords
+                    WHERE {condition}
+                    ORDER BY service <-> %(term)s, service
+                    LIMIT %(limit)s
+                ''', {**params, "limit": wanted - len(results)})
+                results.extend(
+                    (service, 3.0 if service == term else tier_score + float(score))
+                    for service, score in cursor.fetchall()
+                )
+            return results[offset:wanted]
+
+        return self._read(query)
+
+    def get_service_names(self):
+        """Возвращает названия всех сервисов.
+
+        Returns:
+            list: Список названий сервисов
+        """
+        def query(cursor):
+            cursor.execute('SELECT service FROM passwords')
+            return [row[0] for row in cursor.fetchall()]
+
+        return self._read(query)
 
     def get_all_passwords(self):
         """Возвращает все сохраненные пароли из PostgreSQL.
 
         Returns:
-            list: Список кортежей (сервис, хэш_пароля)
+            list: Список кортежей (сервис, хэш_пароля в bytes)
         """
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        def query(cursor):
             cursor.execute('SELECT service, password_hash FROM passwords ORDER BY service')
-            return cursor.fetchall()
+            return [(service, bytes(password_hash)) for service, password_hash in cursor.fetchall()]
+
+        return self._read(query)
+
+    def iter_password_hashes(self, batch_size=10000):
+        """Перебирает хэши всех паролей, не загружая таблицу в память целиком.
+
+        Используется именованный (серверный) курсор: строки приходят пачками
+        по batch_size. Чтение идет с основного сервера - долгий запрос на
+        реплике может быть прерван при применении изменений.
+
+        Args:
+            batch_size: Сколько строк получать с сервера за раз
+
+        Yields:
+            bytes: SHA-256 хэш пароля (32 байта)
+        """
+        with self.connection() as conn:
+            with conn.cursor(name="passgen_password_hashes") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute('SELECT password_hash FROM passwords')
+                for (password_hash,) in cursor:
+                    yield bytes(password_hash)
 
     def delete_password(self, service):
         """Удаляет пароль для указанного сервиса из PostgreSQL.
@@ -137,8 +834,105 @@ class PasswordDB:
         Returns:
             bool: True если удалено, False если не найдено
         """
-        with self.get_connection() as conn:
+        with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM passwords WHERE service = %s', (service,))
-            conn.commit()
+            self._commit_write(conn)
             return cursor.rowcount > 0  # количество затронутых строк
+
+    def delete_passwords(self, services):
+        """Удаляет пароли для нескольких сервисов одним запросом.
+
+        Args:
+            services: Список названий сервисов
+
+        Returns:
+            set: Множество сервисов, для которых пароль был удален
+        """
+        services = list(services)
+        if not services:
+            return set()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'DELETE FROM passwords WHERE service = ANY(%s) RETURNING service',
+                (services,)
+            )
+            deleted = {row[0] for row in cursor.fetchall()}
+            self._commit_write(conn)
+            return deleted
+
+    def get_password_history(self, service, limit=HISTORY_LIMIT):
+        """Возвращает последние пароли сервиса из истории.
+
+        Args:
+            service: Название сервиса
+            limit: Сколько последних записей вернуть
+
+        Returns:
+            list: Список кортежей (хэш_пароля в bytes, дата_создания), от новых к старым
+        """
+        def query(cursor):
+            cursor.execute(
+                'SELECT password_hash, created_at FROM password_history '
+                'WHERE service = %s ORDER BY id DESC LIMIT %s',
+                (service, limit)
+            )
+            return [(bytes(password_hash), created_at) for password_hash, created_at in cursor.fetchall()]
+
+        return self._read(query)
+
+    def prune_history(self, keep=HISTORY_LIMIT, batch_size=1000):
+        """Удаляет из истории записи старше последних `keep` паролей каждого сервиса.
+
+        Граница (id самой новой удаляемой записи) вычисляется для всех сервисов
+        одним проходом по истории. Затем записи удаляются по индексу
+        (service, id DESC) пачками примерно по `batch_size` строк, каждая пачка -
+        отдельная транзакция, чтобы не держать долгие блокировки на большой таблице.
+        Записи, добавленные после вычисления границ, имеют больший id и не удаляются.
+
+        Args:
+            keep: Сколько последних паролей оставить для каждого сервиса
+            batch_size: Размер одной пачки удаления
+
+        Returns:
+            int: Общее количество удаленных записей
+        """
+        removed = 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT service, id, total - %(keep)s FROM (
+                    SELECT service, id,
+                        row_number() OVER (PARTITION BY service ORDER BY id DESC) AS position,
+                        count(*) OVER (PARTITION BY service) AS total
+                    FROM password_history
+                ) AS ranked
+                WHERE position = %(keep)s + 1
+            ''', {"keep": keep})
+            cutoffs = cursor.fetchall()
+            conn.commit()
+
+            chunk = []
+            chunk_rows = 0
+            for service, cutoff_id, excess in cutoffs:
+                chunk.append((service, cutoff_id))
+                chunk_rows += excess
+                if chunk_rows >= batch_size:
+                    removed += self._delete_history_chunk(cursor, chunk)
+                    conn.commit()
+                    chunk = []
+                    chunk_rows = 0
+            if chunk:
+                removed += self._delete_history_chunk(cursor, chunk)
+                conn.commit()
+        return removed
+
+    def _delete_history_chunk(self, cursor, chunk):
+        """Удаляет записи истории с id не больше границы сервиса: chunk - список (сервис, граница)."""
+        cursor.execute('''
+            DELETE FROM password_history AS history
+            USING unnest(%s::text[], %s::bigint[]) AS cutoff(service, id)
+            WHERE history.service = cutoff.service AND history.id <= cutoff.id
+        ''', ([service for service, _ in chunk], [cutoff_id for _, cutoff_id in chunk]))
+        return cursor.rowcount
@@ -0,0 +1,133 @@
+"""Модуль самопроверки (команда doctor).
+
+Проверяет доступность базы данных, задержки, наличие индекса на service,
+размер таблицы и скорость генерации/хэширования на текущей машине.
+Результат - словарь, пригодный для вывода в JSON: у каждой проверки есть
+измеренное значение, порог и признак ok, у отчета в целом - общий признак ok.
+"""
+
+import statistics
+import time
+
+from .generator import generate_password
+from .utils import password_digest
+
+# Пороги по умолчанию: max_* - значение не должно превышать порог, min_* - не должно быть меньше
+DEFAULT_THRESHOLDS = {
+    "max_connect_ms": 100.0,
+    "max_query_ms": 20.0,
+    "min_generate_per_sec": 10000.0,
+    "min_hash_per_sec": 100000.0,
+}
+
+# Сколько раз повторять запрос для замера задержки и сколько секунд мерить скорость
+QUERY_SAMPLES = 5
+THROUGHPUT_SECONDS = 0.2
+
+
+def run_checks(db, thresholds=None):
+    """Выполняет все проверки и возвращает отчет.
+
+    Args:
+        db: Объект PasswordDB
+        thresholds: Словарь порогов (недостающие берутся из DEFAULT_THRESHOLDS)
+
+    Returns:
+        dict: {"ok": bool, "checks": [{"name", "ok", "value", "unit", "threshold", ...}]}
+    """
+    limits = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    checks = [_result("init_database", db.init_error is None, error=db.init_error)]
+
+    conn = None
+    try:
+        started = time.perf_counter()
+        conn = db.get_connection()
+        connect_ms = (time.perf_counter() - started) * 1000
+        checks.append(_measured("connect_latency", connect_ms, "ms", max_value=limits["max_connect_ms"]))
+        checks.extend(_database_checks(conn, limits))
+    except Exception as e:
+        error = str(e).strip()
+        if conn is None:
+            checks.append(_result("connect_latency", False, unit="ms",
+                                  threshold={"max": limits["max_connect_ms"]}, error=error))
+        else:
+            checks.append(_result("database", False, error=error))
+    finally:
+        if conn is not None:
+            conn.close()
+
+    checks.append(_measured(
+        "generate_throughput", _throughput(generate_password), "per_sec",
+        min_value=limits["min_generate_per_sec"]
+    ))
+    checks.append(_measured(
+        "hash_throughput", _throughput(lambda: password_digest("doctor-check-password")), "per_sec",
+        min_value=limits["min_hash_per_sec"]
+    ))
+    return {"ok": all(check["ok"] for check in checks), "checks": checks}
+
+
+def _database_checks(conn, limits):
+    """Проверки, которым нужно открытое соединение с базой."""
+    cursor = conn.cursor()
+
+    samples = []
+    for _ in range(QUERY_SAMPLES):
+        started = time.perf_counter()
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+        samples.append((time.perf_counter() - started) * 1000)
+    checks = [_measured("query_roundtrip", statistics.median(samples), "ms", max_value=limits["max_query_ms"])]
+
+    # B-tree индекс, начинающийся с service, нужен для поиска по точному имени
+    cursor.execute('''
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = 'passwords'
+          AND indexdef ~* 'USING btree \\(service[ ,)]'
+    ''')
+    indexes = [row[0] for row in cursor.fetchall()]
+    checks.append(_result("service_index", bool(indexes), value=indexes))
+
+    # Размер и оценка числа строк из статистики (без полного сканирования COUNT(*))
+    cursor.execute('''
+        SELECT pg_total_relation_size(c.oid), c.reltuples::BIGINT
+        FROM pg_class c
+        WHERE c.oid = to_regclass('passwords')
+    ''')
+    row = cursor.fetchone()
+    if row is None:
+        checks.append(_result("table_size", False, unit="bytes", error="Таблица passwords не найдена"))
+    else:
+        table_size, row_estimate = row
+        checks.append(_result("table_size", True, value=table_size, unit="bytes"))
+        # reltuples = -1, если таблицу еще ни разу не анализировали
+        checks.append(_result("row_estimate", True, value=max(row_estimate, 0), unit="rows"))
+    conn.rollback()
+    return checks
+
+
+def _throughput(func):
+    """Сколько раз в секунду выполняется func (замер длится THROUGHPUT_SECONDS)."""
+    calls = 0
+    started = time.perf_counter()
+    deadline = started + THROUGHPUT_SECONDS
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            func()
+        calls += 100
+    return calls / (time.perf_counter() - started)
+
+
+def _measured(name, value, unit, max_value=None, min_value=None):
+    """Проверка с числовым значением и порогом."""
+    if max_value is not None:
+        return _result(name, value <= max_value, value=round(value, 3), unit=unit, threshold={"max": max_value})
+    return _result(name, value >= min_value, value=round(value, 3), unit=unit, threshold={"min": min_value})
+
+
+def _result(name, ok, value=None, unit=None, threshold=None, error=None):
+    """Собирает запись о проверке."""
+    result = {"name": name, "ok": ok, "value": value, "unit": unit, "threshold": threshold}
+    if error:
+        result["error"] = error
+    return result
@@ -3,6 +3,12 @@
 import random
 import string
 
+from .bloom import ScalableBloomFilter
+from .utils import password_digest
+
+# Сколько отклоненных подряд паролей считать признаком того, что уникальные пароли закончились
+MAX_UNIQUE_ATTEMPTS = 1000
+
 
 def generate_password(length=12, use_digits=True, use_special_chars=True, use_uppercase=True):
     """Генерирует случайный пароль заданной длины и сложности.
@@ -37,3 +43,58 @@ def generate_password(length=12, use_digits=True, use_special_chars=True, use_up
     # Генерируем пароль
     password = ''.join(random.choice(characters) for _ in range(length))  # выбор случ. символа/объеденение
     return password
+
+
+def generate_passwords(count, length=12, use_digits=True, use_special_chars=True, use_uppercase=True,
+                       unique=False, seen=None):
+    """Генерирует сразу несколько паролей с одинаковыми параметрами.
+
+    С unique=True хэш каждого пароля проверяется по фильтру Блума seen:
+    пароль, который (вероятно) уже встречался, отбрасывается и генерируется
+    заново. Фильтр не дает ложных "нет", поэтому повторов в результате
+    гарантированно нет, а память не зависит от длины паролей (2-4 байта на пароль).
+
+    Args:
+        count: Количество паролей
+        length: Длина каждого пароля (по умолчанию 12)
+        use_digits: Включать цифры (по умолчанию True)
+        use_special_chars: Включать спецсимволы (по умолчанию True)
+        use_uppercase: Включать заглавные буквы (по умолчанию True)
+        unique: Гарантировать отсутствие повторов
+        seen: Фильтр ScalableBloomFilter с хэшами, которые нельзя повторять
+              (например, заполненный storage.load_password_hashes); в него
+              добавляются хэши новых паролей. По умолчанию создается новый.
+
+    Returns:
+        list: Список сгенерированных паролей
+
+    Raises:
+        ValueError: Если количество паролей отрицательное или уникальные
+            пароли с такими параметрами закончились
+    """
+    if count < 0:
+        raise ValueError("Количество паролей не может быть отрицательным")
+
+    if not unique:
+        return [
+            generate_password(length, use_digits, use_special_chars, use_uppercase)
+            for _ in range(count)
+        ]
+
+    if seen is None:
+        seen = ScalableBloomFilter(initial_capacity=max(count, 1000))
+    passwords = []
+    rejected_in_row = 0
+    while len(passwords) < count:
+        password = generate_password(length, use_digits, use_special_chars, use_uppercase)
+        if seen.add(password_digest(password)):
+            passwords.append(password)
+            rejected_in_row = 0
+        else:
+            rejected_in_row += 1
+            if rejected_in_row >= MAX_UNIQUE_ATTEMPTS:
+                raise ValueError(
+                    f"Не удалось сгенерировать {count} уникальных паролей: "
+                    "увеличьте длину или набор символов"
+                )
+    return passwords
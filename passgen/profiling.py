@@ -0,0 +1,342 @@
+"""Модуль профилирования запуска программы (опция --profile).
+
+Режимы:
+- cprofile: cProfile в основном потоке (файл .pstats) и выборка стеков всех
+  потоков каждые SAMPLE_INTERVAL секунд (файл .collapsed, значение - число выборок)
+- trace: cProfile в основном потоке и точная трассировка вызовов Python-функций
+  во всех потоках через sys.settrace (файл .collapsed, значение - микросекунды).
+  Точнее для коротких функций, но заметно замедляет программу.
+
+Файл .collapsed - по одной строке "кадр;кадр;...;кадр значение", его принимают
+flamegraph.pl и speedscope. Ожидание ввода пользователя (input, getpass)
+выделяется в отдельный кадр и не смешивается со временем работы программы.
+Ожидание в простаивающих потоках (см. IDLE_FILE_MARKERS) остается в стеках,
+но не входит во время потоков, с которым в отчете сравнивается время базы.
+"""
+
+import builtins
+import cProfile
+import getpass
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+MODES = ("cprofile", "trace")
+DEFAULT_MODE = "cprofile"
+DEFAULT_OUTPUT = "passgen-profile"
+DEFAULT_TOP = 20
+
+# Период выборки стеков в режиме cprofile, с
+SAMPLE_INTERVAL = 0.005
+
+# Кадры из этих файлов считаются работой с базой данных (сам запрос выполняется в C-коде psycopg2)
+DB_FILE_MARKERS = (f"{os.sep}psycopg2{os.sep}", f"passgen{os.sep}database_postgres.py",
+                   f"passgen{os.sep}replicas.py")
+
+# Кадры из этих файлов - ожидание (Event/Condition.wait, select, чтение сокета, очереди) простаивающих
+# потоков: сервер держит поток на каждое keep-alive соединение, фоновые потоки спят между задачами.
+# Такое время не входит во время потоков, с которым сравнивается время работы с базой
+IDLE_FILE_MARKERS = (f"{os.sep}threading.py", f"{os.sep}selectors.py", f"{os.sep}socket.py",
+                     f"{os.sep}queue.py", f"{os.sep}ssl.py", f"passgen{os.sep}changefeed.py")
+
+# Кадр, которым в стеках помечается ожидание ввода пользователя
+INPUT_FRAME = "[ожидание ввода]"
+
+# Профилировщик, запущенный до импорта модулей программы (см. start_from_args)
+active = None
+
+
+# Глобальные опции main.py, за которыми следует значение (их значение - не имя команды)
+_OPTIONS_WITH_VALUE = ("--profile-output", "--profile-top")
+
+
+def _command_position(args):
+    """Индекс имени команды (первого позиционного аргумента) или len(args)."""
+    position = 0
+    while position < len(args):
+        arg = args[position]
+        if arg == "--" or not arg.startswith("-"):
+            return position
+        if arg in _OPTIONS_WITH_VALUE or (arg == "--profile" and position + 1 < len(args)
+                                          and args[position + 1] in MODES):
+            position += 1
+        position += 1
+    return position
+
+
+def normalize_profile_args(args):
+    """Приводит --profile к виду --profile=РЕЖИМ.
+
+    "--profile generate" argparse понял бы как режим "generate", поэтому
+    одиночный --profile заменяется на --profile=cprofile, а "--profile trace" -
+    на --profile=trace. --profile - глобальная опция, поэтому меняются только
+    аргументы до имени команды: аргументы команды (например, поисковый запрос
+    "--profile" после "--") остаются как есть.
+
+    Args:
+        args: Аргументы командной строки (без имени программы)
+
+    Returns:
+        list: Новый список аргументов
+    """
+    end = _command_position(args)
+    result = []
+    position = 0
+    while position < end:
+        arg = args[position]
+        if arg == "--profile":
+            if position + 1 < end and args[position + 1] in MODES:
+                arg = f"--profile={args[position + 1]}"
+                position += 1
+            else:
+                arg = f"--profile={DEFAULT_MODE}"
+        result.append(arg)
+        position += 1
+    return result + list(args[end:])
+
+
+def start_from_args(args):
+    """Запускает профилировщик, если до имени команды есть --profile=РЕЖИМ.
+
+    Вызывается до импорта остальных модулей программы, чтобы в профиль
+    попали импорт и подключение к базе данных.
+
+    Returns:
+        Profiler or None: Запущенный профилировщик
+    """
+    global active
+
+    for arg in args[:_command_position(args)]:
+        mode = arg.partition("=")[2] if arg.startswith("--profile=") else None
+        if mode in MODES:
+            active = Profiler(mode)
+            active.start()
+            return active
+    return None
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_db_file(filename):
+    return any(marker in filename for marker in DB_FILE_MARKERS)
+
+
+def _is_idle_file(filename):
+    return filename.endswith(IDLE_FILE_MARKERS)
+
+
+class Profiler:
+    """Профилировщик одного запуска программы."""
+
+    def __init__(self, mode=DEFAULT_MODE):
+        """Создает профилировщик.
+
+        Args:
+            mode: Режим из MODES
+        """
+        if mode not in MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        self.mode = mode
+        self.stacks = Counter()  # стек (кортеж кадров) -> выборки или секунды
+        self.thread_time = 0.0  # суммарное время потоков без ожидания (см. IDLE_FILE_MARKERS), с
+        self.db_time = 0.0  # время в коде работы с базой во всех потоках, с
+        self.input_wait = 0.0  # время ожидания ввода пользователя, с
+        self.marks = []  # (название этапа, момент начала)
+
+        self._profile = cProfile.Profile()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler = None
+        self._trace_stacks = {}  # идентификатор потока -> [(стек, начало, время вложенных вызовов)]
+        self._waiting = set()  # потоки, ждущие ввода пользователя
+        self._original_input = None
+        self._original_getpass = None
+        self._started_at = self._finished_at = None
+        self._cpu_started_at = self._cpu_finished_at = None
+
+    def start(self):
+        """Начинает профилирование текущего потока и (для выборки стеков) всех остальных."""
+        self._started_at = time.perf_counter()
+        self._cpu_started_at = time.process_time()
+        self._wrap_input()
+        if self.mode == "trace":
+            threading.settrace(self._trace_call)
+            sys.settrace(self._trace_call)
+        else:
+            self._sampler = threading.Thread(target=self._sample_loop, name="passgen-profiler", daemon=True)
+            self._sampler.start()
+        self._profile.enable()
+
+    def mark(self, name):
+        """Отмечает начало этапа (например, "команда"); время этапов выводится в отчете."""
+        self.marks.append((name, time.perf_counter()))
+
+    def stop(self):
+        """Останавливает профилирование."""
+        self._profile.disable()
+        self._finished_at = time.perf_counter()
+        self._cpu_finished_at = time.process_time()
+        self._stopped.set()
+        if self.mode == "trace":
+            sys.settrace(None)
+            threading.settrace(None)
+            self._flush_trace_stacks()
+        elif self._sampler is not None:
+            self._sampler.join()
+        self._restore_input()
+
+    def write(self, output=DEFAULT_OUTPUT):
+        """Сохраняет output.pstats и output.collapsed.
+
+        Returns:
+            tuple: Пути к файлам (pstats, collapsed)
+        """
+        pstats_path = f"{output}.pstats"
+        collapsed_path = f"{output}.collapsed"
+        self._profile.dump_stats(pstats_path)
+        with open(collapsed_path, "w", encoding="utf-8") as f:
+            for stack, value in sorted(self.stacks.items()):
+                if self.mode == "trace":
+                    value = round(value * 1_000_000)  # микросекунды
+                if value > 0:
+                    f.write(f"{';'.join(stack)} {value}\n")
+        return pstats_path, collapsed_path
+
+    def report(self, stream=None, top=DEFAULT_TOP):
+        """Печатает время этапов, разделение на CPU/базу/ожидание и top-N функций."""
+        stream = stream or sys.stderr
+        wall = self._finished_at - self._started_at
+        cpu = self._cpu_finished_at - self._cpu_started_at
+
+        print(f"\n⏱  Профиль ({self.mode}): {wall:.3f} с", file=stream)
+        boundaries = [("импорт и подключение к базе", self._started_at), *self.marks,
+                      (None, self._finished_at)]
+        for (name, started), (_, finished) in zip(boundaries, boundaries[1:]):
+            print(f"   {name}: {finished - started:.3f} с", file=stream)
+
+        print(f"   процессор (процесс): {cpu:.3f} с", file=stream)
+        # Время базы складывается по всем потокам, поэтому сравнивается не со временем
+        # выполнения, а с суммарным временем работающих (не простаивающих) потоков
+        thread_time = max(self.thread_time, self.db_time)
+        share = self.db_time / thread_time if thread_time else 0.0
+        print(f"   время потоков без ожидания (сумма по всем потокам): {thread_time:.3f} с", file=stream)
+        print(f"     база данных: {self.db_time:.3f} с ({share:.0%} времени потоков)", file=stream)
+        print(f"   ожидание ввода: {self.input_wait:.3f} с", file=stream)
+
+        print(f"\n   Top-{top} функций основного потока по собственному времени:", file=stream)
+        print(f"   {'собств., с':>10} {'всего, с':>10} {'вызовов':>9}  функция", file=stream)
+        for function, (_, calls, own, total, _) in self.top_functions(top):
+            print(f"   {own:10.3f} {total:10.3f} {calls:9d}  {pstats.func_std_string(function)}", file=stream)
+
+    def top_functions(self, top=DEFAULT_TOP):
+        """Функции с наибольшим собственным временем: список (функция, статистика pstats)."""
+        stats = pstats.Stats(self._profile).stats
+        return sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+
+    # Ожидание ввода
+
+    def _wrap_input(self):
+        self._original_input = builtins.input
+        self._original_getpass = getpass.getpass
+        builtins.input = self._waiting_for_user(self._original_input)
+        getpass.getpass = self._waiting_for_user(self._original_getpass)
+
+    def _restore_input(self):
+        builtins.input = self._original_input
+        getpass.getpass = self._original_getpass
+
+    def _waiting_for_user(self, read):
+        def user_input(*args, **kwargs):
+            thread_id = threading.get_ident()
+            self._waiting.add(thread_id)
+            started = time.perf_counter()
+            try:
+                return read(*args, **kwargs)
+            finally:
+                self.input_wait += time.perf_counter() - started
+                self._waiting.discard(thread_id)
+        return user_input
+
+    # Режим cprofile: выборка стеков
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stopped.wait(SAMPLE_INTERVAL):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._record_sample(names.get(thread_id, str(thread_id)), thread_id, frame, elapsed)
+
+    def _record_sample(self, thread_name, thread_id, frame, elapsed):
+        leaf_file = frame.f_code.co_filename
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        stack.append(thread_name)
+        stack.reverse()
+        if thread_id in self._waiting:
+            stack.append(INPUT_FRAME)
+        elif not _is_idle_file(leaf_file):
+            self.thread_time += elapsed
+            if _is_db_file(leaf_file):
+                self.db_time += elapsed
+        self.stacks[tuple(stack)] += 1
+
+    # Режим trace: трассировка вызовов
+
+    def _trace_call(self, frame, event, arg):
+        thread_id = threading.get_ident()
+        if event != "call" or self._stopped.is_set() or thread_id in self._waiting:
+            return None  # во время ожидания ввода вложенные вызовы не трассируем
+        with self._lock:
+            calls = self._trace_stacks.get(thread_id)
+            if calls is None:
+                calls = self._trace_stacks[thread_id] = []
+        parent = calls[-1][0] if calls else (threading.current_thread().name,)
+        calls.append([parent + (_frame_label(frame.f_code),), time.perf_counter(), 0.0,
+                      frame.f_code.co_filename])
+        frame.f_trace_lines = False  # нужны только события return
+        return self._trace_return
+
+    def _trace_return(self, frame, event, arg):
+        if self._stopped.is_set():
+            return None
+        if event == "return":
+            calls = self._trace_stacks.get(threading.get_ident())
+            if calls:
+                self._finish_call(calls, time.perf_counter())
+        return self._trace_return
+
+    def _finish_call(self, calls, now):
+        stack, started, children, filename = calls.pop()
+        elapsed = now - started
+        own = elapsed - children
+        waiting = filename == __file__ and stack[-1].startswith("user_input ")
+        if waiting:
+            stack = stack + (INPUT_FRAME,)
+        with self._lock:
+            self.stacks[stack] += own
+            if not waiting and not _is_idle_file(filename):
+                self.thread_time += own
+                if _is_db_file(filename):
+                    self.db_time += own
+        if calls:
+            calls[-1][2] += elapsed
+
+    def _flush_trace_stacks(self):
+        """Учитывает вызовы, которые еще не завершились к моменту остановки."""
+        with self._lock:
+            stacks = list(self._trace_stacks.values())
+            self._trace_stacks.clear()
+        for calls in stacks:
+            while calls:
+                self._finish_call(calls, self._finished_at)
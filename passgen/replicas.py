@@ -0,0 +1,271 @@
+"""Модуль узлов базы данных: основной сервер и реплики только для чтения.
+
+Настройка через переменные окружения:
+- PASSGEN_PRIMARY_DSN - строка подключения к основному серверу (по умолчанию DB_CONFIG)
+- PASSGEN_REPLICA_DSNS - строки подключения к репликам через запятую
+- PASSGEN_MAX_REPLICA_LAG - максимальное отставание реплики в секундах
+  (реплика с большим отставанием не используется для чтения)
+
+Строки подключения - в формате libpq: "host=db2 dbname=passwords_db user=anna"
+или "postgresql://anna@db2/passwords_db".
+
+Для замера отставания роль подключения к репликам должна видеть
+pg_stat_wal_receiver (pg_read_all_stats, например через pg_monitor), иначе
+реплика считается отставшей при заданном PASSGEN_MAX_REPLICA_LAG.
+
+Каждый узел защищен автоматом отключения (circuit breaker): после нескольких
+ошибок подряд узел не используется reset_timeout секунд, затем пропускается
+один пробный запрос.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.pool
+
+# Ошибки соединения: после них запрос можно повторить на другом узле
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+# Сколько секунд результат замера отставания реплики считается актуальным
+LAG_CHECK_INTERVAL = 1.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def parse_lsn(lsn):
+    """Переводит позицию WAL из текстового вида PostgreSQL ("16/B374D848") в число для сравнения."""
+    high, _, low = str(lsn).partition("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+class CircuitBreaker:
+    """Автомат отключения узла после серии ошибок."""
+
+    def __init__(self, failure_threshold=3, reset_timeout=10.0, clock=time.monotonic):
+        """Создает автомат в замкнутом состоянии (узел доступен).
+
+        Args:
+            failure_threshold: Сколько ошибок подряд отключают узел
+            reset_timeout: Через сколько секунд разрешить пробный запрос к отключенному узлу
+            clock: Источник времени (для тестов)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def available(self):
+        """Примет ли узел запрос (без изменения состояния автомата)."""
+        with self._lock:
+            return self.state == CLOSED or self._clock() - self._opened_at >= self.reset_timeout
+
+    def allow(self):
+        """Разрешает запрос на узел.
+
+        Через reset_timeout после отключения пропускается один пробный запрос
+        (состояние half_open); его результат (record_success/record_failure)
+        решает, включать ли узел. Если результат пробного запроса так и не
+        пришел, следующий пробный запрос разрешается еще через reset_timeout.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = self._clock()
+            if now - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._opened_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened_at = self._clock()
+
+
+class DatabaseNode:
+    """Сервер PostgreSQL со своим пулом соединений и автоматом отключения."""
+
+    def __init__(self, name, dsn=None, params=None, min_size=1, max_size=10,
+                 breaker=None, pool_factory=psycopg2.pool.ThreadedConnectionPool):
+        """Создает узел; пул соединений открывается при первом запросе.
+
+        Args:
+            name: Имя узла для сообщений ("primary", "replica1", ...)
+            dsn: Строка подключения libpq
+            params: Параметры подключения словарем (если dsn не указан)
+            min_size: Минимальный размер пула
+            max_size: Максимальный размер пула
+            breaker: Автомат отключения (по умолчанию CircuitBreaker())
+            pool_factory: Класс пула (заменяется в тестах)
+        """
+        self.name = name
+        self.dsn = dsn
+        self.params = params or {}
+        self.min_size = min_size
+        self.max_size = max_size
+        self.breaker = breaker or CircuitBreaker()
+        self._pool_factory = pool_factory
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._lag = None  # последнее измеренное отставание, с
+        self._lag_checked_at = None
+        self.replayed_lsn = 0  # позиция WAL, до которой узел точно применил изменения
+
+    def connect(self, **overrides):
+        """Открывает отдельное соединение (вне пула), например к другой базе сервера."""
+        if self.dsn is not None:
+            return psycopg2.connect(self.dsn, **overrides)
+        return psycopg2.connect(**{**self.params, **overrides})
+
+    @contextmanager
+    def connection(self, retries=0, backoff=0.05):
+        """Выдает соединение из пула узла и возвращает его обратно после работы.
+
+        При выходе из блока без ошибок транзакция подтверждается, при исключении - откатывается.
+        Ошибка соединения учитывается автоматом отключения.
+
+        Args:
+            retries: Сколько раз повторить попытку получить соединение
+            backoff: Пауза перед первым повтором, с (удваивается с каждым повтором)
+
+        Raises:
+            psycopg2.OperationalError: Если узел отключен автоматом или соединение не получено
+        """
+        for attempt in range(retries + 1):
+            if not self.breaker.allow():
+                raise psycopg2.OperationalError(f"Сервер {self.name} временно отключен после ошибок соединения")
+            try:
+                pool = self._get_pool()
+                conn = pool.getconn()
+                break
+            except CONNECTION_ERRORS:
+                self.breaker.record_failure()
+                if attempt == retries:
+                    raise
+                time.sleep(backoff * 2 ** attempt)
+        failed = False
+        try:
+            with conn:
+                yield conn
+        except CONNECTION_ERRORS:
+            failed = True
+            raise
+        finally:
+            # Разорванное соединение не возвращаем в пул повторно
+            pool.putconn(conn, close=bool(conn.closed))
+            # Любой ответ сервера (в том числе ошибка в запросе) означает, что узел жив
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+    def replication_lag(self, max_age=LAG_CHECK_INTERVAL):
+        """Отставание реплики в секундах (результат кэшируется на max_age секунд).
+
+        Если реплика получает WAL потоком и применила все полученные изменения,
+        отставание равно 0, даже если на основном сервере давно не было записей.
+        Реплика без потоковой репликации (приемник WAL отключен) могла не
+        получить сколько угодно изменений - ее отставание бесконечно.
+        """
+        now = time.monotonic()
+        if self._lag_checked_at is None or now - self._lag_checked_at >= max_age:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT CASE
+                        WHEN NOT pg_is_in_recovery() THEN 0
+                        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+                        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                    END
+                ''')
+                lag = cursor.fetchone()[0]
+                self._lag = float(lag) if lag is not None else float("inf")
+            self._lag_checked_at = now
+        return self._lag
+
+    def has_replayed(self, lsn):
+        """Применил ли узел изменения до позиции WAL lsn.
+
+        Сервер опрашивается, только если известная позиция узла меньше lsn.
+        """
+        if self.replayed_lsn >= lsn:
+            return True
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT pg_last_wal_replay_lsn()')
+            replayed = cursor.fetchone()[0]
+        if replayed is not None:
+            self.replayed_lsn = max(self.replayed_lsn, parse_lsn(replayed))
+        return self.replayed_lsn >= lsn
+
+    def close(self):
+        """Закрывает все соединения пула."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    if self.dsn is not None:
+                        self._pool = self._pool_factory(self.min_size, self.max_size, self.dsn)
+                    else:
+                        self._pool = self._pool_factory(self.min_size, self.max_size, **self.params)
+        return self._pool
+
+
+def load_cluster_config(default_params, environ=None, min_size=1, max_size=10):
+    """Читает адреса основного сервера и реплик из переменных окружения.
+
+    Args:
+        default_params: Параметры основного сервера, если PASSGEN_PRIMARY_DSN не задана
+        environ: Словарь переменных окружения (по умолчанию os.environ)
+        min_size: Минимальный размер пула каждого узла
+        max_size: Максимальный размер пула каждого узла
+
+    Returns:
+        tuple: (основной узел, список реплик, максимальное отставание в секундах или None)
+
+    Raises:
+        ValueError: Если PASSGEN_MAX_REPLICA_LAG не число
+    """
+    environ = os.environ if environ is None else environ
+
+    primary_dsn = environ.get("PASSGEN_PRIMARY_DSN", "").strip()
+    if primary_dsn:
+        primary = DatabaseNode("primary", dsn=primary_dsn, min_size=min_size, max_size=max_size)
+    else:
+        primary = DatabaseNode("primary", params=default_params, min_size=min_size, max_size=max_size)
+
+    replica_dsns = [dsn.strip() for dsn in environ.get("PASSGEN_REPLICA_DSNS", "").split(",") if dsn.strip()]
+    replicas = [
+        DatabaseNode(f"replica{number}", dsn=dsn, min_size=0, max_size=max_size)
+        for number, dsn in enumerate(replica_dsns, start=1)
+    ]
+
+    max_lag = environ.get("PASSGEN_MAX_REPLICA_LAG", "").strip()
+    try:
+        max_lag = float(max_lag) if max_lag else None
+    except ValueError:
+        raise ValueError("PASSGEN_MAX_REPLICA_LAG должна быть числом секунд")
+    return primary, replicas, max_lag
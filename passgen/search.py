@@ -0,0 +1,139 @@
+"""Модуль нечеткого поиска сервисов в памяти.
+
+Используется, когда в PostgreSQL нет расширения pg_trgm. Поддерживает те же
+виды совпадений и ту же шкалу ранжирования, что и PasswordDB.search_services:
+- точное совпадение (score 3)
+- префикс (score 2 + сходство)
+- подстрока (score 1 + сходство)
+- опечатки: сходство по триграммам не ниже SIMILARITY_THRESHOLD (score = сходство)
+
+Запросы короче трех символов ищутся только по префиксу.
+"""
+
+import bisect
+import math
+import re
+import threading
+from collections import Counter
+
+# Порог сходства для опечаток (как pg_trgm.similarity_threshold по умолчанию)
+SIMILARITY_THRESHOLD = 0.3
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def trigrams(text):
+    """Возвращает множество триграмм строки по правилам pg_trgm.
+
+    Строка приводится к нижнему регистру и делится на слова; каждое слово
+    дополняется двумя пробелами в начале и одним в конце.
+    """
+    result = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(left, right):
+    """Сходство двух множеств триграмм (как similarity() в pg_trgm)."""
+    if not left or not right:
+        return 0.0
+    common = len(left & right)
+    return common / (len(left) + len(right) - common)
+
+
+class ServiceIndex:
+    """Индекс названий сервисов: отсортированный список для префиксов и триграммы для остального."""
+
+    def __init__(self, services=()):
+        """Строит индекс по списку названий сервисов."""
+        self._lock = threading.Lock()
+        self._by_trigram = {}  # триграмма -> множество имен
+        self._sizes = {}  # имя -> количество его триграмм (для расчета сходства)
+        unique = set(services)
+        self._names = sorted((service.lower(), service) for service in unique)  # для поиска префикса
+        for service in unique:
+            self._index_trigrams(service)
+
+    def add(self, service):
+        """Добавляет сервис в индекс (повторное добавление ничего не меняет)."""
+        with self._lock:
+            if service in self._sizes:
+                return
+            bisect.insort(self._names, (service.lower(), service))
+            self._index_trigrams(service)
+
+    def remove(self, service):
+        """Удаляет сервис из индекса."""
+        with self._lock:
+            if self._sizes.pop(service, None) is None:
+                return
+            del self._names[bisect.bisect_left(self._names, (service.lower(), service))]
+            for trigram in trigrams(service):
+                names = self._by_trigram.get(trigram)
+                if names is not None:
+                    names.discard(service)
+                    if not names:
+                        del self._by_trigram[trigram]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sizes)
+
+    def search(self, term, limit=20, offset=0):
+        """Ищет сервисы по префиксу, подстроке и с учетом опечаток.
+
+        Args:
+            term: Поисковый запрос
+            limit: Сколько результатов вернуть
+            offset: Сколько лучших результатов пропустить (постраничный вывод)
+
+        Returns:
+            list: Пары (сервис, оценка), от лучших к худшим
+        """
+        query = term.lower()
+        term_trigrams = trigrams(term)
+        with self._lock:
+            # Сколько триграмм запроса есть у каждого имени
+            common = Counter()
+            for trigram in term_trigrams:
+                common.update(self._by_trigram.get(trigram, ()))
+
+            # Сходство c / (a + b - c) не больше c / a, поэтому для опечатки нужно c >= порог * a;
+            # подстрока содержит все внутренние триграммы запроса (без пробелов)
+            interior = sum(1 for trigram in term_trigrams if " " not in trigram)
+            min_common = min(math.ceil(SIMILARITY_THRESHOLD * len(term_trigrams)), max(interior, 1))
+            candidates = set()
+            if len(query) >= 3:
+                candidates = {service for service, count in common.items() if count >= min_common}
+
+            # Префикс: непрерывный диапазон отсортированного списка
+            position = bisect.bisect_left(self._names, (query,))
+            while position < len(self._names) and self._names[position][0].startswith(query):
+                candidates.add(self._names[position][1])
+                position += 1
+
+            scored = []
+            for service in candidates:
+                count = common.get(service, 0)
+                score = count / (len(term_trigrams) + self._sizes[service] - count) if count else 0.0
+                name = service.lower()
+                if service == term:
+                    score = 3.0
+                elif name.startswith(query):
+                    score += 2.0
+                elif query in name:
+                    score += 1.0
+                elif score < SIMILARITY_THRESHOLD:
+                    continue
+                scored.append((service, score))
+
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[offset:offset + limit]
+
+    def _index_trigrams(self, service):
+        service_trigrams = trigrams(service)
+        self._sizes[service] = len(service_trigrams)
+        for trigram in service_trigrams:
+            self._by_trigram.setdefault(trigram, set()).add(service)
@@ -0,0 +1,315 @@
+"""Модуль HTTP/JSON сервера генератора паролей.
+
+Сервер работает в одном процессе, поэтому запуск интерпретатора, импорт модулей
+и инициализация PasswordDB происходят один раз, а все запросы используют общий
+пул соединений с базой и общий кэш поиска.
+
+Эндпоинты (тело запросов и ответов - JSON):
+- POST /generate        {"length", "digits", "special", "uppercase", "service"}
+- POST /generate/batch  {"count", "length", "digits", "special", "uppercase", "unique", "preload"}
+- GET  /find?service=NAME
+- POST /find            {"services": [...]}
+- POST /save            {"service", "password"}
+- POST /delete          {"service"}
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs
+
+from . import storage
+from .bloom import ScalableBloomFilter
+from .cache import LookupCache, MISSING
+from .database_postgres import SchemaOutdatedError
+from .generator import generate_password, generate_passwords
+from .utils import format_hash, validate_password_length
+
+# Максимальное количество паролей в одном запросе /generate/batch
+MAX_BATCH_SIZE = 10000
+
+# Максимальный размер тела запроса в байтах
+MAX_BODY_SIZE = 10 * 1024 * 1024
+
+
+class RequestError(Exception):
+    """Ошибка в запросе клиента, возвращается с указанным HTTP-статусом."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class PassgenService:
+    """Обработчики эндпоинтов сервера поверх модуля storage и общего кэша."""
+
+    def __init__(self, cache=None):
+        """Создает сервис.
+
+        Args:
+            cache: Кэш поиска (по умолчанию создается новый LookupCache)
+        """
+        self.cache = cache if cache is not None else LookupCache()
+
+    def generate(self, payload):
+        """Генерирует пароль и при необходимости сохраняет его для сервиса."""
+        options = _generation_options(payload)
+        password = generate_password(**options)
+        service = payload.get("service")
+        if service is not None and not isinstance(service, str):
+            raise RequestError(400, "service должен быть строкой")
+        result = {"password": password, "saved": False, "queued": False}
+        if service:
+            saved = self.save({"service": service, "password": password})
+            result.update(saved=saved["saved"], queued=saved["queued"])
+        return result
+
+    def generate_batch(self, payload):
+        """Генерирует несколько паролей с одинаковыми параметрами.
+
+        С "unique": true пароли не повторяются, а в ответе есть сводка фильтра
+        уникальности ("stats"). С "preload": true пароли не повторяют и уже
+        сохраненные: перед генерацией в фильтр читаются хэши всех паролей
+        базы (полный проход по таблице на каждый запрос).
+        """
+        count = _get_int(payload, "count", 1)
+        if not 0 < count <= MAX_BATCH_SIZE:
+            raise RequestError(400, f"count должен быть от 1 до {MAX_BATCH_SIZE}")
+        unique = bool(payload.get("unique", False))
+        preload = bool(payload.get("preload", False))
+        if preload and not unique:
+            raise RequestError(400, "preload используется только вместе с unique")
+        options = _generation_options(payload)
+
+        seen = None
+        if unique:
+            seen = ScalableBloomFilter(initial_capacity=max(count, 1000))
+            if preload:
+                storage.load_password_hashes(seen)
+        try:
+            passwords = generate_passwords(count, unique=unique, seen=seen, **options)
+        except ValueError as e:
+            raise RequestError(400, str(e))
+        if seen is None:
+            return {"passwords": passwords}
+        return {"passwords": passwords, "stats": seen.stats()}
+
+    def find(self, service):
+        """Ищет хэш пароля для одного сервиса (с учетом кэша)."""
+        if not service:
+            raise RequestError(400, "Не указан сервис")
+        password_hash = self.cache.get(service)
+        if password_hash is MISSING:
+            generation = self.cache.generation()  # до чтения: сброс во время чтения отменит put
+            password_hash = storage.find_password(service)
+            self.cache.put(service, password_hash, generation)
+        if password_hash is None:
+            raise RequestError(404, f"Пароль для сервиса '{service}' не найден")
+        return {"service": service, "password_hash": format_hash(password_hash)}
+
+    def find_many(self, payload):
+        """Ищет хэши паролей для нескольких сервисов одним запросом к базе."""
+        services = payload.get("services")
+        if not isinstance(services, list) or not all(isinstance(s, str) for s in services):
+            raise RequestError(400, "services должен быть списком строк")
+
+        results = {}
+        missing = []
+        for service in services:
+            password_hash = self.cache.get(service)
+            if password_hash is MISSING:
+                missing.append(service)
+            else:
+                results[service] = password_hash
+
+        if missing:
+            generation = self.cache.generation()
+            for service, password_hash in storage.find_passwords(missing).items():
+                self.cache.put(service, password_hash, generation)
+                results[service] = password_hash
+        return {"results": {service: format_hash(password_hash) for service, password_hash in results.items()}}
+
+    def save(self, payload):
+        """Сохраняет хэш пароля для сервиса.
+
+        В режиме отложенной записи пароль только ставится в очередь
+        ("queued": true) - проверка повтора недавнего пароля выполняется позже.
+        """
+        service = payload.get("service")
+        password = payload.get("password")
+        if not isinstance(service, str) or not isinstance(password, str) or not service or not password:
+            raise RequestError(400, "Нужно указать service и password строками")
+        try:
+            storage.save_password(service, password)
+        except ValueError as e:
+            raise RequestError(409, str(e))
+        finally:
+            self.cache.invalidate(service)
+        queued = storage.write_queue is not None
+        return {"service": service, "saved": not queued, "queued": queued}
+
+    def delete(self, payload):
+        """Удаляет пароль для сервиса."""
+        service = payload.get("service")
+        if not isinstance(service, str) or not service:
+            raise RequestError(400, "Не указан сервис")
+        deleted = storage.delete_password(service)
+        self.cache.invalidate(service)
+        return {"service": service, "deleted": deleted}
+
+
+def _get_int(payload, key, default):
+    """Достает целое число из тела запроса."""
+    value = payload.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise RequestError(400, f"{key} должен быть целым числом")
+    return value
+
+
+def _generation_options(payload):
+    """Преобразует тело запроса в аргументы generate_password."""
+    length = _get_int(payload, "length", 12)
+    try:
+        validate_password_length(length)
+    except ValueError as e:
+        raise RequestError(400, str(e))
+    return {
+        "length": length,
+        "use_digits": bool(payload.get("digits", True)),
+        "use_special_chars": bool(payload.get("special", True)),
+        "use_uppercase": bool(payload.get("uppercase", True)),
+    }
+
+
+class PassgenRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик HTTP-запросов; поддерживает keep-alive (HTTP/1.1)."""
+
+    protocol_version = "HTTP/1.1"
+    timeout = 30  # закрываем простаивающие keep-alive соединения (и их потоки)
+    disable_nagle_algorithm = True  # заголовки и тело уходят отдельно - без TCP_NODELAY ответ ждет delayed ACK
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/find":
+            service = parse_qs(url.query).get("service", [""])[0]
+            self._dispatch(lambda: self.server.service.find(service))
+        else:
+            self._send_json(404, {"error": "Неизвестный адрес"})
+
+    def do_POST(self):
+        routes = {
+            "/generate": self.server.service.generate,
+            "/generate/batch": self.server.service.generate_batch,
+            "/find": self.server.service.find_many,
+            "/save": self.server.service.save,
+            "/delete": self.server.service.delete,
+        }
+        handler = routes.get(urlsplit(self.path).path)
+        try:
+            body = self._read_body()  # тело дочитываем всегда, чтобы не сломать keep-alive
+        except RequestError as e:
+            # Где кончается тело, неизвестно - соединение после ответа закрываем
+            self.close_connection = True
+            self._send_json(e.status, {"error": str(e)})
+            return
+        if handler is None:
+            self._send_json(404, {"error": "Неизвестный адрес"})
+            return
+        self._dispatch(lambda: handler(self._parse_json(body)))
+
+    def _dispatch(self, action):
+        """Выполняет обработчик в одном из слотов сервера и отправляет результат или ошибку в JSON.
+
+        Слот занимается только на время обработки: чтение запроса и отправка
+        ответа медленному клиенту не мешают другим запросам.
+        """
+        try:
+            with self.server.request_slots:
+                status, data = 200, action()
+        except RequestError as e:
+            status, data = e.status, {"error": str(e)}
+        except SchemaOutdatedError as e:
+            status, data = 503, {"error": str(e)}
+        except Exception as e:
+            status, data = 500, {"error": f"Внутренняя ошибка: {e}"}
+        self._send_json(status, data)
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise RequestError(400, "Некорректный заголовок Content-Length")
+        if length < 0:
+            raise RequestError(400, "Некорректный заголовок Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise RequestError(413, f"Тело запроса больше {MAX_BODY_SIZE} байт")
+        return self.rfile.read(length) if length else b""
+
+    def _parse_json(self, body):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise RequestError(400, "Тело запроса должно быть JSON")
+        if not isinstance(payload, dict):
+            raise RequestError(400, "Тело запроса должно быть JSON-объектом")
+        return payload
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Не пишем журнал каждого запроса в консоль."""
+
+
+class BoundedThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """HTTP-сервер: поток на соединение, но не больше workers запросов обрабатываются одновременно.
+
+    Простаивающее keep-alive соединение держит только свой спящий поток и не
+    занимает слот обработки, поэтому не задерживает запросы других клиентов.
+    Ограничение слотов не дает запросам превысить пул соединений с базой.
+    """
+
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self, address, service, workers=8):
+        super().__init__(address, PassgenRequestHandler)
+        self.service = service
+        self.workers = workers
+        self.request_slots = threading.BoundedSemaphore(workers)
+
+
+def create_server(host="127.0.0.1", port=8080, workers=8, cache=None):
+    """Создает сервер, готовый к запуску через serve_forever().
+
+    Args:
+        host: Адрес для прослушивания
+        port: Порт (0 - выбрать свободный)
+        workers: Сколько запросов обрабатывать одновременно
+        cache: Общий кэш поиска (по умолчанию создается новый)
+
+    Returns:
+        BoundedThreadingHTTPServer: Созданный сервер
+    """
+    return BoundedThreadingHTTPServer((host, port), PassgenService(cache), workers=workers)
+
+
+def serve(host="127.0.0.1", port=8080, workers=8):
+    """Запускает сервер и обслуживает запросы до нажатия Ctrl+C."""
+    server = create_server(host, port, workers)
+    storage.register_cache(server.service.cache)
+    print(f"🚀 Сервер PassGen запущен на http://{host}:{server.server_address[1]} (одновременных запросов: {workers})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nОстанавливаем сервер...")
+    finally:
+        server.server_close()
@@ -1,19 +1,113 @@
 """Модуль работы с хранилищем паролей в базе данных."""
 
-from .database_postgres import PasswordDB
+import sys
+import threading
+
+from .cache import MISSING
+from .changefeed import ChangeListener
+from .database_postgres import PasswordDB, HISTORY_LIMIT, CHANGE_CHANNEL
+from .search import ServiceIndex
+from .utils import password_digest
+from .vault import Vault, VaultLockedError, new_salt, DEFAULT_KEY_TIMEOUT
+from .writebehind import WriteBehindQueue, SAVE
 
 # Создаем базу ОДИН РАЗ при запуске программы
 db = PasswordDB()
 
+# Сейф для обратимого хранения паролей; появляется после unlock_vault()
+vault = None
+
+# Индекс названий сервисов в памяти для поиска без pg_trgm; строится при первом поиске
+service_index = None
+_service_index_lock = threading.Lock()
+
+# Очередь отложенной записи; появляется после enable_write_behind()
+write_queue = None
+
+# Ошибки отложенной записи закрытой очереди, еще не забранные take_write_errors()
+_write_errors = []
+
+# Локальные кэши поиска, которые сбрасываются при изменениях в других процессах
+_local_caches = []
+
+# Слушатель изменений из других процессов; появляется после start_change_listener()
+change_listener = None
+
+# Сколько секунд ждать записи отложенных операций (при чтении списков и при завершении)
+FLUSH_TIMEOUT = 30
+
 
 def save_password(service, password):
     """Сохраняет хэш пароля для указанного сервиса в базу данных.
 
+    Если сейф разблокирован, вместе с хэшем сохраняется зашифрованный пароль.
+    В режиме отложенной записи пароль только ставится в очередь, а повтор
+    недавнего пароля обнаруживается при записи и сообщается в stderr.
+
     Args:
         service (str): Название сервиса (например: 'gmail', 'yandex')
         password (str): Пароль в открытом виде
+
+    Raises:
+        ValueError: Если пароль уже использовался для этого сервиса недавно
+        VaultLockedError: Если сейф был разблокирован, но время хранения ключа истекло
     """
-    db.save_password(service, password)
+    if write_queue is not None:
+        _check_vault_unlocked()
+        write_queue.save(service, password)
+    elif vault is not None:
+        db.save_password(service, password, vault.encrypt(service, password))
+    else:
+        db.save_password(service, password)
+    if service_index is not None:
+        service_index.add(service)
+
+
+def save_passwords(items):
+    """Сохраняет пароли для нескольких сервисов одним обращением к базе данных.
+
+    Args:
+        items: Список пар (сервис, пароль в открытом виде)
+
+    Returns:
+        list: Для каждого элемента None при успехе или текст ошибки
+    """
+    items = list(items)
+    if write_queue is not None:
+        _check_vault_unlocked()
+        for service, password in items:
+            write_queue.save(service, password)
+        errors = [None] * len(items)
+    else:
+        errors = _write_passwords(items)
+    if service_index is not None:
+        for (service, _), error in zip(items, errors):
+            if error is None:
+                service_index.add(service)
+    return errors
+
+
+def _write_passwords(items):
+    """Записывает пароли в базу сразу (с шифрованием, если сейф разблокирован)."""
+    if vault is not None:
+        items = list(items)
+        return db.save_passwords(items, [vault.encrypt(service, password) for service, password in items])
+    return db.save_passwords(items)
+
+
+def _check_vault_unlocked():
+    """Не дает поставить в очередь пароль, который нельзя будет зашифровать при записи."""
+    if vault is not None and not vault.is_unlocked:
+        raise VaultLockedError("Сейф заблокирован: введите мастер-пароль")
+
+
+def _pending_hash(service):
+    """Хэш из еще не записанной операции очереди (None - ожидает удаления) или MISSING."""
+    pending = write_queue.lookup(service) if write_queue is not None else MISSING
+    if pending is MISSING:
+        return MISSING
+    operation, password = pending
+    return password_digest(password) if operation == SAVE else None
 
 
 def find_password(service):
@@ -23,17 +117,46 @@ def find_password(service):
         service: Название сервиса
 
     Returns:
-        str or None: Хэш пароля или None если не найден
+        bytes or None: SHA-256 хэш пароля (32 байта) или None если не найден
     """
+    pending = _pending_hash(service)
+    if pending is not MISSING:
+        return pending
     return db.find_password(service)
 
 
+def find_passwords(services):
+    """Находит хэши паролей сразу для нескольких сервисов.
+
+    Args:
+        services: Список названий сервисов
+
+    Returns:
+        dict: Словарь {сервис: хэш_пароля (bytes) или None если не найден}
+    """
+    if write_queue is None:
+        return db.find_passwords(services)
+
+    found = {}
+    missing = []
+    for service in services:
+        pending = _pending_hash(service)
+        if pending is MISSING:
+            missing.append(service)
+        else:
+            found[service] = pending
+    if missing:
+        found.update(db.find_passwords(missing))
+    return found
+
+
 def get_all_passwords():
     """Возвращает все сохраненные пароли.
 
     Returns:
-        list: Список кортежей (сервис, хэш_пароля)
+        list: Список кортежей (сервис, хэш_пароля в bytes)
     """
+    flush()
     return db.get_all_passwords()
 
 
@@ -46,4 +169,321 @@ def delete_password(service):
     Returns:
         bool: True если удалено, False если не найдено
     """
+    if service_index is not None:
+        service_index.remove(service)
+    if write_queue is not None:
+        existed = find_password(service) is not None
+        write_queue.delete(service)
+        return existed
     return db.delete_password(service)
+
+
+def delete_passwords(services):
+    """Удаляет пароли для нескольких сервисов одним обращением к базе данных.
+
+    Args:
+        services: Список названий сервисов
+
+    Returns:
+        set: Множество сервисов, для которых пароль был удален
+    """
+    if service_index is not None:
+        for service in services:
+            service_index.remove(service)
+    if write_queue is not None:
+        found = find_passwords(services)
+        for service in services:
+            write_queue.delete(service)
+        return {service for service, password_hash in found.items() if password_hash is not None}
+    return db.delete_passwords(services)
+
+
+def search_services(term, limit=20, offset=0):
+    """Ищет сервисы по префиксу, подстроке и с учетом опечаток.
+
+    Если в PostgreSQL доступно расширение pg_trgm, поиск выполняется в базе
+    по триграммному индексу, иначе - по индексу названий в памяти.
+
+    Args:
+        term: Поисковый запрос
+        limit: Сколько результатов вернуть
+        offset: Сколько лучших результатов пропустить (постраничный вывод)
+
+    Returns:
+        list: Список кортежей (сервис, оценка), от лучших к худшим
+    """
+    global service_index
+
+    if db.trigram_search:
+        flush()
+        return db.search_services(term, limit, offset)
+
+    index = service_index  # может быть сброшен слушателем изменений в любой момент
+    if index is None:
+        with _service_index_lock:
+            if service_index is None:
+                flush()
+                service_index = ServiceIndex(db.get_service_names())
+            index = service_index
+    return index.search(term, limit, offset)
+
+
+def load_password_hashes(seen):
+    """Добавляет хэши всех сохраненных паролей в фильтр уникальности.
+
+    Args:
+        seen: Фильтр ScalableBloomFilter (см. generator.generate_passwords)
+
+    Returns:
+        int: Сколько хэшей добавлено
+    """
+    flush()
+    return seen.update(db.iter_password_hashes())
+
+
+def get_password_history(service, limit=HISTORY_LIMIT):
+    """Возвращает последние пароли сервиса из истории.
+
+    Args:
+        service: Название сервиса
+        limit: Сколько последних записей вернуть
+
+    Returns:
+        list: Список кортежей (хэш_пароля в bytes, дата_создания), от новых к старым
+    """
+    flush()
+    return db.get_password_history(service, limit)
+
+
+def unlock_vault(master_password, key_timeout=DEFAULT_KEY_TIMEOUT):
+    """Разблокирует сейф мастер-паролем (создает сейф при первом вызове).
+
+    Ключ выводится один раз и хранится в памяти key_timeout секунд; после
+    этого операции с сейфом вызывают VaultLockedError до повторной разблокировки.
+
+    Args:
+        master_password: Мастер-пароль
+        key_timeout: Сколько секунд хранить ключ в памяти
+
+    Returns:
+        bool: True если сейф был создан этим вызовом
+
+    Raises:
+        ValueError: Если мастер-пароль неверный
+    """
+    global vault
+
+    meta = db.get_vault_meta()
+    if meta is None:
+        candidate = Vault(new_salt(), key_timeout)
+        candidate.unlock(master_password)
+        if db.create_vault_meta(candidate.salt, candidate.make_check_blob()):
+            vault = candidate
+            return True
+        meta = db.get_vault_meta()  # сейф параллельно создал другой процесс
+
+    salt, check_blob = meta
+    candidate = Vault(salt, key_timeout)
+    candidate.unlock(master_password, check_blob)
+    vault = candidate
+    return False
+
+
+def lock_vault():
+    """Блокирует сейф, удаляя ключ из памяти."""
+    global vault
+
+    if vault is not None:
+        vault.lock()
+    vault = None
+
+
+def reveal_password(service):
+    """Возвращает пароль сервиса в открытом виде из сейфа.
+
+    Args:
+        service: Название сервиса
+
+    Returns:
+        str or None: Пароль или None, если для сервиса нет зашифрованной копии
+
+    Raises:
+        VaultLockedError: Если сейф не разблокирован
+    """
+    if vault is None:
+        raise VaultLockedError("Сейф заблокирован: введите мастер-пароль")
+    pending = write_queue.lookup(service) if write_queue is not None else MISSING
+    if pending is not MISSING:
+        return pending[1]  # пароль из очереди (None - ожидает удаления)
+    encrypted = db.find_encrypted_password(service)
+    return vault.decrypt(service, encrypted) if encrypted is not None else None
+
+
+def export_passwords(workers=None):
+    """Расшифровывает все пароли сейфа (расшифровка идет в нескольких потоках).
+
+    Args:
+        workers: Количество потоков расшифровки (по умолчанию - число ядер)
+
+    Returns:
+        list: Список кортежей (сервис, пароль)
+
+    Raises:
+        VaultLockedError: Если сейф не разблокирован
+    """
+    if vault is None:
+        raise VaultLockedError("Сейф заблокирован: введите мастер-пароль")
+    flush()
+    return vault.decrypt_many(db.get_all_encrypted_passwords(), workers=workers)
+
+
+def enable_write_behind(max_pending=10000, batch_size=500, flush_interval=0.05):
+    """Включает отложенную запись: save/delete ставятся в очередь и пишутся пачками в фоне.
+
+    Чтения (find_password и др.) учитывают еще не записанные операции.
+    Перед завершением программы нужно вызвать shutdown().
+
+    Запрет повтора недавнего пароля проверяется только при записи в базу, а
+    не при вызове save_password/save_passwords: отклоненный пароль до записи
+    пачки виден в find_password, а об отказе сообщают stderr и
+    take_write_errors().
+
+    Args:
+        max_pending: Размер очереди; при заполнении запись ждет освобождения места
+        batch_size: Сколько операций записывать одной транзакцией
+        flush_interval: Максимальная задержка записи неполной пачки, с
+    """
+    global write_queue
+
+    if write_queue is None:
+        write_queue = WriteBehindQueue(
+            _write_passwords, db.delete_passwords,
+            max_pending=max_pending, batch_size=batch_size, flush_interval=flush_interval
+        )
+
+
+def flush(timeout=FLUSH_TIMEOUT):
+    """Ждет записи всех отложенных операций.
+
+    Returns:
+        bool: True если все записано (или отложенная запись выключена)
+    """
+    if write_queue is None:
+        return True
+    return write_queue.flush(timeout)
+
+
+def take_write_errors():
+    """Возвращает ошибки отложенной записи, накопленные с прошлого вызова, и очищает их.
+
+    Returns:
+        list: Пары (сервис, текст ошибки); пустой, если отложенная запись выключена
+    """
+    errors = _write_errors[:]
+    _write_errors.clear()
+    if write_queue is not None:
+        errors.extend(write_queue.take_errors())
+    return errors
+
+
+def shutdown(timeout=FLUSH_TIMEOUT):
+    """Записывает отложенные операции и закрывает очередь и соединения с базой.
+
+    Returns:
+        bool: True если все отложенные операции записаны
+    """
+    global write_queue
+
+    stop_change_listener()
+    flushed = True
+    if write_queue is not None:
+        flushed = write_queue.close(timeout)
+        _write_errors.extend(write_queue.take_errors())
+        write_queue = None
+    db.close()
+    return flushed
+
+
+def register_cache(cache):
+    """Подключает локальный кэш (LookupCache) к сбросу по изменениям из других процессов."""
+    if cache not in _local_caches:
+        _local_caches.append(cache)
+
+
+def start_change_listener():
+    """Запускает фоновую подписку на изменения паролей (LISTEN/NOTIFY).
+
+    Запись, сделанная другим процессом, сбрасывает запись сервиса в
+    зарегистрированных кэшах и обновляет индекс названий сервисов. После
+    переподключения к базе все локальные данные сбрасываются целиком.
+    Предназначена для долгоживущих режимов (сервер).
+
+    Returns:
+        ChangeListener: Запущенный слушатель
+    """
+    global change_listener
+
+    if change_listener is None:
+        change_listener = ChangeListener(
+            db.get_connection, CHANGE_CHANNEL, _apply_remote_change, _resync_local_state
+        ).start()
+    return change_listener
+
+
+def stop_change_listener():
+    """Останавливает подписку на изменения, если она запущена."""
+    global change_listener
+
+    if change_listener is not None:
+        change_listener.stop(timeout=FLUSH_TIMEOUT)
+        change_listener = None
+
+
+def _apply_remote_change(op, service):
+    """Сбрасывает локальные данные одного сервиса после записи в базе."""
+    for cache in _local_caches:
+        cache.invalidate(service)
+    index = service_index
+    if index is not None:
+        if op == SAVE:
+            index.add(service)
+        else:
+            index.remove(service)
+
+
+def _resync_local_state():
+    """Сбрасывает все локальные данные (часть уведомлений могла быть потеряна)."""
+    global service_index
+
+    for cache in _local_caches:
+        cache.clear()
+    with _service_index_lock:
+        service_index = None  # будет построен заново при следующем поиске
+
+
+def start_history_pruning(interval=3600, keep=HISTORY_LIMIT):
+    """Запускает фоновую очистку истории паролей.
+
+    Очистка выполняется в daemon-потоке сразу после запуска и затем
+    каждые `interval` секунд, поэтому не задерживает работу пользователя.
+    Предназначена для долгоживущих режимов (интерактивный режим и т.п.).
+
+    Args:
+        interval: Пауза между запусками очистки в секундах
+        keep: Сколько последних паролей оставить для каждого сервиса
+
+    Returns:
+        threading.Event: Событие, установка которого останавливает очистку
+    """
+    stop_event = threading.Event()
+
+    def prune_loop():
+        while not stop_event.is_set():
+            try:
+                db.prune_history(keep=keep)
+            except Exception as e:
+                print(f"❌ Ошибка при очистке истории паролей: {e}", file=sys.stderr)
+            stop_event.wait(interval)
+
+    threading.Thread(target=prune_loop, name="passgen-history-pruner", daemon=True).start()
+    return stop_event
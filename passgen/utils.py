@@ -15,6 +15,32 @@ def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 
+def password_digest(password):
+    """Создает SHA-256 хэш пароля в двоичном виде (так он хранится в базе).
+
+       Args:
+           password: Пароль в открытом виде
+
+       Returns:
+           bytes: Хэш пароля (32 байта)
+       """
+    return hashlib.sha256(password.encode()).digest()
+
+
+def format_hash(password_hash):
+    """Переводит хэш пароля в hex-строку для вывода пользователю.
+
+       Args:
+           password_hash: Хэш в двоичном виде (bytes), уже hex-строка или None
+
+       Returns:
+           str or None: Хэш пароля в hex-формате (None остается None)
+       """
+    if isinstance(password_hash, (bytes, bytearray, memoryview)):
+        return bytes(password_hash).hex()
+    return password_hash
+
+
 def validate_password_length(length):
     """Проверяет минимальную длину пароля.
 
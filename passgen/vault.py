@@ -0,0 +1,199 @@
+"""Модуль зашифрованного хранилища паролей (режим сейфа).
+
+В отличие от SHA-256 хэша, зашифрованный пароль можно восстановить, зная
+мастер-пароль. Ключ выводится из мастер-пароля один раз за сессию (scrypt)
+и хранится в памяти ограниченное время, после чего сейф снова блокируется.
+
+Шифрование - AES-256-GCM (AEAD), название сервиса используется как
+дополнительные аутентифицированные данные, поэтому зашифрованный пароль
+нельзя незаметно "переставить" на другой сервис.
+
+Требует пакет cryptography (pip install cryptography).
+"""
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:  # режим сейфа необязателен, остальная программа работает без него
+    AESGCM = None
+    InvalidTag = None
+
+# Формат зашифрованной записи: версия (1 байт) + nonce (12 байт) + шифртекст с тегом
+BLOB_VERSION = 1
+NONCE_SIZE = 12
+SALT_SIZE = 16
+
+# Параметры scrypt (~64 МБ памяти, доли секунды на вывод ключа)
+SCRYPT_N = 2 ** 16
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Сколько секунд ключ хранится в памяти после разблокировки
+DEFAULT_KEY_TIMEOUT = 300
+
+# Контрольная запись для проверки мастер-пароля
+_CHECK_PLAINTEXT = b"passgen-vault-check"
+_CHECK_AAD = b"\x00passgen-vault-check"
+
+
+class VaultLockedError(ValueError):
+    """Сейф заблокирован: ключ не выведен или время его хранения истекло."""
+
+
+def new_salt():
+    """Возвращает случайную соль для вывода ключа."""
+    return os.urandom(SALT_SIZE)
+
+
+def derive_key(master_password, salt):
+    """Выводит 256-битный ключ из мастер-пароля с помощью scrypt.
+
+    Args:
+        master_password: Мастер-пароль
+        salt: Соль сейфа
+
+    Returns:
+        bytes: Ключ длиной 32 байта
+    """
+    return hashlib.scrypt(
+        master_password.encode(), salt=salt,
+        n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P,
+        maxmem=256 * SCRYPT_N * SCRYPT_R, dklen=32
+    )
+
+
+class Vault:
+    """Шифрует и расшифровывает пароли ключом, выведенным из мастер-пароля."""
+
+    def __init__(self, salt, key_timeout=DEFAULT_KEY_TIMEOUT):
+        """Создает заблокированный сейф.
+
+        Args:
+            salt: Соль сейфа (хранится в базе данных вместе с контрольной записью)
+            key_timeout: Сколько секунд ключ хранится в памяти после разблокировки
+
+        Raises:
+            RuntimeError: Если не установлен пакет cryptography
+        """
+        if AESGCM is None:
+            raise RuntimeError("Для режима сейфа установите пакет cryptography: pip install cryptography")
+        self.salt = salt
+        self.key_timeout = key_timeout
+        self._aead = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def unlock(self, master_password, check_blob=None):
+        """Выводит ключ из мастер-пароля и держит его в памяти key_timeout секунд.
+
+        Args:
+            master_password: Мастер-пароль
+            check_blob: Контрольная запись из make_check_blob() для проверки пароля
+
+        Raises:
+            ValueError: Если мастер-пароль не подходит к контрольной записи
+        """
+        aead = AESGCM(derive_key(master_password, self.salt))
+        if check_blob is not None:
+            try:
+                if self._decrypt_with(aead, bytes(check_blob), _CHECK_AAD) != _CHECK_PLAINTEXT:
+                    raise ValueError("Неверный мастер-пароль")
+            except InvalidTag:
+                raise ValueError("Неверный мастер-пароль")
+        with self._lock:
+            self._aead = aead
+            self._expires_at = time.monotonic() + self.key_timeout
+
+    def lock(self):
+        """Удаляет ключ из памяти."""
+        with self._lock:
+            self._aead = None
+            self._expires_at = 0.0
+
+    @property
+    def is_unlocked(self):
+        """True, если ключ есть в памяти и время его хранения не истекло."""
+        with self._lock:
+            return self._aead is not None and time.monotonic() < self._expires_at
+
+    def make_check_blob(self):
+        """Шифрует контрольную запись текущим ключом (для проверки мастер-пароля)."""
+        return self._encrypt_with(self._current_aead(), _CHECK_PLAINTEXT, _CHECK_AAD)
+
+    def encrypt(self, service, password):
+        """Шифрует пароль сервиса.
+
+        Args:
+            service: Название сервиса (привязывается к записи как AAD)
+            password: Пароль в открытом виде
+
+        Returns:
+            bytes: Зашифрованная запись
+        """
+        return self._encrypt_with(self._current_aead(), password.encode(), service.encode())
+
+    def decrypt(self, service, blob):
+        """Расшифровывает пароль сервиса.
+
+        Raises:
+            ValueError: Если запись повреждена или принадлежит другому сервису
+        """
+        return self._decrypt_checked(self._current_aead(), service, blob)
+
+    def decrypt_many(self, items, workers=None, chunk_size=2048):
+        """Расшифровывает много записей, распределяя работу по потокам.
+
+        AES-GCM в cryptography выполняется в нативном коде, поэтому потоки
+        дают выигрыш на больших выгрузках. Записи делятся на куски по
+        chunk_size, чтобы накладные расходы пула не съедали выигрыш.
+
+        Args:
+            items: Список пар (сервис, зашифрованная запись)
+            workers: Количество потоков (по умолчанию - число ядер)
+            chunk_size: Размер куска записей для одного потока
+
+        Returns:
+            list: Список пар (сервис, пароль) в исходном порядке
+        """
+        aead = self._current_aead()  # ключ фиксируем один раз на всю выгрузку
+        items = list(items)
+
+        def decrypt_chunk(chunk):
+            return [(service, self._decrypt_checked(aead, service, blob)) for service, blob in chunk]
+
+        if workers == 1 or len(items) <= chunk_size:
+            return decrypt_chunk(items)
+
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            return [pair for chunk in executor.map(decrypt_chunk, chunks) for pair in chunk]
+
+    def _current_aead(self):
+        with self._lock:
+            if self._aead is None or time.monotonic() >= self._expires_at:
+                self._aead = None
+                raise VaultLockedError("Сейф заблокирован: введите мастер-пароль")
+            return self._aead
+
+    def _decrypt_checked(self, aead, service, blob):
+        try:
+            return self._decrypt_with(aead, bytes(blob), service.encode()).decode()
+        except InvalidTag:
+            raise ValueError(f"Зашифрованный пароль для '{service}' поврежден или не подходит к ключу")
+
+    @staticmethod
+    def _encrypt_with(aead, plaintext, aad):
+        nonce = os.urandom(NONCE_SIZE)
+        return bytes([BLOB_VERSION]) + nonce + aead.encrypt(nonce, plaintext, aad)
+
+    @staticmethod
+    def _decrypt_with(aead, blob, aad):
+        if len(blob) <= 1 + NONCE_SIZE or blob[0] != BLOB_VERSION:
+            raise ValueError("Неизвестный формат зашифрованной записи")
+        return aead.decrypt(blob[1:1 + NONCE_SIZE], blob[1 + NONCE_SIZE:], aad)
@@ -0,0 +1,244 @@
+"""Модуль отложенной записи (write-behind) паролей в базу данных.
+
+Сохранения и удаления попадают в ограниченную очередь в памяти и сразу
+возвращают управление. Фоновый поток объединяет повторные записи одного
+сервиса (остается только последняя) и записывает накопленное пачками -
+по достижении batch_size операций или через flush_interval секунд.
+
+Повторяется только пачка, не записанная из-за ошибки соединения с базой.
+Остальные ошибки (например, истек ключ сейфа или база отклонила строку)
+при повторе не исчезнут, поэтому операции пачки считаются неудавшимися
+и очередь идет дальше. Такие ошибки (в том числе отказ из-за повтора
+недавнего пароля) копятся в очереди и забираются через take_errors().
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .cache import MISSING
+from .replicas import CONNECTION_ERRORS
+
+SAVE = "save"
+DELETE = "delete"
+
+# Сколько последних ошибок записи хранить до вызова take_errors()
+MAX_KEPT_ERRORS = 1000
+
+LOST_ERROR = "Не записано в базу до завершения работы"
+
+
+class WriteBehindQueue:
+    """Очередь отложенной записи с фоновым потоком групповых коммитов."""
+
+    def __init__(self, save_batch, delete_batch, max_pending=10000, batch_size=500,
+                 flush_interval=0.05, retry_delay=1.0):
+        """Создает очередь и запускает фоновый поток записи.
+
+        Args:
+            save_batch: Функция записи пачки: список (сервис, пароль) -> список ошибок (None - успех)
+            delete_batch: Функция удаления пачки: список сервисов -> множество удаленных
+            max_pending: Максимум ожидающих записи сервисов; при заполнении save/delete ждут
+            batch_size: Сколько операций записывать одной транзакцией
+            flush_interval: Максимальное время ожидания перед записью неполной пачки, с
+            retry_delay: Пауза перед повтором, если нет соединения с базой, с
+        """
+        self._save_batch = save_batch
+        self._delete_batch = delete_batch
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+
+        self._pending = OrderedDict()  # сервис -> (операция, пароль), от старых к новым
+        self._inflight = {}  # операции, которые пишутся прямо сейчас
+        self._first_pending_at = None
+        self._closing = False
+        self._cond = threading.Condition()
+        self.failed = 0  # количество незаписанных операций (повтор пароля, ошибка записи)
+        self._errors = deque(maxlen=MAX_KEPT_ERRORS)  # (сервис, текст ошибки)
+
+        self._thread = threading.Thread(target=self._run, name="passgen-write-behind", daemon=True)
+        self._thread.start()
+
+    def save(self, service, password, timeout=None):
+        """Ставит сохранение пароля в очередь.
+
+        Raises:
+            TimeoutError: Если очередь переполнена дольше timeout секунд
+        """
+        self._put(service, (SAVE, password), timeout)
+
+    def delete(self, service, timeout=None):
+        """Ставит удаление пароля в очередь.
+
+        Raises:
+            TimeoutError: Если очередь переполнена дольше timeout секунд
+        """
+        self._put(service, (DELETE, None), timeout)
+
+    def lookup(self, service):
+        """Возвращает еще не записанную операцию для сервиса или MISSING.
+
+        Returns:
+            tuple or MISSING: ("save", пароль) или ("delete", None)
+        """
+        with self._cond:
+            if service in self._pending:
+                return self._pending[service]
+            return self._inflight.get(service, MISSING)
+
+    def flush(self, timeout=None):
+        """Ждет, пока все поставленные в очередь операции будут записаны.
+
+        Returns:
+            bool: True если очередь опустела, False если истек timeout
+        """
+        with self._cond:
+            if self._pending:
+                self._first_pending_at = 0.0  # не ждем flush_interval - пишем сразу
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._pending and not self._inflight, timeout)
+
+    def take_errors(self):
+        """Возвращает ошибки записи, накопленные с прошлого вызова, и очищает их.
+
+        Хранятся только последние MAX_KEPT_ERRORS ошибок; общее количество
+        незаписанных операций - в атрибуте failed.
+
+        Returns:
+            list: Пары (сервис, текст ошибки)
+        """
+        with self._cond:
+            errors = list(self._errors)
+            self._errors.clear()
+            return errors
+
+    def close(self, timeout=None):
+        """Записывает оставшиеся операции и останавливает фоновый поток.
+
+        Returns:
+            bool: True если все операции записаны
+        """
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._closing = True
+            failed_before = self.failed
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        with self._cond:
+            # Что осталось после остановки потока, уже не будет записано
+            self._fail([*self._pending.items(), *self._inflight.items()], LOST_ERROR)
+            self._pending.clear()
+            self._inflight.clear()
+            lost = self.failed - failed_before
+        if lost:
+            print(f"❌ Не записано в базу операций: {lost}", file=sys.stderr)
+        return flushed
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending) + len(self._inflight)
+
+    def _put(self, service, operation, timeout):
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("Очередь записи закрыта")
+            # Повторная запись сервиса заменяет ожидающую и не занимает место в очереди
+            if service not in self._pending:
+                if not self._cond.wait_for(lambda: len(self._pending) < self.max_pending, timeout):
+                    raise TimeoutError("Очередь записи переполнена")
+            self._pending[service] = operation
+            self._pending.move_to_end(service)
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+            self._cond.notify_all()
+
+    def _take_batch(self):
+        """Ждет готовую пачку и переносит ее в _inflight. Возвращает None при остановке."""
+        with self._cond:
+            while True:
+                if self._pending:
+                    due_at = self._first_pending_at + self.flush_interval
+                    wait = due_at - time.monotonic()
+                    if len(self._pending) >= self.batch_size or wait <= 0 or self._closing:
+                        break
+                    self._cond.wait(wait)
+                elif self._closing:
+                    return None
+                else:
+                    self._cond.wait()
+
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                service, operation = self._pending.popitem(last=False)
+                self._inflight[service] = operation
+                batch.append((service, operation))
+            self._first_pending_at = time.monotonic() if self._pending else None
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            # Сохранения и удаления разных сервисов независимы - пишем двумя групповыми коммитами
+            saves = [(service, operation) for service, operation in batch if operation[0] == SAVE]
+            deletes = [(service, operation) for service, operation in batch if operation[0] == DELETE]
+            for part, write in ((saves, self._write_saves), (deletes, self._write_deletes)):
+                if not part:
+                    continue
+                try:
+                    write(part)
+                except CONNECTION_ERRORS as e:
+                    print(f"❌ Ошибка соединения при отложенной записи, повтор через {self.retry_delay} с: {e}",
+                          file=sys.stderr)
+                    self._requeue(part)
+                    time.sleep(self.retry_delay)
+                except Exception as e:
+                    self._fail(part, str(e))
+                    print(f"❌ Не записано операций: {len(part)} "
+                          f"({', '.join(service for service, _ in part[:5])}{', ...' if len(part) > 5 else ''}): {e}",
+                          file=sys.stderr)
+                    self._done(part)
+                else:
+                    self._done(part)
+
+    def _done(self, part):
+        """Убирает записанную (или окончательно не записанную) часть пачки из _inflight."""
+        with self._cond:
+            for service, _ in part:
+                self._inflight.pop(service, None)
+            self._cond.notify_all()
+
+    def _fail(self, part, error):
+        """Учитывает операции, которые не будут записаны."""
+        with self._cond:
+            self.failed += len(part)
+            self._errors.extend((service, error) for service, _ in part)
+
+    def _write_saves(self, part):
+        errors = self._save_batch([(service, password) for service, (_, password) in part])
+        for (service, operation), error in zip(part, errors):
+            if error:
+                self._fail([(service, operation)], error)
+                print(f"❌ Пароль для '{service}' не сохранен: {error}", file=sys.stderr)
+
+    def _write_deletes(self, part):
+        self._delete_batch([service for service, _ in part])
+
+    def _requeue(self, part):
+        """Возвращает неудавшуюся часть пачки в начало очереди, не затирая более новые операции."""
+        with self._cond:
+            for service, operation in reversed(part):
+                self._inflight.pop(service, None)
+                if service not in self._pending:
+                    self._pending[service] = operation
+                    self._pending.move_to_end(service, last=False)
+            if self._closing:
+                # При остановке не повторяем бесконечно - close() сообщит о потерянных операциях
+                self._fail(list(self._pending.items()), LOST_ERROR)
+                self._pending.clear()
+            self._first_pending_at = time.monotonic()
+            self._cond.notify_all()
@@ -0,0 +1,152 @@
+import json
+import unittest
+from io import StringIO
+from unittest.mock import patch, MagicMock
+from passgen.batch import run_batch
+
+
+class TestBatch(unittest.TestCase):
+    """Тесты для пакетного режима CLI (база данных заменена заглушкой)."""
+
+    def setUp(self):
+        """Подменяем БД заглушкой."""
+        self.db_mock = MagicMock()
+        self.db_patcher = patch("passgen.storage.db", self.db_mock)
+        self.db_patcher.start()
+
+    def tearDown(self):
+        """Отключаем заглушку."""
+        self.db_patcher.stop()
+
+    def run_commands(self, *commands, chunk_size=100):
+        """Выполняет команды и возвращает список разобранных результатов."""
+        input_stream = StringIO("\n".join(
+            c if isinstance(c, str) else json.dumps(c) for c in commands
+        ) + "\n")
+        output_stream = StringIO()
+        run_batch(input_stream, output_stream, chunk_size=chunk_size)
+        return [json.loads(line) for line in output_stream.getvalue().splitlines()]
+
+    def test_consecutive_finds_are_grouped(self):
+        """Тест: подряд идущие find выполняются одним запросом к базе."""
+        self.db_mock.find_passwords.return_value = {"gmail": "hash1", "yandex": None}
+
+        results = self.run_commands(
+            {"op": "find", "service": "gmail", "id": 1},
+            {"op": "find", "service": "yandex", "id": 2},
+        )
+
+        self.db_mock.find_passwords.assert_called_once_with(["gmail", "yandex"])
+        self.assertEqual(results, [
+            {"ok": True, "service": "gmail", "password_hash": "hash1", "id": 1},
+            {"ok": True, "service": "yandex", "password_hash": None, "id": 2},
+        ])
+
+    def test_groups_split_on_operation_change(self):
+        """Тест: смена операции закрывает группу, порядок результатов сохраняется."""
+        self.db_mock.save_passwords.return_value = [None]
+        self.db_mock.find_passwords.return_value = {"gmail": "hash1"}
+        self.db_mock.delete_passwords.return_value = {"gmail"}
+
+        results = self.run_commands(
+            {"op": "save", "service": "gmail", "password": "secret"},
+            {"op": "find", "service": "gmail"},
+            {"op": "delete", "service": "gmail"},
+        )
+
+        self.db_mock.save_passwords.assert_called_once_with([("gmail", "secret")])
+        self.db_mock.delete_passwords.assert_called_once_with(["gmail"])
+        self.assertEqual([r["ok"] for r in results], [True, True, True])
+        self.assertTrue(results[2]["deleted"])
+
+    def test_generate_with_service_saves_in_one_call(self):
+        """Тест: пароли из группы generate сохраняются одним вызовом."""
+        self.db_mock.save_passwords.return_value = [None, "Пароль уже использовался"]
+
+        results = self.run_commands(
+            {"op": "generate", "length": 10, "service": "gmail"},
+            {"op": "generate", "length": 10},
+            {"op": "generate", "length": 10, "service": "yandex"},
+        )
+
+        saved = self.db_mock.save_passwords.call_args[0][0]
+        self.assertEqual([service for service, _ in saved], ["gmail", "yandex"])
+        self.assertTrue(results[0]["ok"] and results[0]["saved"])
+        self.assertTrue(results[1]["ok"] and not results[1]["saved"])
+        self.assertFalse(results[2]["ok"])
+        self.assertEqual(results[2]["error"], "Пароль уже использовался")
+        self.assertTrue(all(len(r["password"]) == 10 for r in results))
+
+    def test_write_behind_reports_deferred_rejections(self):
+        """Тест: при отложенной записи сохранения помечены queued, отказы выводятся в конце."""
+        from passgen import storage
+
+        self.db_mock.save_passwords.side_effect = lambda items: [
+            "Пароль уже использовался" if service == "gmail" else None for service, _ in items
+        ]
+        storage.enable_write_behind(flush_interval=10)
+        try:
+            with patch("sys.stderr"):
+                results = self.run_commands(
+                    {"op": "save", "service": "gmail", "password": "old", "id": 1},
+                    {"op": "save", "service": "yandex", "password": "new", "id": 2},
+                )
+        finally:
+            storage.shutdown(timeout=1)
+
+        self.assertEqual(results, [
+            {"ok": True, "service": "gmail", "queued": True, "id": 1},
+            {"ok": True, "service": "yandex", "queued": True, "id": 2},
+            {"ok": False, "service": "gmail", "error": "Пароль уже использовался", "deferred": True},
+        ])
+
+    def test_invalid_commands(self):
+        """Тест: некорректные команды дают ошибку, но не прерывают обработку."""
+        results = self.run_commands(
+            "not json",
+            {"op": "unknown"},
+            {"op": "save", "service": "gmail"},
+            {"op": "generate", "length": 2},
+        )
+
+        self.assertEqual(len(results), 4)
+        self.assertFalse(any(r["ok"] for r in results))
+        self.assertIn("не менее 4 символов", results[3]["error"])
+
+    def test_invalid_command_keeps_id(self):
+        """Тест: ошибка проверки команды-объекта возвращается с ее id."""
+        results = self.run_commands(
+            {"op": "unknown", "id": 7},
+            {"op": "save", "service": "gmail", "id": "a"},
+            "[1, 2]",
+        )
+
+        self.assertEqual([r.get("id") for r in results], [7, "a", None])
+        self.assertFalse(any(r["ok"] for r in results))
+
+    def test_storage_error_fails_whole_group(self):
+        """Тест: ошибка хранилища возвращается для каждой команды группы."""
+        self.db_mock.delete_passwords.side_effect = RuntimeError("нет соединения")
+
+        results = self.run_commands(
+            {"op": "delete", "service": "a"},
+            {"op": "delete", "service": "b"},
+        )
+
+        self.assertEqual(results, [
+            {"ok": False, "error": "нет соединения"},
+            {"ok": False, "error": "нет соединения"},
+        ])
+
+    def test_chunk_size_limits_group(self):
+        """Тест: группа не превышает chunk_size команд."""
+        self.db_mock.find_passwords.side_effect = lambda services: dict.fromkeys(services)
+
+        results = self.run_commands(*[{"op": "find", "service": f"s{i}"} for i in range(5)], chunk_size=2)
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(self.db_mock.find_passwords.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import sys
+import unittest
+
+from passgen.bloom import BloomFilter, ScalableBloomFilter
+from passgen.utils import password_digest
+
+
+def digests(start, stop):
+    return [password_digest(f"password-{i}") for i in range(start, stop)]
+
+
+class TestBloomFilter(unittest.TestCase):
+    """Тесты фильтра Блума фиксированного размера."""
+
+    def test_no_false_negatives(self):
+        """Тест: добавленный ключ всегда находится."""
+        bloom = BloomFilter(5000, 0.01)
+        keys = digests(0, 5000)
+        for key in keys:
+            bloom.add(key)
+
+        self.assertTrue(all(key in bloom for key in keys))
+        self.assertEqual(len(bloom), bloom.count)
+
+    def test_add_reports_duplicates(self):
+        """Тест: повторное добавление возвращает False и не увеличивает счетчик."""
+        bloom = BloomFilter(100)
+        key = password_digest("secret")
+
+        self.assertTrue(bloom.add(key))
+        self.assertFalse(bloom.add(key))
+        self.assertEqual(bloom.count, 1)
+
+    def test_false_positive_rate(self):
+        """Тест: доля ложных срабатываний близка к заданной."""
+        bloom = BloomFilter(20000, 0.01)
+        for key in digests(0, 20000):
+            bloom.add(key)
+
+        false_positives = sum(1 for key in digests(20000, 40000) if key in bloom)
+
+        self.assertLess(false_positives / 20000, 0.02)
+        self.assertAlmostEqual(bloom.false_positive_rate, 0.01, delta=0.003)
+
+    def test_invalid_parameters(self):
+        """Тест: некорректные параметры фильтра."""
+        with self.assertRaises(ValueError):
+            BloomFilter(0)
+        with self.assertRaises(ValueError):
+            BloomFilter(100, 1.5)
+
+
+class TestScalableBloomFilter(unittest.TestCase):
+    """Тесты растущего фильтра Блума."""
+
+    def test_grows_and_keeps_error_bound(self):
+        """Тест: при переполнении добавляются фильтры, общая доля ошибок не превышает заданную."""
+        bloom = ScalableBloomFilter(initial_capacity=1000, error_rate=0.01)
+        keys = digests(0, 10000)
+        added = bloom.update(keys)
+
+        self.assertGreater(len(bloom.filters), 1)
+        self.assertEqual(added, len(bloom))
+        self.assertEqual(added + bloom.hits, len(keys))
+        self.assertTrue(all(key in bloom for key in keys))
+        self.assertLessEqual(bloom.false_positive_rate, 0.01)
+
+        false_positives = sum(1 for key in digests(10000, 30000) if key in bloom)
+        self.assertLess(false_positives / 20000, 0.02)
+
+    def test_memory_is_bounded(self):
+        """Тест: фильтр намного меньше точного множества хэшей."""
+        bloom = ScalableBloomFilter(initial_capacity=1000, error_rate=0.001)
+        keys = digests(0, 20000)
+        bloom.update(keys)
+
+        exact = sys.getsizeof(set(keys)) + sum(sys.getsizeof(key) for key in keys)
+        stats = bloom.stats()
+        self.assertLess(stats["memory_bytes"] * 10, exact)
+        self.assertEqual(stats["items"], len(bloom))
+        self.assertLess(stats["bits_per_item"], 40)
+
+    def test_duplicate_is_hit(self):
+        """Тест: повтор считается попаданием и не добавляется."""
+        bloom = ScalableBloomFilter(initial_capacity=10)
+        key = password_digest("secret")
+
+        self.assertTrue(bloom.add(key))
+        self.assertFalse(bloom.add(key))
+        self.assertEqual(bloom.hits, 1)
+        self.assertEqual(len(bloom), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import patch
+from passgen.cache import LookupCache, MISSING
+
+
+class TestLookupCache(unittest.TestCase):
+    """Тесты для локального кэша результатов поиска."""
+
+    def test_put_and_get(self):
+        """Тест: сохраненное значение (в том числе None) возвращается до истечения ttl."""
+        cache = LookupCache()
+        cache.put("gmail", b"hash")
+        cache.put("yandex", None)
+
+        self.assertEqual(cache.get("gmail"), b"hash")
+        self.assertIsNone(cache.get("yandex"))
+        self.assertIs(cache.get("vk"), MISSING)
+
+    def test_expired_entry(self):
+        """Тест: устаревшая запись не возвращается."""
+        cache = LookupCache(ttl=10)
+        with patch("passgen.cache.time.monotonic", return_value=100.0):
+            cache.put("gmail", b"hash")
+        with patch("passgen.cache.time.monotonic", return_value=111.0):
+            self.assertIs(cache.get("gmail"), MISSING)
+
+    def test_put_after_invalidate_is_ignored(self):
+        """Тест: значение, прочитанное до сброса записи, не попадает в кэш."""
+        cache = LookupCache()
+        generation = cache.generation()
+        cache.invalidate("gmail")  # писатель сохранил пароль, пока читатель ждал базу
+
+        cache.put("gmail", b"old", generation)
+
+        self.assertIs(cache.get("gmail"), MISSING)
+
+    def test_invalidate_other_service_does_not_block_put(self):
+        """Тест: сброс другого сервиса не мешает сохранить значение."""
+        cache = LookupCache()
+        generation = cache.generation()
+        cache.invalidate("yandex")
+
+        cache.put("gmail", b"hash", generation)
+
+        self.assertEqual(cache.get("gmail"), b"hash")
+
+    def test_put_after_clear_is_ignored(self):
+        """Тест: после полного сброса значения, прочитанные раньше, не сохраняются."""
+        cache = LookupCache()
+        generation = cache.generation()
+        cache.clear()
+
+        cache.put("gmail", b"old", generation)
+        cache.put("yandex", b"new", cache.generation())
+
+        self.assertIs(cache.get("gmail"), MISSING)
+        self.assertEqual(cache.get("yandex"), b"new")
+
+    def test_forgotten_invalidations_stay_conservative(self):
+        """Тест: при переполнении журнала сбросов старые чтения все равно отбрасываются."""
+        cache = LookupCache(max_size=2)
+        generation = cache.generation()
+        for service in ("gmail", "yandex", "vk"):
+            cache.invalidate(service)
+
+        cache.put("gmail", b"old", generation)
+
+        self.assertIs(cache.get("gmail"), MISSING)
+
+    def test_lru_eviction(self):
+        """Тест: при переполнении вытесняется давно не использованная запись."""
+        cache = LookupCache(max_size=2)
+        cache.put("gmail", 1)
+        cache.put("yandex", 2)
+        cache.get("gmail")
+        cache.put("vk", 3)
+
+        self.assertIs(cache.get("yandex"), MISSING)
+        self.assertEqual(len(cache), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,258 @@
+import json
+import socket
+import threading
+import time
+import unittest
+import uuid
+from collections import namedtuple
+from unittest.mock import patch
+
+import psycopg2
+
+from passgen import storage
+from passgen.cache import LookupCache
+from passgen.changefeed import ChangeListener
+from passgen.database_postgres import PasswordDB, DB_CONFIG, CHANGE_CHANNEL
+from passgen.search import ServiceIndex
+
+Notify = namedtuple("Notify", "pid channel payload")
+
+
+class FakeConnection:
+    """Заглушка соединения psycopg2: уведомления и обрывы задаются из теста."""
+
+    def __init__(self):
+        self._sock, self._peer = socket.socketpair()
+        self.notifies = []
+        self.executed = []
+        self.broken = False
+        self.closed = False
+        self.autocommit = False
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        if self.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.executed.append(sql)
+
+    def poll(self):
+        self._sock.recv(1024)
+        if self.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    def notify(self, payload):
+        self.notifies.append(Notify(1, CHANGE_CHANNEL, payload))
+        self._peer.send(b"\0")
+
+    def break_connection(self):
+        self.broken = True
+        self._peer.send(b"\0")
+
+    def close(self):
+        self.closed = True
+        self._sock.close()
+        self._peer.close()
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class TestChangeListener(unittest.TestCase):
+    """Тесты для слушателя изменений (соединение с базой заменено заглушкой)."""
+
+    def setUp(self):
+        self.connections = []
+        self.changes = []
+        self.resyncs = []
+        self.listener = ChangeListener(
+            self.connect, CHANGE_CHANNEL,
+            lambda op, service: self.changes.append((op, service)),
+            lambda: self.resyncs.append(True),
+            poll_interval=0.05, reconnect_delay=0.01
+        )
+
+    def tearDown(self):
+        self.listener.stop(timeout=2)
+
+    def connect(self):
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn
+
+    def test_listen_and_dispatch(self):
+        """Тест: слушатель подписывается на канал и передает изменения обработчику."""
+        self.listener.start()
+        self.assertTrue(self.listener.connected.wait(2))
+        conn = self.connections[0]
+        self.assertTrue(conn.autocommit)
+        self.assertEqual(conn.executed[0], f'LISTEN "{CHANGE_CHANNEL}"')
+        self.assertEqual(len(self.resyncs), 1)  # первая синхронизация сразу после LISTEN
+
+        conn.notify(json.dumps({"op": "save", "service": "gmail"}))
+        conn.notify(json.dumps({"op": "delete", "service": "yandex"}))
+
+        self.assertTrue(wait_until(lambda: len(self.changes) == 2))
+        self.assertEqual(self.changes, [("save", "gmail"), ("delete", "yandex")])
+
+    def test_resync_payload(self):
+        """Тест: TRUNCATE и непонятные уведомления вызывают полную пересинхронизацию."""
+        self.listener.start()
+        self.assertTrue(self.listener.connected.wait(2))
+
+        self.connections[0].notify('{"op": "resync"}')
+        self.connections[0].notify("not json")
+
+        self.assertTrue(wait_until(lambda: len(self.resyncs) == 3))
+        self.assertEqual(self.changes, [])
+
+    def test_reconnect_after_failure(self):
+        """Тест: после обрыва слушатель переподключается и пересинхронизируется."""
+        with patch("sys.stderr"):
+            self.listener.start()
+            self.assertTrue(self.listener.connected.wait(2))
+
+            self.connections[0].break_connection()
+
+            self.assertTrue(wait_until(lambda: len(self.connections) == 2 and self.listener.connected.is_set()))
+        self.assertTrue(self.connections[0].closed)
+        self.assertEqual(self.connections[1].executed[0], f'LISTEN "{CHANGE_CHANNEL}"')
+        self.assertEqual(self.listener.resyncs, 2)
+
+        self.connections[1].notify(json.dumps({"op": "save", "service": "gmail"}))
+        self.assertTrue(wait_until(lambda: self.changes == [("save", "gmail")]))
+
+    def test_retry_when_database_unavailable(self):
+        """Тест: пока база недоступна, слушатель повторяет подключение с паузой."""
+        attempts = []
+
+        def connect():
+            attempts.append(time.monotonic())
+            if len(attempts) < 3:
+                raise psycopg2.OperationalError("connection refused")
+            return self.connect()
+
+        self.listener._connect = connect
+        with patch("sys.stderr"):
+            self.listener.start()
+            self.assertTrue(self.listener.connected.wait(2))
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(len(self.resyncs), 1)
+
+    def test_idle_connection_check(self):
+        """Тест: без уведомлений слушатель проверяет соединение запросом."""
+        self.listener.start()
+        self.assertTrue(self.listener.connected.wait(2))
+
+        self.assertTrue(wait_until(lambda: "SELECT 1" in self.connections[0].executed))
+
+    def test_stop_is_prompt(self):
+        """Тест: остановка не ждет окончания poll_interval."""
+        self.listener.poll_interval = 60
+        self.listener.start()
+        self.assertTrue(self.listener.connected.wait(2))
+
+        started = time.monotonic()
+        self.listener.stop(timeout=2)
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(self.connections[0].closed)
+
+
+class TestStorageChangeFeed(unittest.TestCase):
+    """Тесты сброса локальных данных storage по изменениям из других процессов."""
+
+    def setUp(self):
+        self.cache = LookupCache()
+        self.patchers = [
+            patch("passgen.storage._local_caches", [self.cache]),
+            patch("passgen.storage.service_index", ServiceIndex(["gmail", "yandex"])),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_remote_save(self):
+        """Тест: запись из другого процесса сбрасывает кэш сервиса и добавляет его в индекс."""
+        self.cache.put("github", None)
+        self.cache.put("gmail", b"hash")
+
+        storage._apply_remote_change("save", "github")
+
+        self.assertEqual(len(self.cache), 1)
+        self.assertIn("github", [name for name, _ in storage.service_index.search("github")])
+
+    def test_remote_delete(self):
+        """Тест: удаление в другом процессе сбрасывает кэш и убирает сервис из индекса."""
+        self.cache.put("gmail", b"hash")
+
+        storage._apply_remote_change("delete", "gmail")
+
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(storage.service_index.search("gmail"), [])
+
+    def test_resync(self):
+        """Тест: пересинхронизация очищает кэши и сбрасывает индекс."""
+        self.cache.put("gmail", b"hash")
+
+        storage._resync_local_state()
+
+        self.assertEqual(len(self.cache), 0)
+        self.assertIsNone(storage.service_index)
+
+
+def postgres_available():
+    try:
+        psycopg2.connect(**DB_CONFIG, connect_timeout=1).close()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+@unittest.skipUnless(postgres_available(), "нужен локальный PostgreSQL (DB_CONFIG)")
+class TestChangeFeedPostgres(unittest.TestCase):
+    """Интеграционный тест: два 'процесса' (два PasswordDB) и настоящий NOTIFY."""
+
+    def test_change_is_delivered(self):
+        writer = PasswordDB()
+        reader = PasswordDB()
+        service = f"changefeed-test-{uuid.uuid4().hex}"
+        received = []
+        delivered = threading.Event()
+
+        def on_change(op, changed):
+            if changed == service:
+                received.append(op)
+                delivered.set()
+
+        listener = ChangeListener(reader.get_connection, CHANGE_CHANNEL, on_change, lambda: None).start()
+        try:
+            self.assertTrue(listener.connected.wait(5))
+            writer.save_password(service, "secret")
+            self.assertTrue(delivered.wait(5))
+            delivered.clear()
+            writer.delete_password(service)
+            self.assertTrue(delivered.wait(5))
+            self.assertEqual(received, ["save", "delete"])
+        finally:
+            listener.stop(timeout=5)
+            writer.delete_password(service)
+            writer.close()
+            reader.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
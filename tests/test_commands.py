@@ -1,7 +1,11 @@
 import unittest
 from unittest.mock import patch, MagicMock   # изолировать тестируемый код от внешних зависимостей
 from io import StringIO                      # класс, который имитирует файл, но работает со строками в памяти
-from passgen.commands import handle_generate, handle_find
+import datetime
+import json
+import os
+import tempfile
+from passgen.commands import handle_generate, handle_find, handle_history
 
 
 class TestCommands(unittest.TestCase):
@@ -46,6 +50,22 @@ class TestCommands(unittest.TestCase):
             output = mock_stdout.getvalue()      # получает ВСЕ что было "напечатано" в виде строки
             self.assertIn("Ошибка: Длина пароля должна быть не менее 4 символов", output) # проверяет что строка содержится в другой строке
 
+    def test_handle_generate_reused_password(self):
+        """Тест обработки команды generate, когда пароль уже использовался для сервиса."""
+        args = MagicMock()
+        args.length = 12
+        args.service = "test_service"
+
+        with patch('passgen.commands.save_password') as mock_save:
+            mock_save.side_effect = ValueError("Пароль для 'test_service' совпадает с одним из последних 5 паролей")
+
+            with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+                handle_generate(args)
+
+                output = mock_stdout.getvalue()
+                self.assertIn("Ошибка: Пароль для 'test_service' совпадает", output)
+                self.assertNotIn("сохранён", output)
+
     def test_handle_find_existing(self):
         """Тест обработки команды find для существующего сервиса."""
         args = MagicMock()
@@ -62,6 +82,17 @@ class TestCommands(unittest.TestCase):
                 self.assertIn("hashed_password_123", output)
                 self.assertIn("ВНИМАНИЕ: Пароль хранится в хэшированном виде", output)
 
+    def test_handle_find_binary_hash(self):
+        """Тест: двоичный хэш из базы выводится в hex-формате."""
+        args = MagicMock()
+        args.service = "existing_service"
+
+        with patch('passgen.commands.find_password', return_value=bytes.fromhex("ab" * 32)):
+            with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+                handle_find(args)
+
+                self.assertIn("ab" * 32, mock_stdout.getvalue())
+
     def test_handle_find_non_existing(self):
         """Тест обработки команды find для несуществующего сервиса."""
         args = MagicMock()
@@ -76,6 +107,84 @@ class TestCommands(unittest.TestCase):
                 output = mock_stdout.getvalue()
                 self.assertIn("Пароль для сервиса 'non_existing_service' не найден", output)
 
+    def test_handle_history(self):
+        """Тест обработки команды find --history."""
+        args = MagicMock()
+        args.service = "gmail"
+
+        history = [
+            ("hash_new", datetime.datetime(2025, 2, 1, 10, 0, 0)),
+            ("hash_old", datetime.datetime(2025, 1, 1, 9, 30, 0)),
+        ]
+        with patch('passgen.storage.get_password_history', return_value=history) as mock_history:
+            with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+                handle_history(args)
+
+                output = mock_stdout.getvalue()
+                self.assertIn("2025-02-01 10:00:00  🔒 hash_new", output)
+                self.assertIn("2025-01-01 09:30:00  🔒 hash_old", output)
+                self.assertLess(output.index("hash_new"), output.index("hash_old"))
+
+            mock_history.assert_called_once_with("gmail")
+
+
+    @unittest.skipIf(os.name != "posix", "права доступа к файлам проверяются только в POSIX")
+    def test_handle_export_file_is_private(self):
+        """Тест выгрузки в файл: файл с паролями доступен только владельцу (0600)."""
+        from passgen.commands import handle_export
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "export.json")
+            with open(path, "w") as f:
+                f.write("старое содержимое")
+            os.chmod(path, 0o644)
+
+            with patch('passgen.commands.unlock_vault', return_value=True), \
+                    patch('passgen.storage.export_passwords', return_value=[("gmail", "secret")]), \
+                    patch('sys.stdout', new_callable=StringIO):
+                handle_export(MagicMock(output=path, workers=1))
+
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(json.load(f), [{"service": "gmail", "password": "secret"}])
+
+    def test_handle_migrate(self):
+        """Тест команды migrate: выводятся выполненные шаги миграции."""
+        from passgen.commands import handle_migrate
+
+        with patch('passgen.storage.db') as mock_db:
+            mock_db.migrate_schema.return_value = ["passwords: первичный ключ service вместо id"]
+            with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+                handle_migrate(MagicMock())
+
+        self.assertIn("Схема базы данных обновлена", mock_stdout.getvalue())
+        self.assertIn("первичный ключ service", mock_stdout.getvalue())
+
+    def test_handle_migrate_error(self):
+        """Тест команды migrate: ошибка базы завершает программу с кодом 1."""
+        from passgen.commands import handle_migrate
+
+        with patch('passgen.storage.db') as mock_db:
+            mock_db.migrate_schema.side_effect = Exception("lock timeout")
+            with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+                with self.assertRaises(SystemExit) as exit_info:
+                    handle_migrate(MagicMock())
+
+        self.assertEqual(exit_info.exception.code, 1)
+        self.assertIn("Ошибка миграции схемы: lock timeout", mock_stdout.getvalue())
+
+    def test_handle_prune(self):
+        """Тест команды prune: история очищается один раз с указанным keep."""
+        from passgen.commands import handle_prune
+
+        with patch('passgen.storage.db') as mock_db:
+            mock_db.prune_history.return_value = 12
+            with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+                handle_prune(MagicMock(keep=3))
+
+        mock_db.prune_history.assert_called_once_with(keep=3)
+        self.assertIn("Удалено старых записей истории: 12", mock_stdout.getvalue())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,298 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from passgen.database_postgres import PasswordDB, SchemaOutdatedError
+from passgen.utils import password_digest
+
+
+class TestPasswordDB(unittest.TestCase):
+    """Тесты для SQL-логики PasswordDB (курсор заменен заглушкой)."""
+
+    def setUp(self):
+        """Создаем объект без подключения к базе."""
+        self.db = PasswordDB.__new__(PasswordDB)
+        self.db.replicas = []
+        self.db.pending_schema_steps = []
+        self.cursor = MagicMock()
+
+    def executed_sql(self):
+        return [" ".join(call.args[0].split()) for call in self.cursor.execute.call_args_list]
+
+    def test_migrate_legacy_schema(self):
+        """Тест миграции старой схемы (id SERIAL, hex TEXT) на компактную."""
+        self.cursor.fetchall.return_value = [
+            ("passwords", "id", "integer"),
+            ("passwords", "password_hash", "text"),
+        ]
+
+        self.assertTrue(self.db.migrate_compact_schema(self.cursor))
+
+        sql = self.executed_sql()
+        self.assertIn("ALTER TABLE passwords DROP COLUMN id", sql)
+        self.assertIn("ALTER TABLE passwords ADD PRIMARY KEY (service)", sql)
+        self.assertIn("ALTER TABLE passwords ALTER COLUMN password_hash TYPE BYTEA "
+                      "USING decode(password_hash, 'hex')", sql)
+        # Дубликаты удаляются до создания первичного ключа
+        self.assertLess(next(i for i, q in enumerate(sql) if q.startswith("DELETE")),
+                        sql.index("ALTER TABLE passwords ADD PRIMARY KEY (service)"))
+
+    def test_migrate_compact_schema_noop(self):
+        """Тест: компактная схема не мигрируется повторно."""
+        self.cursor.fetchall.return_value = [
+            ("passwords", "password_hash", "bytea"),
+        ]
+
+        self.assertEqual(self.db.migrate_compact_schema(self.cursor), [])
+        self.assertEqual(self.cursor.execute.call_count, 1)
+
+    def test_pending_migrations_only_detects(self):
+        """Тест: проверка схемы при запуске ничего не меняет, только описывает шаги."""
+        self.cursor.fetchall.return_value = [
+            ("passwords", "id", "integer"),
+            ("passwords", "password_hash", "text"),
+        ]
+
+        pending = self.db.pending_migrations(self.cursor)
+
+        self.assertEqual(len(pending), 2)
+        self.assertEqual(self.cursor.execute.call_count, 1)  # только SELECT из information_schema
+
+    def test_migrate_schema_locks_tables_first(self):
+        """Тест: команда migrate блокирует таблицы до проверки схемы (параллельный запуск ждет)."""
+        conn = MagicMock()
+        conn.cursor.return_value = self.cursor
+        self.cursor.fetchall.return_value = [("passwords", "id", "integer")]
+        self.db.primary = MagicMock()
+        self.db.primary.connection.return_value.__enter__.return_value = conn
+        self.db.get_connection = MagicMock()
+        self.db.create_search_indexes = MagicMock(return_value=[])
+        self.db.init_database = MagicMock()
+
+        applied = self.db.migrate_schema()
+
+        self.assertEqual(len(applied), 1)
+        self.assertEqual(self.executed_sql()[0],
+                         "LOCK TABLE passwords, password_history IN ACCESS EXCLUSIVE MODE")
+        conn.commit.assert_called_once()
+        self.db.init_database.assert_called_once()
+
+    def test_outdated_schema_blocks_reads_and_writes(self):
+        """Тест: пока не выполнен migrate, чтение и запись останавливаются понятной ошибкой."""
+        self.db.pending_schema_steps = ["passwords: хэш BYTEA вместо hex-строки"]
+        self.db.primary = MagicMock()
+
+        with self.assertRaisesRegex(SchemaOutdatedError, "python main.py migrate"):
+            self.db.find_password("gmail")
+        with self.assertRaisesRegex(SchemaOutdatedError, "python main.py migrate"):
+            self.db.save_password("gmail", "secret")
+        self.db.primary.connection.assert_not_called()
+
+    def test_migrate_schema_builds_search_indexes_outside_transaction(self):
+        """Тест: индексы поиска строятся командой migrate в режиме autocommit (CONCURRENTLY)."""
+        self.cursor.fetchall.return_value = []
+        self.db.primary = MagicMock()
+        self.db.primary.connection.return_value.__enter__.return_value.cursor.return_value = self.cursor
+        index_conn = MagicMock()
+        self.db.get_connection = MagicMock(return_value=index_conn)
+        self.db.create_search_indexes = MagicMock(return_value=["passwords: индекс для поиска по префиксу"])
+        self.db.init_database = MagicMock()
+
+        applied = self.db.migrate_schema()
+
+        self.assertEqual(applied, ["passwords: индекс для поиска по префиксу"])
+        self.assertTrue(index_conn.autocommit)
+        self.db.create_search_indexes.assert_called_once_with(index_conn.cursor.return_value)
+        index_conn.close.assert_called_once()
+
+    def test_create_search_indexes_concurrently(self):
+        """Тест: недостающий и невалидный индексы строятся CONCURRENTLY, старый GIN удаляется."""
+        self.cursor.fetchone.side_effect = [
+            None,  # индекса по префиксу нет
+            (False,),  # GiST-индекс невалиден после прерванного построения
+            (True,),  # GIN-индекс прежних версий есть
+        ]
+
+        applied = self.db.create_search_indexes(self.cursor)
+
+        sql = self.executed_sql()
+        self.assertEqual(len(applied), 3)
+        self.assertIn("CREATE INDEX CONCURRENTLY passwords_service_prefix_idx "
+                      "ON passwords (lower(service) text_pattern_ops)", sql)
+        self.assertLess(sql.index("DROP INDEX CONCURRENTLY passwords_service_trgm_gist_idx"),
+                        sql.index("CREATE INDEX CONCURRENTLY passwords_service_trgm_gist_idx "
+                                  "ON passwords USING gist (service gist_trgm_ops)"))
+        self.assertIn("DROP INDEX CONCURRENTLY passwords_service_trgm_idx", sql)
+
+    def test_create_search_indexes_noop(self):
+        """Тест: готовые индексы не перестраиваются."""
+        self.cursor.fetchone.side_effect = [(True,), (True,), (False,)]
+
+        self.assertEqual(self.db.create_search_indexes(self.cursor), [])
+        self.assertFalse(any(q.startswith(("CREATE INDEX", "DROP INDEX")) for q in self.executed_sql()))
+
+    def test_detect_search_indexes_only_reads(self):
+        """Тест: при запуске индексы поиска только проверяются."""
+        conn = MagicMock()
+        conn.cursor.return_value = self.cursor
+        self.db.get_connection = MagicMock(return_value=conn)
+        self.cursor.fetchone.return_value = (True,)
+
+        self.db.detect_search_indexes()
+
+        self.assertTrue(self.db.trigram_search)
+        self.assertEqual(len(self.executed_sql()), 1)
+        self.assertTrue(self.executed_sql()[0].startswith("SELECT EXISTS"))
+        conn.close.assert_called_once()
+
+    def test_prune_history_single_pass(self):
+        """Тест: границы считаются одним запросом, удаление идет пачками по сервисам."""
+        conn = MagicMock()
+        conn.cursor.return_value = self.cursor
+        self.db.connection = MagicMock()
+        self.db.connection.return_value.__enter__.return_value = conn
+        self.cursor.fetchall.return_value = [("gmail", 10, 600), ("yandex", 20, 500), ("vk", 30, 3)]
+        self.cursor.rowcount = 7
+
+        removed = self.db.prune_history(keep=5, batch_size=1000)
+
+        sql = self.executed_sql()
+        self.assertEqual(sum("row_number()" in q for q in sql), 1)  # окно считается один раз
+        deletes = [call.args[1] for call in self.cursor.execute.call_args_list
+                   if call.args[0].strip().startswith("DELETE")]
+        self.assertEqual(deletes, [(["gmail", "yandex"], [10, 20]), (["vk"], [30])])
+        self.assertEqual(removed, 14)
+
+    def test_write_password_rejects_current_password(self):
+        """Тест: текущий пароль сервиса нельзя сохранить повторно."""
+        digest = password_digest("secret")
+        self.cursor.fetchone.return_value = (memoryview(digest), False)
+
+        with self.assertRaises(ValueError):
+            self.db._write_password(self.cursor, "gmail", digest)
+        self.assertEqual(self.cursor.execute.call_count, 1)  # до записи дело не дошло
+
+    def test_write_password_rejects_recent_password(self):
+        """Тест: пароль из последних HISTORY_LIMIT нельзя использовать повторно."""
+        self.cursor.fetchone.return_value = (password_digest("new"), True)
+
+        with self.assertRaises(ValueError):
+            self.db._write_password(self.cursor, "gmail", password_digest("old"))
+
+    def test_write_password_insert_and_update(self):
+        """Тест: новая запись вставляется, существующая обновляется; история пишется в том же запросе."""
+        self.cursor.fetchone.return_value = (None, False)
+        self.assertFalse(self.db._write_password(self.cursor, "gmail", password_digest("p1")))
+        self.assertTrue(self.executed_sql()[-1].startswith("INSERT INTO passwords"))
+
+        self.cursor.fetchone.return_value = (password_digest("p1"), False)
+        self.assertTrue(self.db._write_password(self.cursor, "gmail", password_digest("p2")))
+        self.assertTrue(self.executed_sql()[-1].startswith("UPDATE passwords"))
+        self.assertIn("INSERT INTO password_history", self.executed_sql()[-1])
+
+    def test_save_passwords_batched(self):
+        """Тест: группа сохранений - один запрос проверки и две команды записи."""
+        conn = MagicMock()
+        conn.cursor.return_value = self.cursor
+        self.db.connection = MagicMock()
+        self.db.connection.return_value.__enter__.return_value = conn
+        self.cursor.fetchall.return_value = [
+            ("gmail", memoryview(password_digest("old")), [memoryview(password_digest("old"))]),
+            ("yandex", None, None),
+        ]
+
+        with patch("passgen.database_postgres.execute_values") as mock_values:
+            errors = self.db.save_passwords([
+                ("gmail", "old"),  # текущий пароль
+                ("gmail", "new"),
+                ("yandex", "p1"),
+                ("yandex", "p2"),
+                ("yandex", "p1"),  # повтор внутри группы
+            ])
+
+        self.assertEqual([error is None for error in errors], [False, True, True, True, False])
+        self.assertEqual(self.cursor.execute.call_count, 1)  # проверка повторов - один запрос
+        upsert, history = mock_values.call_args_list
+        self.assertEqual([row[:2] for row in upsert.args[2]],
+                         [("gmail", password_digest("new")), ("yandex", password_digest("p2"))])
+        self.assertEqual(history.args[2], [("gmail", password_digest("new")), ("yandex", password_digest("p1")),
+                                           ("yandex", password_digest("p2"))])
+        conn.commit.assert_called_once()
+
+    def test_search_services_tiers(self):
+        """Тест: уровни поиска запрашиваются по очереди с LIMIT и сортировкой по расстоянию (KNN)."""
+        self.db._read = lambda query: query(self.cursor)
+        self.cursor.fetchall.side_effect = [
+            [("gmail", 1.0), ("gmail-work", 0.5)],  # префикс
+            [("my-gmail", 0.4)],  # подстрока
+            [("gmial", 0.3), ("gnail", 0.2)],  # похожие
+        ]
+
+        results = self.db.search_services("gmail", limit=3, offset=1)
+
+        self.assertEqual(results, [("gmail-work", 2.5), ("my-gmail", 1.4), ("gmial", 0.3)])
+        calls = self.cursor.execute.call_args_list
+        self.assertTrue(all("ORDER BY service <-> %(term)s" in call.args[0] for call in calls))
+        self.assertEqual([call.args[1]["limit"] for call in calls], [4, 2, 1])
+
+    def test_search_services_stops_when_page_is_full(self):
+        """Тест: если префиксных совпадений хватает на страницу, остальные уровни не запрашиваются."""
+        self.db._read = lambda query: query(self.cursor)
+        self.cursor.fetchall.return_value = [("gmail", 1.0), ("gmail-work", 0.5)]
+
+        results = self.db.search_services("gmail", limit=2)
+
+        self.assertEqual(results, [("gmail", 3.0), ("gmail-work", 2.5)])
+        self.assertEqual(self.cursor.execute.call_count, 1)
+
+    def test_init_change_feed_creates_triggers(self):
+        """Тест: функция и триггеры уведомлений создаются, если их еще нет."""
+        self.cursor.fetchone.return_value = (False, False)
+
+        self.db.init_change_feed(self.cursor)
+
+        sql = self.executed_sql()
+        self.assertTrue(any("pg_notify('passgen_changes', payload)" in q for q in sql))
+        self.assertTrue(any(q.startswith("CREATE TRIGGER passwords_notify_change") for q in sql))
+        self.assertTrue(any(q.startswith("CREATE TRIGGER passwords_notify_truncate") for q in sql))
+
+    def test_init_change_feed_existing_objects(self):
+        """Тест: при повторном запуске каталог не изменяется."""
+        self.cursor.fetchone.return_value = (True, True)
+
+        self.db.init_change_feed(self.cursor)
+
+        self.assertEqual(len(self.executed_sql()), 1)  # только проверка
+
+    def test_init_database_serialized_by_advisory_lock(self):
+        """Тест: инициализация схемы начинается с блокировки, общей для всех процессов."""
+        conn = MagicMock()
+        conn.cursor.return_value = self.cursor
+        conn.__enter__.return_value = conn
+        self.db.get_connection = MagicMock(return_value=conn)
+        self.cursor.fetchone.return_value = (False, True)
+        self.cursor.fetchall.return_value = []
+
+        with patch("sys.stderr"):
+            self.db.init_database()
+
+        self.assertIsNone(self.db.init_error)
+        sql = self.executed_sql()
+        self.assertEqual(sql[1], "SELECT pg_advisory_xact_lock(%s)")  # первая команда в passwords_db
+        self.assertFalse(any(q.startswith("CREATE OR REPLACE") for q in sql))
+
+    def test_iter_password_hashes(self):
+        """Тест: хэши читаются именованным (серверным) курсором пачками."""
+        conn = MagicMock()
+        named_cursor = conn.cursor.return_value.__enter__.return_value
+        named_cursor.__iter__.return_value = iter([(memoryview(b"a" * 32),), (b"b" * 32,)])
+        self.db.connection = MagicMock()
+        self.db.connection.return_value.__enter__.return_value = conn
+
+        hashes = list(self.db.iter_password_hashes(batch_size=500))
+
+        self.assertEqual(hashes, [b"a" * 32, b"b" * 32])
+        conn.cursor.assert_called_once_with(name="passgen_password_hashes")
+        self.assertEqual(named_cursor.itersize, 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import MagicMock
+from passgen.doctor import run_checks
+
+
+class TestDoctor(unittest.TestCase):
+    """Тесты для команды самопроверки (база данных заменена заглушкой)."""
+
+    def make_db(self, indexes=(("passwords_pkey",),), table_stats=(8192, 42)):
+        """Создает заглушку PasswordDB с курсором, отвечающим на запросы doctor."""
+        cursor = MagicMock()
+        cursor.fetchone.side_effect = [(1,)] * 5 + [table_stats]
+        cursor.fetchall.return_value = list(indexes)
+
+        db = MagicMock()
+        db.init_error = None
+        db.get_connection.return_value.cursor.return_value = cursor
+        return db
+
+    def checks_by_name(self, report):
+        return {check["name"]: check for check in report["checks"]}
+
+    def test_all_checks_pass(self):
+        """Тест: при доступной базе и индексе все проверки пройдены."""
+        db = self.make_db()
+
+        report = run_checks(db, thresholds={"max_connect_ms": 10 ** 6, "max_query_ms": 10 ** 6,
+                                            "min_generate_per_sec": 1, "min_hash_per_sec": 1})
+
+        checks = self.checks_by_name(report)
+        self.assertTrue(report["ok"])
+        self.assertEqual(checks["service_index"]["value"], ["passwords_pkey"])
+        self.assertEqual(checks["table_size"]["value"], 8192)
+        self.assertEqual(checks["row_estimate"]["value"], 42)
+        db.get_connection.return_value.close.assert_called_once()
+
+    def test_missing_index_fails(self):
+        """Тест: отсутствие индекса на service проваливает отчет."""
+        db = self.make_db(indexes=[], table_stats=(8192, -1))
+
+        report = run_checks(db, thresholds={"max_connect_ms": 10 ** 6, "max_query_ms": 10 ** 6,
+                                            "min_generate_per_sec": 1, "min_hash_per_sec": 1})
+
+        checks = self.checks_by_name(report)
+        self.assertFalse(report["ok"])
+        self.assertFalse(checks["service_index"]["ok"])
+        self.assertEqual(checks["row_estimate"]["value"], 0)  # таблица еще не анализировалась
+
+    def test_database_unavailable(self):
+        """Тест: недоступная база отражается в отчете, проверки скорости все равно выполняются."""
+        db = MagicMock()
+        db.init_error = "Ошибка при создании базы данных: connection refused"
+        db.get_connection.side_effect = Exception("connection refused")
+
+        report = run_checks(db, thresholds={"min_generate_per_sec": 1, "min_hash_per_sec": 1})
+
+        checks = self.checks_by_name(report)
+        self.assertFalse(report["ok"])
+        self.assertFalse(checks["init_database"]["ok"])
+        self.assertEqual(checks["connect_latency"]["error"], "connection refused")
+        self.assertTrue(checks["generate_throughput"]["ok"])
+        self.assertTrue(checks["hash_throughput"]["ok"])
+
+    def test_threshold_violation(self):
+        """Тест: недостижимый порог скорости проваливает проверку."""
+        db = self.make_db()
+
+        report = run_checks(db, thresholds={"max_connect_ms": 10 ** 6, "max_query_ms": 10 ** 6,
+                                            "min_generate_per_sec": 10 ** 12, "min_hash_per_sec": 1})
+
+        checks = self.checks_by_name(report)
+        self.assertFalse(report["ok"])
+        self.assertFalse(checks["generate_throughput"]["ok"])
+        self.assertEqual(checks["generate_throughput"]["threshold"], {"min": 10 ** 12})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 import string
-from passgen.generator import generate_password
+from passgen.bloom import ScalableBloomFilter
+from passgen.generator import generate_password, generate_passwords
+from passgen.utils import password_digest
 
 
 class TestGenerator(unittest.TestCase):   # Все тесты должны быть методами этого класса
@@ -81,6 +83,47 @@ class TestGenerator(unittest.TestCase):   # Все тесты должны бы
         self.assertTrue(has_digits, "Должны быть цифры")
         self.assertTrue(has_special, "Должны быть спецсимволы")
 
+    def test_generate_passwords(self):
+        """Тест пакетной генерации паролей."""
+        passwords = generate_passwords(50, length=8, use_special_chars=False)
+
+        self.assertEqual(len(passwords), 50)
+        for password in passwords:
+            self.assertEqual(len(password), 8)
+            self.assertFalse(any(char in string.punctuation for char in password))
+
+    def test_generate_passwords_negative_count(self):
+        """Тест пакетной генерации с отрицательным количеством."""
+        with self.assertRaises(ValueError):
+            generate_passwords(-1)
+
+    def test_generate_passwords_unique(self):
+        """Тест: уникальная генерация не дает повторов даже при маленьком наборе вариантов."""
+        # 26 * 26 = 676 возможных паролей - без проверки повторы почти гарантированы
+        passwords = generate_passwords(300, length=2, use_digits=False, use_special_chars=False,
+                                       use_uppercase=False, unique=True)
+
+        self.assertEqual(len(passwords), 300)
+        self.assertEqual(len(set(passwords)), 300)
+
+    def test_generate_passwords_unique_excludes_existing(self):
+        """Тест: пароли, хэши которых уже есть в фильтре, не генерируются."""
+        existing = [chr(code) for code in range(ord("a"), ord("z"))]  # все буквы, кроме "z"
+        seen = ScalableBloomFilter(initial_capacity=100)
+        seen.update(password_digest(password) for password in existing)
+
+        passwords = generate_passwords(1, length=1, use_digits=False, use_special_chars=False,
+                                       use_uppercase=False, unique=True, seen=seen)
+
+        self.assertEqual(passwords, ["z"])
+        self.assertIn(password_digest("z"), seen)  # новые хэши тоже попадают в фильтр
+
+    def test_generate_passwords_unique_exhausted(self):
+        """Тест: если уникальные пароли закончились, генерация завершается ошибкой."""
+        with self.assertRaises(ValueError):
+            generate_passwords(27, length=1, use_digits=False, use_special_chars=False,
+                               use_uppercase=False, unique=True)
+
 
 if __name__ == '__main__':
     unittest.main()    # запускаем все тесты в файле
@@ -0,0 +1,167 @@
+import argparse
+import builtins
+import io
+import os
+import pstats
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from passgen import profiling
+from passgen.generator import generate_password
+from passgen.profiling import Profiler, normalize_profile_args, INPUT_FRAME
+
+
+def busy(seconds):
+    """Нагрузка на процессор в течение заданного времени."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        generate_password(16)
+
+
+class TestNormalizeProfileArgs(unittest.TestCase):
+    """Тесты приведения --profile к виду --profile=РЕЖИМ."""
+
+    def test_bare_profile(self):
+        """Тест: одиночный --profile не забирает имя команды как режим."""
+        self.assertEqual(normalize_profile_args(["--profile", "generate", "-l", "16"]),
+                         ["--profile=cprofile", "generate", "-l", "16"])
+
+    def test_profile_with_mode(self):
+        """Тест: режим можно указать через пробел или через знак равенства."""
+        self.assertEqual(normalize_profile_args(["--profile", "trace", "list"]), ["--profile=trace", "list"])
+        self.assertEqual(normalize_profile_args(["--profile=trace", "list"]), ["--profile=trace", "list"])
+
+    def test_profile_last(self):
+        """Тест: --profile в конце строки (перед командой не хватает значения)."""
+        self.assertEqual(normalize_profile_args(["--write-behind", "--profile"]),
+                         ["--write-behind", "--profile=cprofile"])
+
+    def test_command_arguments_untouched(self):
+        """Тест: аргументы после имени команды не меняются - --profile глобальная опция."""
+        self.assertEqual(normalize_profile_args(["list", "--profile"]), ["list", "--profile"])
+        self.assertEqual(normalize_profile_args(["search", "--", "--profile"]), ["search", "--", "--profile"])
+        self.assertEqual(normalize_profile_args(["--profile-output", "out", "--profile", "search", "--profile"]),
+                         ["--profile-output", "out", "--profile=cprofile", "search", "--profile"])
+
+    def test_argparse_accepts_normalized_args(self):
+        """Тест: после приведения argparse разбирает --profile перед командой и отклоняет после нее."""
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--profile", nargs="?", const=profiling.DEFAULT_MODE, choices=profiling.MODES)
+        parser.add_subparsers(dest="command").add_parser("list")
+
+        self.assertEqual(parser.parse_args(normalize_profile_args(["--profile", "list"])).profile, "cprofile")
+        with patch("sys.stderr"), self.assertRaises(SystemExit):
+            parser.parse_args(normalize_profile_args(["list", "--profile"]))
+
+    def test_start_from_args(self):
+        """Тест: профилировщик запускается только при --profile=РЕЖИМ перед командой."""
+        self.assertIsNone(profiling.start_from_args(["list"]))
+        self.assertIsNone(profiling.start_from_args(["--profile=unknown", "list"]))
+        self.assertIsNone(profiling.start_from_args(["search", "--", "--profile=trace"]))
+
+
+class TestProfiler(unittest.TestCase):
+    """Тесты профилировщика в обоих режимах."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmpdir.name, "profile")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_profile(self, mode):
+        profiler = Profiler(mode)
+        profiler.start()
+        busy(0.05)
+        profiler.mark("команда")
+        worker = threading.Thread(target=busy, args=(0.05,), name="worker")
+        worker.start()
+        worker.join()
+        profiler.stop()
+        return profiler
+
+    def check_outputs(self, profiler):
+        pstats_path, collapsed_path = profiler.write(self.output)
+
+        stats = pstats.Stats(pstats_path)
+        self.assertTrue(any(name == "generate_password" for _, _, name in stats.stats))
+
+        with open(collapsed_path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, value = line.rsplit(" ", 1)
+            self.assertGreater(int(value), 0)
+        # Стеки собираются во всех потоках, а не только в основном
+        self.assertTrue(any(line.startswith("worker;") and "generate_password" in line for line in lines))
+
+        report = io.StringIO()
+        profiler.report(report, top=5)
+        text = report.getvalue()
+        self.assertIn("команда:", text)
+        self.assertIn("процессор", text)
+        self.assertIn("база данных", text)
+        self.assertIn("времени потоков", text)
+        self.assertNotIn("прочее", text)
+        self.assertGreaterEqual(profiler.thread_time, 0.05)
+        self.assertIn("Top-5", text)
+
+    def test_cprofile_mode(self):
+        """Тест режима cprofile: pstats + выборка стеков всех потоков."""
+        self.check_outputs(self.run_profile("cprofile"))
+
+    def test_trace_mode(self):
+        """Тест режима trace: pstats + точная трассировка вызовов."""
+        self.check_outputs(self.run_profile("trace"))
+
+    def test_unknown_mode(self):
+        """Тест: неизвестный режим - ошибка."""
+        with self.assertRaises(ValueError):
+            Profiler("perf")
+
+    def test_input_wait(self):
+        """Тест: ожидание ввода учитывается отдельно и помечается в стеках."""
+        for mode in profiling.MODES:
+            with patch("builtins.input", side_effect=lambda prompt="": time.sleep(0.05) or "4") as fake_input:
+                profiler = Profiler(mode)
+                profiler.start()
+                self.assertEqual(input("> "), "4")
+                profiler.stop()
+                self.assertIs(builtins.input, fake_input)  # после остановки input восстановлен
+
+            self.assertGreaterEqual(profiler.input_wait, 0.05)
+            self.assertTrue(any(stack[-1] == INPUT_FRAME for stack in profiler.stacks), mode)
+
+    def test_idle_threads_not_counted(self):
+        """Тест: потоки, ждущие события или завершения другого потока, не входят во время потоков."""
+        for mode in profiling.MODES:
+            profiler = Profiler(mode)
+            profiler.start()
+            idle = threading.Thread(target=threading.Event().wait, args=(0.2,), name="idle")
+            idle.start()
+            idle.join()
+            profiler.stop()
+
+            self.assertLess(profiler.thread_time, 0.1, mode)
+
+    def test_db_time(self):
+        """Тест: время в коде работы с базой во всех потоках считается отдельно."""
+        profiler = Profiler("trace")
+        code = compile("import time\ndef query():\n    time.sleep(0.05)\n",
+                       os.path.join("site-packages", "psycopg2", "extras.py"), "exec")
+        namespace = {}
+        exec(code, namespace)
+
+        profiler.start()
+        namespace["query"]()
+        profiler.stop()
+
+        self.assertGreaterEqual(profiler.db_time, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
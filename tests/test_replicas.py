@@ -0,0 +1,297 @@
+import itertools
+import threading
+import unittest
+from unittest.mock import patch
+
+import psycopg2
+
+from passgen.database_postgres import PasswordDB
+from passgen.replicas import CircuitBreaker, DatabaseNode, load_cluster_config, parse_lsn, CLOSED, OPEN, HALF_OPEN
+from passgen.utils import password_digest
+
+
+class FakeServer:
+    """Заглушка сервера PostgreSQL: можно 'выключить' и задать отставание и позицию WAL реплики."""
+
+    def __init__(self, name, lag=0.0):
+        self.name = name
+        self.up = True
+        self.lag = lag  # None - приемник WAL не работает
+        self.lsn = 0  # основной сервер: текущая позиция WAL, реплика: примененная позиция
+        self.queries = []
+
+    def pool(self, min_size, max_size, *args, **kwargs):
+        if not self.up:
+            raise psycopg2.OperationalError(f"{self.name}: connection refused")
+        return FakePool(self)
+
+
+class FakePool:
+    def __init__(self, server):
+        self.server = server
+
+    def getconn(self):
+        if not self.server.up:
+            raise psycopg2.OperationalError(f"{self.server.name}: connection refused")
+        return FakeConnection(self.server)
+
+    def putconn(self, conn, close=False):
+        pass
+
+    def closeall(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.closed = 0
+        self.rowcount = 1
+        self._result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        if not self.server.up:
+            self.closed = 2
+            raise psycopg2.OperationalError(f"{self.server.name}: server closed the connection unexpectedly")
+        if "pg_is_in_recovery" in sql:
+            self._result = (self.server.lag,)
+        elif "pg_current_wal_lsn" in sql:
+            self.server.lsn += 1
+            self._result = (f"0/{self.server.lsn:X}",)
+        elif "pg_last_wal_replay_lsn" in sql:
+            self._result = (f"0/{self.server.lsn:X}",)
+        else:
+            self.server.queries.append(" ".join(sql.split()))
+            self._result = (password_digest(self.server.name), False) if "EXISTS" in sql else \
+                (password_digest(self.server.name),)
+
+    def fetchone(self):
+        return self._result
+
+    def commit(self):
+        pass
+
+
+def make_node(server, failure_threshold=3):
+    return DatabaseNode(server.name, params={}, pool_factory=server.pool,
+                        breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=60))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Тесты автомата отключения узла."""
+
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: self.now)
+
+    def test_opens_after_threshold(self):
+        """Тест: узел отключается после failure_threshold ошибок подряд."""
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertFalse(self.breaker.available)
+
+    def test_success_resets_failures(self):
+        """Тест: успешный запрос обнуляет счетчик ошибок."""
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_trial(self):
+        """Тест: после reset_timeout пропускается один пробный запрос."""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now = 10
+
+        self.assertTrue(self.breaker.available)
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertFalse(self.breaker.allow())  # второй запрос ждет результата пробного
+
+        self.breaker.record_failure()  # пробный запрос не прошел - снова отключаем
+        self.assertEqual(self.breaker.state, OPEN)
+        self.now = 20
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+
+class TestClusterConfig(unittest.TestCase):
+    """Тесты чтения настроек серверов из переменных окружения."""
+
+    def test_defaults(self):
+        """Тест: без переменных окружения используется DB_CONFIG и нет реплик."""
+        primary, replicas, max_lag = load_cluster_config({"dbname": "db"}, environ={})
+
+        self.assertEqual(primary.params, {"dbname": "db"})
+        self.assertIsNone(primary.dsn)
+        self.assertEqual(replicas, [])
+        self.assertIsNone(max_lag)
+
+    def test_primary_and_replicas(self):
+        """Тест: основной сервер, реплики через запятую и допустимое отставание."""
+        primary, replicas, max_lag = load_cluster_config({}, environ={
+            "PASSGEN_PRIMARY_DSN": "host=db1 dbname=passwords_db",
+            "PASSGEN_REPLICA_DSNS": "host=db2 dbname=passwords_db, postgresql://db3/passwords_db,",
+            "PASSGEN_MAX_REPLICA_LAG": "2.5",
+        })
+
+        self.assertEqual(primary.dsn, "host=db1 dbname=passwords_db")
+        self.assertEqual([node.dsn for node in replicas],
+                         ["host=db2 dbname=passwords_db", "postgresql://db3/passwords_db"])
+        self.assertEqual([node.name for node in replicas], ["replica1", "replica2"])
+        self.assertEqual(max_lag, 2.5)
+
+    def test_parse_lsn(self):
+        """Тест: позиции WAL сравниваются как числа, а не как строки."""
+        self.assertEqual(parse_lsn("0/10"), 16)
+        self.assertEqual(parse_lsn("1/0"), 1 << 32)
+        self.assertLess(parse_lsn("0/FFFFFFFF"), parse_lsn("1/0"))
+
+    def test_invalid_max_lag(self):
+        """Тест: нечисловое отставание - ошибка настройки."""
+        with self.assertRaises(ValueError):
+            load_cluster_config({}, environ={"PASSGEN_MAX_REPLICA_LAG": "soon"})
+
+
+class TestReadWriteRouting(unittest.TestCase):
+    """Тесты распределения запросов между основным сервером и репликами."""
+
+    def setUp(self):
+        self.primary = FakeServer("primary")
+        self.replica1 = FakeServer("replica1")
+        self.replica2 = FakeServer("replica2")
+        self.db = PasswordDB.__new__(PasswordDB)  # без init_database и настоящих серверов
+        self.db.primary = make_node(self.primary)
+        self.db.replicas = [make_node(self.replica1), make_node(self.replica2)]
+        self.db.max_replica_lag = None
+        self.db._replica_counter = itertools.count()
+        self.db._write_lsn = 0
+        self.db._write_lsn_lock = threading.Lock()
+        self.db.pending_schema_steps = []
+        self.sleep_patcher = patch("time.sleep")
+        self.sleep_patcher.start()
+
+    def tearDown(self):
+        self.sleep_patcher.stop()
+
+    def served_by(self):
+        return self.db.find_password("gmail")
+
+    def test_reads_round_robin_over_replicas(self):
+        """Тест: чтения распределяются по репликам по кругу, основной сервер не нагружается."""
+        served = [self.served_by() for _ in range(4)]
+
+        self.assertEqual(served, [password_digest(name) for name in ("replica1", "replica2") * 2])
+        self.assertEqual(self.primary.queries, [])
+
+    def test_writes_go_to_primary(self):
+        """Тест: запись идет только на основной сервер."""
+        with patch("sys.stdout"):
+            self.db.save_password("gmail", "secret")
+        self.db.delete_password("gmail")
+
+        self.assertTrue(any(q.startswith("UPDATE passwords") for q in self.primary.queries))
+        self.assertEqual(self.replica1.queries + self.replica2.queries, [])
+
+    def test_failover_to_next_replica(self):
+        """Тест: при отказе реплики чтение повторяется на другой, после серии ошибок реплика отключается."""
+        self.replica1.up = False
+
+        for _ in range(6):
+            self.assertEqual(self.served_by(), password_digest("replica2"))
+
+        self.assertEqual(self.db.replicas[0].breaker.state, OPEN)
+        self.assertEqual(self.primary.queries, [])
+
+    def test_all_replicas_down_reads_from_primary(self):
+        """Тест: если все реплики недоступны, чтение идет на основной сервер."""
+        self.replica1.up = False
+        self.replica2.up = False
+
+        self.assertEqual(self.served_by(), password_digest("primary"))
+
+    def test_connection_lost_after_checkout(self):
+        """Тест: обрыв уже выданного соединения тоже приводит к повтору на другом узле."""
+        self.db.find_password("warmup")  # пул replica1 создан, дальше сервер "падает" посреди работы
+        self.db.find_password("warmup")
+        self.replica1.up = False
+
+        self.assertEqual(self.served_by(), password_digest("replica2"))
+        self.assertEqual(self.db.replicas[0].breaker.failures, 1)
+
+    def test_stale_replica_is_skipped(self):
+        """Тест: реплика с отставанием больше допустимого не используется."""
+        self.db.max_replica_lag = 1.0
+        self.replica1.lag = 5.0
+
+        served = {self.served_by() for _ in range(4)}
+
+        self.assertEqual(served, {password_digest("replica2")})
+
+        self.replica2.lag = 5.0
+        self.db.replicas[1]._lag_checked_at = None  # сбрасываем закэшированный замер
+        self.assertEqual(self.served_by(), password_digest("primary"))
+
+    def test_not_streaming_replica_is_stale(self):
+        """Тест: реплика с отключенным приемником WAL считается отставшей, а не догнавшей."""
+        self.db.max_replica_lag = 1.0
+        self.replica1.lag = None
+
+        self.assertEqual(self.db.replicas[0].replication_lag(), float("inf"))
+        served = {self.served_by() for _ in range(4)}
+
+        self.assertEqual(served, {password_digest("replica2")})
+
+    def test_reads_own_writes(self):
+        """Тест: после записи чтение идет на основной сервер, пока реплики не применят ее WAL."""
+        with patch("sys.stdout"):
+            self.db.save_password("gmail", "secret")
+        self.assertEqual(self.primary.lsn, 1)
+
+        self.assertEqual({self.served_by() for _ in range(2)}, {password_digest("primary")})
+
+        self.replica2.lsn = 1  # replica2 догнала запись, replica1 еще нет
+        self.assertEqual({self.served_by() for _ in range(3)}, {password_digest("replica2")})
+
+        self.replica1.lsn = 1
+        self.assertIn(password_digest("replica1"), {self.served_by() for _ in range(2)})
+
+    def test_everything_down(self):
+        """Тест: если недоступны все серверы, чтение завершается ошибкой соединения."""
+        for server in (self.primary, self.replica1, self.replica2):
+            server.up = False
+
+        with self.assertRaises(psycopg2.OperationalError):
+            self.served_by()
+
+    def test_primary_down_write_retries_then_fails_fast(self):
+        """Тест: запись повторяется с паузой, а после отключения основного сервера сразу падает."""
+        self.primary.up = False
+
+        with self.assertRaises(psycopg2.OperationalError):
+            self.db.save_password("gmail", "secret")
+        self.assertEqual(self.db.primary.breaker.state, OPEN)  # 3 попытки = порог отключения
+
+        self.primary.up = True
+        with self.assertRaises(psycopg2.OperationalError):
+            self.db.save_password("gmail", "secret")  # автомат еще не пропускает запросы
+        self.assertEqual(self.primary.queries, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
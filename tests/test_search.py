@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from passgen import storage
+from passgen.search import ServiceIndex, trigrams, similarity
+
+
+class TestServiceIndex(unittest.TestCase):
+    """Тесты для поиска сервисов в памяти."""
+
+    def setUp(self):
+        """Индекс с набором сервисов."""
+        self.index = ServiceIndex(["gmail", "gmail-work", "mail.ru", "yandex", "github", "hotmail"])
+
+    def services(self, results):
+        return [service for service, _ in results]
+
+    def test_trigrams_like_pg_trgm(self):
+        """Тест построения триграмм (как в pg_trgm)."""
+        self.assertEqual(trigrams("Cat"), {"  c", " ca", "cat", "at "})
+        self.assertEqual(similarity(trigrams("cat"), trigrams("cat")), 1.0)
+
+    def test_exact_and_prefix_ranked_first(self):
+        """Тест: точное совпадение выше префикса, префикс выше подстроки."""
+        results = self.services(self.index.search("gmail"))
+
+        self.assertEqual(results, ["gmail", "gmail-work"])
+
+    def test_substring(self):
+        """Тест поиска подстроки."""
+        self.assertEqual(set(self.services(self.index.search("mail"))),
+                         {"gmail", "gmail-work", "mail.ru", "hotmail"})
+
+    def test_short_prefix(self):
+        """Тест короткого запроса (меньше трех символов)."""
+        self.assertEqual(self.services(self.index.search("gi")), ["github"])
+
+    def test_typo_tolerant(self):
+        """Тест поиска с опечаткой."""
+        self.assertIn("yandex", self.services(self.index.search("yandx")))
+
+    def test_case_insensitive(self):
+        """Тест поиска без учета регистра."""
+        self.assertIn("github", self.services(self.index.search("GitHub")))
+
+    def test_paging(self):
+        """Тест постраничного вывода."""
+        all_results = self.index.search("mail", limit=10)
+
+        self.assertEqual(self.index.search("mail", limit=2, offset=1), all_results[1:3])
+
+    def test_add_remove(self):
+        """Тест обновления индекса."""
+        self.index.add("gitlab")
+        self.index.remove("github")
+
+        self.assertEqual(self.services(self.index.search("git")), ["gitlab"])
+        self.assertEqual(len(self.index), 6)
+
+
+class TestStorageSearch(unittest.TestCase):
+    """Тесты выбора способа поиска в модуле storage."""
+
+    def setUp(self):
+        """Подменяем БД заглушкой и сбрасываем индекс в памяти."""
+        self.db_mock = MagicMock()
+        self.db_patcher = patch("passgen.storage.db", self.db_mock)
+        self.index_patcher = patch("passgen.storage.service_index", None)
+        self.db_patcher.start()
+        self.index_patcher.start()
+
+    def tearDown(self):
+        """Отключаем заглушки."""
+        self.index_patcher.stop()
+        self.db_patcher.stop()
+
+    def test_uses_database_with_pg_trgm(self):
+        """Тест: при доступном pg_trgm поиск выполняется в базе."""
+        self.db_mock.trigram_search = True
+        self.db_mock.search_services.return_value = [("gmail", 3.0)]
+
+        self.assertEqual(storage.search_services("gmail", limit=5), [("gmail", 3.0)])
+        self.db_mock.search_services.assert_called_once_with("gmail", 5, 0)
+
+    def test_falls_back_to_memory_index(self):
+        """Тест: без pg_trgm строится индекс в памяти и обновляется при сохранении."""
+        self.db_mock.trigram_search = False
+        self.db_mock.get_service_names.return_value = ["gmail", "yandex"]
+
+        self.assertEqual(storage.search_services("gmal"), [("gmail", 0.375)])
+        storage.save_password("gmail-work", "secret")
+
+        self.assertEqual([s for s, _ in storage.search_services("gmail")], ["gmail", "gmail-work"])
+        self.db_mock.get_service_names.assert_called_once()
+        self.db_mock.search_services.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
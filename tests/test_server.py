@@ -0,0 +1,242 @@
+import json
+import threading
+import unittest
+from http.client import HTTPConnection
+from unittest.mock import patch, MagicMock
+from passgen.database_postgres import SchemaOutdatedError
+from passgen.server import create_server
+from passgen.utils import password_digest
+
+
+class TestServer(unittest.TestCase):
+    """Тесты для HTTP/JSON сервера (база данных заменена заглушкой)."""
+
+    def setUp(self):
+        """Запускаем сервер на свободном порту с заглушкой вместо БД."""
+        self.db_mock = MagicMock()
+        self.db_patcher = patch("passgen.storage.db", self.db_mock)
+        self.db_patcher.start()
+
+        self.server = create_server(port=0, workers=2)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+        # Одно keep-alive соединение на весь тест
+        self.conn = HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+
+    def tearDown(self):
+        """Останавливаем сервер и отключаем заглушку."""
+        self.conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.db_patcher.stop()
+
+    def request(self, method, path, payload=None):
+        """Отправляет запрос и возвращает (статус, JSON-ответ)."""
+        body = json.dumps(payload) if payload is not None else None
+        self.conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+        response = self.conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_generate(self):
+        """Тест генерации пароля без сохранения."""
+        status, data = self.request("POST", "/generate", {"length": 16})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(data["password"]), 16)
+        self.assertFalse(data["saved"])
+        self.db_mock.save_password.assert_not_called()
+
+    def test_generate_with_service(self):
+        """Тест генерации пароля с сохранением для сервиса."""
+        status, data = self.request("POST", "/generate", {"length": 8, "service": "gmail"})
+
+        self.assertEqual(status, 200)
+        self.assertTrue(data["saved"])
+        self.db_mock.save_password.assert_called_once_with("gmail", data["password"])
+
+    def test_generate_invalid_length(self):
+        """Тест генерации пароля с некорректной длиной."""
+        status, data = self.request("POST", "/generate", {"length": 2})
+
+        self.assertEqual(status, 400)
+        self.assertIn("не менее 4 символов", data["error"])
+
+    def test_generate_batch(self):
+        """Тест пакетной генерации паролей."""
+        status, data = self.request("POST", "/generate/batch", {"count": 5, "length": 10})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(data["passwords"]), 5)
+        self.assertTrue(all(len(p) == 10 for p in data["passwords"]))
+
+    def test_generate_batch_unique(self):
+        """Тест пакетной генерации без повторов."""
+        status, data = self.request("POST", "/generate/batch", {"count": 50, "length": 8, "unique": True})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(set(data["passwords"])), 50)
+        self.assertEqual(data["stats"]["items"], 50)
+        self.db_mock.iter_password_hashes.assert_not_called()
+
+    def test_generate_batch_preload(self):
+        """Тест: с preload в фильтр уникальности сначала читаются хэши сохраненных паролей."""
+        self.db_mock.iter_password_hashes.return_value = iter([password_digest(f"p{i}") for i in range(10)])
+
+        status, data = self.request("POST", "/generate/batch",
+                                    {"count": 20, "length": 8, "unique": True, "preload": True})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(set(data["passwords"])), 20)
+        self.assertEqual(data["stats"]["items"], 30)
+        self.db_mock.iter_password_hashes.assert_called_once()
+
+    def test_generate_batch_preload_requires_unique(self):
+        """Тест: preload без unique - ошибка запроса."""
+        status, data = self.request("POST", "/generate/batch", {"count": 5, "preload": True})
+
+        self.assertEqual(status, 400)
+        self.db_mock.iter_password_hashes.assert_not_called()
+
+    def test_find_uses_cache(self):
+        """Тест поиска: повторный запрос обслуживается из кэша на том же соединении."""
+        self.db_mock.find_password.return_value = "hash1"
+
+        first = self.request("GET", "/find?service=gmail")
+        second = self.request("GET", "/find?service=gmail")
+
+        self.assertEqual(first, (200, {"service": "gmail", "password_hash": "hash1"}))
+        self.assertEqual(second, first)
+        self.db_mock.find_password.assert_called_once_with("gmail")
+
+    def test_find_not_found(self):
+        """Тест поиска несуществующего сервиса."""
+        self.db_mock.find_password.return_value = None
+
+        status, _ = self.request("GET", "/find?service=missing")
+
+        self.assertEqual(status, 404)
+
+    def test_find_many(self):
+        """Тест поиска нескольких сервисов одним запросом."""
+        self.db_mock.find_passwords.return_value = {"gmail": "hash1", "yandex": None}
+
+        status, data = self.request("POST", "/find", {"services": ["gmail", "yandex"]})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(data["results"], {"gmail": "hash1", "yandex": None})
+        self.db_mock.find_passwords.assert_called_once_with(["gmail", "yandex"])
+
+    def test_save_invalidates_cache(self):
+        """Тест сохранения: закэшированный результат поиска сбрасывается."""
+        self.db_mock.find_password.side_effect = ["old_hash", "new_hash"]
+
+        self.request("GET", "/find?service=gmail")
+        status, _ = self.request("POST", "/save", {"service": "gmail", "password": "secret"})
+        _, data = self.request("GET", "/find?service=gmail")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(data["password_hash"], "new_hash")
+
+    def test_save_reused_password(self):
+        """Тест сохранения ранее использованного пароля."""
+        self.db_mock.save_password.side_effect = ValueError("Пароль уже использовался")
+
+        status, data = self.request("POST", "/save", {"service": "gmail", "password": "secret"})
+
+        self.assertEqual(status, 409)
+        self.assertEqual(data["error"], "Пароль уже использовался")
+
+    def test_save_write_behind_reports_queued(self):
+        """Тест: при отложенной записи /save сообщает, что пароль только поставлен в очередь."""
+        with patch("passgen.storage.write_queue", MagicMock()):
+            status, data = self.request("POST", "/save", {"service": "gmail", "password": "secret"})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(data, {"service": "gmail", "saved": False, "queued": True})
+
+    def test_save_rejects_non_string_password(self):
+        """Тест: пароль не строкой - ошибка 400, а не внутренняя ошибка."""
+        status, data = self.request("POST", "/save", {"service": "gmail", "password": 12345})
+
+        self.assertEqual(status, 400)
+        self.assertIn("строками", data["error"])
+        self.db_mock.save_password.assert_not_called()
+
+    def test_find_does_not_cache_value_invalidated_during_read(self):
+        """Тест: сохранение во время чтения из базы не оставляет в кэше старый хэш."""
+        service = self.server.service
+
+        def slow_find(name):
+            # Пока читатель ждет базу, писатель сохраняет новый пароль
+            service.save({"service": name, "password": "new"})
+            return "old_hash"
+
+        self.db_mock.find_password.side_effect = slow_find
+        service.find("gmail")
+
+        self.db_mock.find_password.side_effect = None
+        self.db_mock.find_password.return_value = "new_hash"
+        self.assertEqual(service.find("gmail")["password_hash"], "new_hash")
+
+    def test_idle_keep_alive_connections_do_not_block(self):
+        """Тест: простаивающие keep-alive соединения не занимают слоты обработки (workers=2)."""
+        port = self.server.server_address[1]
+        idle = [HTTPConnection("127.0.0.1", port, timeout=5) for _ in range(2)]
+        try:
+            for conn in idle:
+                conn.request("POST", "/generate", body="{}")
+                conn.getresponse().read()
+
+            third = HTTPConnection("127.0.0.1", port, timeout=2)
+            third.request("POST", "/generate", body="{}")
+            self.assertEqual(third.getresponse().status, 200)
+            third.close()
+        finally:
+            for conn in idle:
+                conn.close()
+
+    def test_invalid_content_length(self):
+        """Тест: некорректный Content-Length - ответ 400, соединение закрывается."""
+        for value in ("abc", "-5"):
+            with self.subTest(value=value):
+                conn = HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+                conn.putrequest("POST", "/generate")
+                conn.putheader("Content-Length", value)
+                conn.endheaders()
+                response = conn.getresponse()
+
+                self.assertEqual(response.status, 400)
+                self.assertIn("Content-Length", json.loads(response.read())["error"])
+                self.assertEqual(response.getheader("Connection"), "close")
+                conn.close()
+
+    def test_outdated_schema_returns_503(self):
+        """Тест: пока не выполнен migrate, сервер отвечает 503 с подсказкой."""
+        self.db_mock.find_password.side_effect = SchemaOutdatedError(
+            "Схема базы данных устарела: выполните 'python main.py migrate'")
+
+        status, data = self.request("GET", "/find?service=gmail")
+
+        self.assertEqual(status, 503)
+        self.assertIn("python main.py migrate", data["error"])
+
+    def test_delete(self):
+        """Тест удаления пароля."""
+        self.db_mock.delete_password.return_value = True
+
+        status, data = self.request("POST", "/delete", {"service": "gmail"})
+
+        self.assertEqual(status, 200)
+        self.assertTrue(data["deleted"])
+        self.db_mock.delete_password.assert_called_once_with("gmail")
+
+    def test_unknown_path(self):
+        """Тест запроса на неизвестный адрес."""
+        status, _ = self.request("POST", "/unknown", {})
+
+        self.assertEqual(status, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from passgen.storage import save_password, find_password, get_all_passwords, delete_password
+from passgen.storage import (save_password, find_password, get_all_passwords, delete_password, get_password_history,
+                            find_passwords, reveal_password, export_passwords, load_password_hashes)
+from passgen.bloom import ScalableBloomFilter
+from passgen.vault import VaultLockedError
 
 
 class TestStorage(unittest.TestCase):
@@ -54,6 +57,15 @@ class TestStorage(unittest.TestCase):
         self.assertIsNone(result)  # должен быть None
         self.db_mock.find_password.assert_called_once_with("non_existing")
 
+    def test_find_passwords(self):
+        """Тест поиска нескольких сервисов одним вызовом."""
+        self.db_mock.find_passwords.return_value = {"gmail": "hash1", "yandex": None}
+
+        result = find_passwords(["gmail", "yandex"])
+
+        self.assertEqual(result, {"gmail": "hash1", "yandex": None})
+        self.db_mock.find_passwords.assert_called_once_with(["gmail", "yandex"])
+
     def test_get_all_passwords(self):
         """Тест получения всех паролей."""
         # Тестовые данные
@@ -85,6 +97,73 @@ class TestStorage(unittest.TestCase):
         self.assertFalse(result)  # должен быть False
         self.db_mock.delete_password.assert_called_once_with("non_existing")
 
+    def test_save_password_reused(self):
+        """Тест сохранения пароля, который уже использовался для сервиса."""
+        # Заглушка БД отклоняет повторно использованный пароль
+        self.db_mock.save_password.side_effect = ValueError("Пароль уже использовался")
+
+        with self.assertRaises(ValueError):
+            save_password("test_service", "old_password")
+
+    def test_get_password_history(self):
+        """Тест получения истории паролей сервиса."""
+        expected_history = [("hash2", "2025-02-01"), ("hash1", "2025-01-01")]
+        self.db_mock.get_password_history.return_value = expected_history
+
+        result = get_password_history("test_service", limit=2)
+
+        self.assertEqual(result, expected_history)
+        self.db_mock.get_password_history.assert_called_once_with("test_service", 2)
+
+    def test_save_password_with_vault(self):
+        """Тест сохранения пароля при разблокированном сейфе."""
+        vault_mock = MagicMock()
+        vault_mock.encrypt.return_value = b"encrypted"
+
+        with patch("passgen.storage.vault", vault_mock):
+            save_password("test_service", "test_password")
+
+        vault_mock.encrypt.assert_called_once_with("test_service", "test_password")
+        self.db_mock.save_password.assert_called_once_with("test_service", "test_password", b"encrypted")
+
+    def test_reveal_password(self):
+        """Тест получения пароля из сейфа."""
+        vault_mock = MagicMock()
+        vault_mock.decrypt.return_value = "test_password"
+        self.db_mock.find_encrypted_password.return_value = b"encrypted"
+
+        with patch("passgen.storage.vault", vault_mock):
+            result = reveal_password("test_service")
+
+        self.assertEqual(result, "test_password")
+        vault_mock.decrypt.assert_called_once_with("test_service", b"encrypted")
+
+    def test_reveal_password_locked(self):
+        """Тест получения пароля из заблокированного сейфа."""
+        with patch("passgen.storage.vault", None):
+            with self.assertRaises(VaultLockedError):
+                reveal_password("test_service")
+
+    def test_export_passwords(self):
+        """Тест выгрузки всех паролей из сейфа."""
+        vault_mock = MagicMock()
+        vault_mock.decrypt_many.return_value = [("gmail", "p1")]
+        self.db_mock.get_all_encrypted_passwords.return_value = [("gmail", b"blob")]
+
+        with patch("passgen.storage.vault", vault_mock):
+            result = export_passwords(workers=2)
+
+        self.assertEqual(result, [("gmail", "p1")])
+        vault_mock.decrypt_many.assert_called_once_with([("gmail", b"blob")], workers=2)
+
+    def test_load_password_hashes(self):
+        """Тест заполнения фильтра уникальности хэшами из базы."""
+        self.db_mock.iter_password_hashes.return_value = iter([b"a" * 32, b"b" * 32, b"a" * 32])
+        seen = ScalableBloomFilter(initial_capacity=10)
+
+        self.assertEqual(load_password_hashes(seen), 2)
+        self.assertIn(b"b" * 32, seen)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,5 +1,5 @@
 import unittest
-from passgen.utils import hash_password, validate_password_length
+from passgen.utils import hash_password, password_digest, format_hash, validate_password_length
 
 
 class TestUtils(unittest.TestCase):
@@ -15,6 +15,23 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(hashed, hash_password(password))  # Один и тот же пароль должен давать одинаковый хэш
         self.assertNotEqual(hashed, hash_password("different_password"))  # Разные пароли должны давать разные хэши
 
+    def test_password_digest(self):
+        """Тест двоичного хэша пароля (формат хранения в базе)."""
+        digest = password_digest("test_password")
+
+        self.assertIsInstance(digest, bytes)
+        self.assertEqual(len(digest), 32)  # SHA-256 - 32 байта вместо 64 hex-символов
+        self.assertEqual(digest.hex(), hash_password("test_password"))
+
+    def test_format_hash(self):
+        """Тест перевода хэша в hex для вывода."""
+        digest = password_digest("test_password")
+
+        self.assertEqual(format_hash(digest), hash_password("test_password"))
+        self.assertEqual(format_hash(memoryview(digest)), hash_password("test_password"))
+        self.assertEqual(format_hash("abc123"), "abc123")
+        self.assertIsNone(format_hash(None))
+
     def test_validate_password_length_valid(self):
         """Тест проверки допустимой длины пароля."""
         # Не должно вызывать исключений
@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import patch
+from passgen import vault as vault_module
+from passgen.vault import Vault, VaultLockedError, new_salt
+
+
+@unittest.skipIf(vault_module.AESGCM is None, "не установлен пакет cryptography")
+class TestVault(unittest.TestCase):
+    """Тесты для зашифрованного сейфа."""
+
+    def setUp(self):
+        """Уменьшаем стоимость scrypt, чтобы тесты шли быстро."""
+        self.scrypt_patcher = patch("passgen.vault.SCRYPT_N", 2 ** 10)
+        self.scrypt_patcher.start()
+        self.vault = Vault(new_salt())
+        self.vault.unlock("master")
+
+    def tearDown(self):
+        """Возвращаем параметры scrypt."""
+        self.scrypt_patcher.stop()
+
+    def test_encrypt_decrypt(self):
+        """Тест шифрования и расшифровки пароля."""
+        blob = self.vault.encrypt("gmail", "секрет123")
+
+        self.assertNotIn("секрет123".encode(), blob)  # пароль не хранится открытым
+        self.assertEqual(self.vault.decrypt("gmail", blob), "секрет123")
+
+    def test_blob_bound_to_service(self):
+        """Тест: запись одного сервиса нельзя расшифровать как запись другого."""
+        blob = self.vault.encrypt("gmail", "secret")
+
+        with self.assertRaises(ValueError):
+            self.vault.decrypt("yandex", blob)
+
+    def test_check_blob_detects_wrong_master_password(self):
+        """Тест проверки мастер-пароля по контрольной записи."""
+        check_blob = self.vault.make_check_blob()
+        other = Vault(self.vault.salt)
+
+        with self.assertRaises(ValueError):
+            other.unlock("wrong", check_blob)
+        self.assertFalse(other.is_unlocked)
+
+        other.unlock("master", check_blob)
+        self.assertTrue(other.is_unlocked)
+
+    def test_key_timeout(self):
+        """Тест: после истечения времени хранения ключа сейф блокируется."""
+        with patch("passgen.vault.time.monotonic", return_value=10 ** 9):
+            self.assertFalse(self.vault.is_unlocked)
+            with self.assertRaises(VaultLockedError):
+                self.vault.encrypt("gmail", "secret")
+
+    def test_lock(self):
+        """Тест ручной блокировки сейфа."""
+        self.vault.lock()
+
+        with self.assertRaises(VaultLockedError):
+            self.vault.decrypt("gmail", b"")
+
+    def test_decrypt_many_parallel(self):
+        """Тест параллельной расшифровки: порядок записей сохраняется."""
+        items = [(f"service{i}", self.vault.encrypt(f"service{i}", f"password{i}")) for i in range(100)]
+
+        result = self.vault.decrypt_many(items, workers=4, chunk_size=7)
+
+        self.assertEqual(result, [(f"service{i}", f"password{i}") for i in range(100)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+import psycopg2
+from passgen import storage
+from passgen.cache import MISSING
+from passgen.utils import password_digest
+from passgen.vault import VaultLockedError
+from passgen.writebehind import WriteBehindQueue
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+    """Тесты для очереди отложенной записи."""
+
+    def setUp(self):
+        """Очередь с функциями записи-заглушками."""
+        self.save_batch = MagicMock(side_effect=lambda items: [None] * len(items))
+        self.delete_batch = MagicMock(return_value=set())
+        self.queue = WriteBehindQueue(self.save_batch, self.delete_batch,
+                                      max_pending=3, batch_size=100, flush_interval=0.01, retry_delay=0.01)
+
+    def tearDown(self):
+        """Останавливаем фоновый поток."""
+        self.queue.close(timeout=1)
+
+    def test_coalesces_writes_to_same_service(self):
+        """Тест: повторные записи одного сервиса объединяются, пишется последняя."""
+        # Задерживаем запись, чтобы все операции попали в одну пачку
+        with patch.object(self.queue, "flush_interval", 10):
+            self.queue.save("gmail", "p1")
+            self.queue.save("gmail", "p2")
+            self.queue.save("yandex", "p3")
+        self.assertTrue(self.queue.flush(timeout=1))
+
+        self.save_batch.assert_called_once_with([("gmail", "p2"), ("yandex", "p3")])
+
+    def test_lookup_sees_pending_operations(self):
+        """Тест: еще не записанные операции видны через lookup (read-your-writes)."""
+        with patch.object(self.queue, "flush_interval", 10):
+            self.queue.save("gmail", "p1")
+            self.queue.delete("yandex")
+
+            self.assertEqual(self.queue.lookup("gmail"), ("save", "p1"))
+            self.assertEqual(self.queue.lookup("yandex"), ("delete", None))
+            self.assertIs(self.queue.lookup("mail"), MISSING)
+
+        self.queue.flush(timeout=1)
+        self.assertIs(self.queue.lookup("gmail"), MISSING)
+        self.delete_batch.assert_called_once_with(["yandex"])
+
+    def test_backpressure_when_full(self):
+        """Тест: при заполненной очереди запись ждет, а по таймауту выдает ошибку."""
+        writing = threading.Event()
+        release = threading.Event()
+
+        def slow_save(items):
+            writing.set()
+            release.wait(5)
+            return [None] * len(items)
+
+        self.save_batch.side_effect = slow_save
+
+        self.queue.save("s0", "p")  # эта запись "зависнет" в базе
+        self.assertTrue(writing.wait(1))
+        for i in range(1, 4):
+            self.queue.save(f"s{i}", "p")
+
+        with self.assertRaises(TimeoutError):
+            self.queue.save("s4", "p", timeout=0.05)
+        self.queue.save("s1", "p2", timeout=0.05)  # объединение с ожидающей записью место не занимает
+
+        release.set()
+        self.assertTrue(self.queue.flush(timeout=2))
+
+    def test_retries_after_connection_error(self):
+        """Тест: при ошибке соединения пачка возвращается в очередь и записывается повторно."""
+        self.save_batch.side_effect = [psycopg2.OperationalError("нет соединения"), [None]]
+
+        with patch("sys.stderr"):
+            self.queue.save("gmail", "p1")
+            self.assertTrue(self.queue.flush(timeout=1))
+
+        self.assertEqual(self.save_batch.call_count, 2)
+        self.assertEqual(self.queue.failed, 0)
+
+    def test_other_errors_fail_batch_without_retry(self):
+        """Тест: ошибка, которая не пройдет при повторе, не блокирует очередь."""
+        self.save_batch.side_effect = [VaultLockedError("Сейф заблокирован"), [None]]
+
+        with patch("sys.stderr"), patch.object(self.queue, "flush_interval", 10):
+            self.queue.save("gmail", "p1")
+            self.queue.save("yandex", "p2")
+            self.assertTrue(self.queue.flush(timeout=1))
+            self.queue.save("vk", "p3")
+            self.assertTrue(self.queue.flush(timeout=1))
+
+        self.assertEqual(self.save_batch.call_count, 2)  # неудачная пачка не повторялась
+        self.assertEqual(self.queue.failed, 2)
+        self.assertIs(self.queue.lookup("gmail"), MISSING)
+        self.assertEqual(self.queue.take_errors(),
+                         [("gmail", "Сейф заблокирован"), ("yandex", "Сейф заблокирован")])
+
+    def test_rejected_saves_are_reported(self):
+        """Тест: отказ в записи (повтор пароля) доступен через take_errors() один раз."""
+        self.save_batch.side_effect = lambda items: ["Пароль уже использовался" if s == "gmail" else None
+                                                     for s, _ in items]
+
+        with patch("sys.stderr"):
+            self.queue.save("gmail", "p1")
+            self.queue.save("yandex", "p2")
+            self.assertTrue(self.queue.flush(timeout=1))
+
+        self.assertEqual(self.queue.take_errors(), [("gmail", "Пароль уже использовался")])
+        self.assertEqual(self.queue.take_errors(), [])
+
+
+class TestStorageWriteBehind(unittest.TestCase):
+    """Тесты для режима отложенной записи модуля storage."""
+
+    def setUp(self):
+        """Подменяем БД заглушкой и включаем отложенную запись с долгим интервалом."""
+        self.db_mock = MagicMock()
+        self.db_mock.save_passwords.side_effect = lambda items: [None] * len(items)
+        self.db_patcher = patch("passgen.storage.db", self.db_mock)
+        self.db_patcher.start()
+        storage.enable_write_behind(flush_interval=10)
+
+    def tearDown(self):
+        """Дописываем очередь и отключаем заглушку."""
+        storage.shutdown(timeout=1)
+        self.db_patcher.stop()
+
+    def test_find_reads_pending_save(self):
+        """Тест: find_password видит еще не записанный пароль."""
+        storage.save_password("gmail", "secret")
+
+        self.assertEqual(storage.find_password("gmail"), password_digest("secret"))
+        self.db_mock.find_password.assert_not_called()
+        self.db_mock.save_password.assert_not_called()
+
+    def test_delete_reads_pending_delete(self):
+        """Тест: после delete_password сервис не находится до записи в базу."""
+        self.db_mock.find_password.return_value = "hash1"
+
+        self.assertTrue(storage.delete_password("gmail"))
+        self.assertIsNone(storage.find_password("gmail"))
+
+    def test_shutdown_flushes_queue(self):
+        """Тест: shutdown записывает очередь групповым коммитом."""
+        storage.save_password("gmail", "p1")
+        storage.save_password("yandex", "p2")
+
+        self.assertTrue(storage.shutdown(timeout=1))
+
+        self.db_mock.save_passwords.assert_called_once_with([("gmail", "p1"), ("yandex", "p2")])
+        self.assertIsNone(storage.write_queue)
+
+    def test_write_errors_survive_shutdown(self):
+        """Тест: отказы, случившиеся при завершении, можно забрать после shutdown."""
+        self.db_mock.save_passwords.side_effect = lambda items: ["Пароль уже использовался"] * len(items)
+        storage.save_password("gmail", "p1")
+
+        with patch("sys.stderr"):
+            storage.shutdown(timeout=1)
+
+        self.assertEqual(storage.take_write_errors(), [("gmail", "Пароль уже использовался")])
+        self.assertEqual(storage.take_write_errors(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()